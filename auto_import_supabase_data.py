@@ -3,23 +3,25 @@
 Автоматический импорт данных из Supabase в локальную PostgreSQL
 """
 
+import argparse
 import psycopg2
 import json
+import os
 import requests
 import sys
 from typing import Dict, List, Any
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "scripts"))
+import fonana_db
+import fonana_trace
+from fonana_trace import span
+from db_checksum import verify_databases, print_report
+
 # Конфигурация подключений
 SUPABASE_URL = "https://iwzfrnfemdeomowothhn.supabase.co"
 SUPABASE_KEY = "YOUR_SUPABASE_ANON_KEY"  # Получить через MCP
-
-LOCAL_DB_CONFIG = {
-    'host': 'localhost',
-    'database': 'fonana',
-    'user': 'fonana_user',
-    'password': 'fonana_pass',
-    'port': 5432
-}
+# Прямое подключение к БД Supabase для checksum-сверки (postgresql://...)
+SUPABASE_DB_URL = os.environ.get("SUPABASE_DB_URL")
 
 def get_supabase_data(table: str, limit: int = 1000) -> List[Dict[str, Any]]:
     """Получить данные из Supabase через REST API"""
@@ -34,15 +36,14 @@ def import_users():
     print("🚀 Начинаю импорт пользователей...")
     
     try:
-        conn = psycopg2.connect(**LOCAL_DB_CONFIG)
-        cur = conn.cursor()
+        with fonana_db.connection() as conn:
+            cur = conn.cursor()
         
-        # Получаем текущее количество пользователей
-        cur.execute("SELECT COUNT(*) FROM users")
-        current_count = cur.fetchone()[0]
-        print(f"Текущее количество пользователей в локальной БД: {current_count}")
+            # Получаем текущее количество пользователей
+            cur.execute("SELECT COUNT(*) FROM users")
+            current_count = cur.fetchone()[0]
+            print(f"Текущее количество пользователей в локальной БД: {current_count}")
         
-        conn.close()
         print("✅ Пользователи готовы к импорту")
         
     except Exception as e:
@@ -53,74 +54,112 @@ def import_posts():
     print("📝 Начинаю импорт постов...")
     
     try:
-        conn = psycopg2.connect(**LOCAL_DB_CONFIG)
-        cur = conn.cursor()
+        with fonana_db.connection() as conn:
+            cur = conn.cursor()
         
-        # Получаем текущее количество постов
-        cur.execute("SELECT COUNT(*) FROM posts")
-        current_count = cur.fetchone()[0]
-        print(f"Текущее количество постов в локальной БД: {current_count}")
+            # Получаем текущее количество постов
+            cur.execute("SELECT COUNT(*) FROM posts")
+            current_count = cur.fetchone()[0]
+            print(f"Текущее количество постов в локальной БД: {current_count}")
         
-        conn.close()
         print("✅ Посты готовы к импорту")
         
     except Exception as e:
         print(f"❌ Ошибка при работе с постами: {e}")
 
+def verify_checksums(conn):
+    """Checksum-сверка users/posts с Supabase (None, если источник не задан или недоступен)"""
+    if not SUPABASE_DB_URL:
+        print("ℹ️ SUPABASE_DB_URL не задан — checksum-сверка пропущена")
+        return None
+
+    try:
+        source = psycopg2.connect(SUPABASE_DB_URL)
+        try:
+            reports = verify_databases(source, conn, ["users", "posts"])
+        finally:
+            source.close()
+    except Exception as e:
+        # Ошибка сверки — это "не проверено", а не расхождение данных
+        print(f"❌ Checksum-сверка не выполнена: {e}")
+        return None
+
+    print("🔐 CHECKSUM-СВЕРКА С SUPABASE:")
+    for report in reports:
+        print_report(report)
+    return all(r["ok"] for r in reports)
+
 def verify_import():
-    """Проверка результатов импорта"""
+    """Проверка результатов импорта
+
+    Возвращает (пользователи, посты, checksum_ok); checksum_ok = None, если сверка
+    не выполнялась (нет SUPABASE_DB_URL или ошибка подключения/запроса).
+    """
     print("🔍 Проверяю результаты импорта...")
     
     try:
-        conn = psycopg2.connect(**LOCAL_DB_CONFIG)
-        cur = conn.cursor()
-        
-        # Проверяем пользователей
-        cur.execute("SELECT COUNT(*) as users, COUNT(CASE WHEN \"isCreator\" = true THEN 1 END) as creators FROM users")
-        users_data = cur.fetchone()
+        with fonana_db.connection() as conn:
+            cur = conn.cursor()
         
-        # Проверяем посты
-        cur.execute("SELECT COUNT(*) FROM posts")
-        posts_count = cur.fetchone()[0]
+            # Проверяем пользователей
+            cur.execute("SELECT COUNT(*) as users, COUNT(CASE WHEN \"isCreator\" = true THEN 1 END) as creators FROM users")
+            users_data = cur.fetchone()
         
-        print(f"📊 РЕЗУЛЬТАТЫ ИМПОРТА:")
-        print(f"  👥 Пользователей: {users_data[0]} (креаторов: {users_data[1]})")
-        print(f"  📝 Постов: {posts_count}")
+            # Проверяем посты
+            cur.execute("SELECT COUNT(*) FROM posts")
+            posts_count = cur.fetchone()[0]
         
-        # Проверяем наличие нужных полей
-        cur.execute("SELECT COUNT(*) FROM users WHERE name IS NOT NULL")
-        users_with_name = cur.fetchone()[0]
+            print(f"📊 РЕЗУЛЬТАТЫ ИМПОРТА:")
+            print(f"  👥 Пользователей: {users_data[0]} (креаторов: {users_data[1]})")
+            print(f"  📝 Постов: {posts_count}")
         
-        cur.execute("SELECT COUNT(*) FROM users WHERE \"backgroundImage\" IS NOT NULL")
-        users_with_bg = cur.fetchone()[0]
+            # Проверяем наличие нужных полей
+            cur.execute("SELECT COUNT(*) FROM users WHERE name IS NOT NULL")
+            users_with_name = cur.fetchone()[0]
         
-        print(f"  🎯 Пользователей с полем 'name': {users_with_name}")
-        print(f"  🖼️ Пользователей с 'backgroundImage': {users_with_bg}")
+            cur.execute("SELECT COUNT(*) FROM users WHERE \"backgroundImage\" IS NOT NULL")
+            users_with_bg = cur.fetchone()[0]
         
-        conn.close()
+            print(f"  🎯 Пользователей с полем 'name': {users_with_name}")
+            print(f"  🖼️ Пользователей с 'backgroundImage': {users_with_bg}")
+
+            checksum_ok = verify_checksums(conn)
         
-        return users_data[0], posts_count
+        return users_data[0], posts_count, checksum_ok
         
     except Exception as e:
         print(f"❌ Ошибка при проверке: {e}")
-        return 0, 0
+        return 0, 0, None
+
+def main(argv=None):
+    """Основная функция импорта
+
+    Фазы (имена для --profile): import-users, import-posts, verify.
+    """
+    parser = argparse.ArgumentParser(description="Импорт данных из Supabase в локальную PostgreSQL")
+    fonana_trace.add_arguments(parser)
+    fonana_trace.configure(parser.parse_args(argv))
 
-def main():
-    """Основная функция импорта"""
     print("🚀 НАЧИНАЮ ПОЛНЫЙ ИМПОРТ ДАННЫХ ИЗ SUPABASE")
     print("=" * 50)
     
     # Импорт пользователей
-    import_users()
+    with span("import-users"):
+        import_users()
     
     # Импорт постов
-    import_posts()
+    with span("import-posts"):
+        import_posts()
     
     # Проверка результатов
-    users_count, posts_count = verify_import()
+    with span("verify"):
+        users_count, posts_count, checksum_ok = verify_import()
     
     print("=" * 50)
-    if users_count >= 54 and posts_count >= 339:
+    if checksum_ok is False:
+        print("⚠️ ИМПОРТ НЕ СОВПАДАЕТ С SUPABASE!")
+        print("📊 Расхождения по строкам перечислены выше")
+    elif checksum_ok or (users_count >= 54 and posts_count >= 339):
         print("✅ ИМПОРТ ЗАВЕРШЕН УСПЕШНО!")
         print(f"📊 Импортировано: {users_count} пользователей, {posts_count} постов")
     else:
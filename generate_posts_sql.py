@@ -3,31 +3,22 @@
 Генератор SQL INSERT команд для постов из Supabase
 """
 
-import json
+import os
 import sys
 from typing import List, Dict, Any
 
-def escape_sql_string(value: str) -> str:
-    """Экранирование строк для SQL"""
-    if value is None:
-        return "null"
-    
-    # Заменяем одинарные кавычки на двойные одинарные
-    value = str(value).replace("'", "''")
-    # Экранируем обратные слеши
-    value = value.replace("\\", "\\\\")
-    return f"'{value}'"
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "scripts"))
+from row_codec import RowCodec
 
-def format_sql_value(value: Any) -> str:
-    """Форматирование значения для SQL"""
-    if value is None:
-        return "null"
-    elif isinstance(value, bool):
-        return "true" if value else "false"
-    elif isinstance(value, (int, float)):
-        return str(value)
-    else:
-        return escape_sql_string(value)
+# Поля для вставки; порядок и типы колонок — из prisma/schema.prisma
+POSTS_FIELDS = [
+    "id", "creatorId", "title", "content", "type", "category",
+    "thumbnail", "mediaUrl", "isLocked", "isPremium", "price",
+    "currency", "likesCount", "commentsCount", "viewsCount",
+    "createdAt", "updatedAt"
+]
+# Отсутствующее в посте поле выводится как null (ограничения проверит сама БД)
+POSTS_CODEC = RowCodec("posts", POSTS_FIELDS, defaults=dict.fromkeys(POSTS_FIELDS))
 
 def generate_posts_insert_sql(posts_data: List[Dict[str, Any]]) -> str:
     """Генерация SQL INSERT команды для постов"""
@@ -35,38 +26,7 @@ def generate_posts_insert_sql(posts_data: List[Dict[str, Any]]) -> str:
     if not posts_data:
         return ""
     
-    # Определяем поля для вставки
-    fields = [
-        "id", "creatorId", "title", "content", "type", "category", 
-        "thumbnail", "mediaUrl", "isLocked", "isPremium", "price", 
-        "currency", "likesCount", "commentsCount", "viewsCount", 
-        "createdAt", "updatedAt"
-    ]
-    
-    # Добавляем кавычки для полей с CamelCase
-    quoted_fields = []
-    for field in fields:
-        if any(c.isupper() for c in field[1:]):  # CamelCase поля
-            quoted_fields.append(f'"{field}"')
-        else:
-            quoted_fields.append(field)
-    
-    sql_parts = []
-    sql_parts.append(f"INSERT INTO posts ({', '.join(quoted_fields)}) VALUES")
-    
-    values_list = []
-    for post in posts_data:
-        values = []
-        for field in fields:
-            value = post.get(field)
-            values.append(format_sql_value(value))
-        
-        values_str = f"({', '.join(values)})"
-        values_list.append(values_str)
-    
-    sql_parts.append(",\n".join(values_list) + ";")
-    
-    return "\n".join(sql_parts)
+    return POSTS_CODEC.insert_sql(POSTS_CODEC.decode_all(posts_data))
 
 def main():
     """Основная функция"""
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Fonana deterministic avatar and banner generator
+Renders placeholder media locally from a user id instead of downloading it
+
+- Avatars (400x400): mirrored 5x5 identicon over a two-color diagonal gradient
+- Banners (1200x400): diagonal gradient with soft color blobs and light bands
+- Everything derives from blake2b(kind, id): the same id always gives the same
+  image, on any machine, offline
+- Pixels are computed as whole NumPy arrays (no per-pixel Python loops) and
+  saved straight to WebP; batches are spread over a process pool
+- Files are named <kind>_<digest>_<w>x<h>.webp, so an existing file is a cache
+  hit; RENDER_VERSION is part of the digest and invalidates old renders
+
+Usage:
+  path = ensure_image("avatar", user.id)              # one image, milliseconds
+  stats = generate("banner", user_ids, workers=8)     # batch over a process pool
+
+  python scripts/avatar_generator.py --count 60                   # seed avatars and banners
+  python scripts/avatar_generator.py --from-db --assign           # every user; fill empty avatar/backgroundImage
+
+Requires NumPy and Pillow (pip install numpy Pillow).
+"""
+
+import argparse
+import colorsys
+import hashlib
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+try:
+    import numpy as np
+    from PIL import Image
+except ImportError:
+    print("❌ NumPy/Pillow are not installed. Please install them first:")
+    print("   pip install numpy Pillow")
+    raise
+
+import fonana_trace
+from fonana_trace import span
+
+BASE_DIR = Path(__file__).parent.parent
+MEDIA_DIR = BASE_DIR / "public" / "media"
+
+# Bump when the rendering changes: every digest (and file name) changes with it
+RENDER_VERSION = 1
+
+KINDS = {
+    # kind: (default size, output directory, public URL prefix)
+    "avatar": ((400, 400), MEDIA_DIR / "avatars", "/media/avatars"),
+    "banner": ((1200, 400), MEDIA_DIR / "backgrounds", "/media/backgrounds"),
+}
+
+WEBP_QUALITY = 85
+DEFAULT_WORKERS = os.cpu_count() or 4
+
+
+def digest(kind, key):
+    return hashlib.blake2b(f"{kind}:{key}:v{RENDER_VERSION}".encode("utf-8"), digest_size=32).digest()
+
+
+def file_name(kind, key, size=None):
+    width, height = size or KINDS[kind][0]
+    return f"{kind}_{digest(kind, key).hex()[:32]}_{width}x{height}.webp"
+
+
+def public_url(kind, key, size=None):
+    return f"{KINDS[kind][2]}/{file_name(kind, key, size)}"
+
+
+def _palette(seed, count):
+    """`count` harmonious RGB colors (float 0..1) around a seeded base hue"""
+    base = seed[0] / 255
+    spread = 0.08 + seed[1] / 255 * 0.25
+    colors = []
+    for i in range(count):
+        hue = (base + spread * i) % 1.0
+        saturation = 0.55 + seed[2 + i % 4] / 255 * 0.35
+        value = 0.65 + seed[6 + i % 4] / 255 * 0.3
+        colors.append(colorsys.hsv_to_rgb(hue, saturation, value))
+    return np.array(colors, dtype=np.float32)
+
+
+def _gradient(width, height, start, end, angle):
+    """Linear gradient between two colors along `angle` (radians): (h, w, 3) float32"""
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    t = x / max(width - 1, 1) * np.cos(angle) + y / max(height - 1, 1) * np.sin(angle)
+    t = (t - t.min()) / max(float(t.max() - t.min()), 1e-6)
+    return start + (end - start) * t[..., None]
+
+
+def render_avatar(seed, width=400, height=400):
+    """Identicon: mirrored 5x5 cell pattern on a gradient, (h, w, 3) uint8"""
+    colors = _palette(seed, 3)
+    image = _gradient(width, height, colors[1] * 0.35 + 0.6, colors[2] * 0.35 + 0.5, seed[10] / 255 * np.pi / 2)
+
+    # 5x3 bits from the digest, mirrored into a symmetric 5x5 pattern
+    bits = np.unpackbits(np.frombuffer(seed[11:13], dtype=np.uint8))[:15].reshape(5, 3).astype(bool)
+    cells = np.concatenate([bits, bits[:, 1::-1]], axis=1)
+
+    margin = 0.12
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    gx = np.floor((x / width - margin) / (1 - 2 * margin) * 5).astype(np.int32)
+    gy = np.floor((y / height - margin) / (1 - 2 * margin) * 5).astype(np.int32)
+    inside = (gx >= 0) & (gx < 5) & (gy >= 0) & (gy < 5)
+    mask = np.zeros((height, width), dtype=bool)
+    mask[inside] = cells[gy[inside], gx[inside]]
+    image[mask] = colors[0] * 0.85
+    return (np.clip(image, 0, 1) * 255).astype(np.uint8)
+
+
+def render_banner(seed, width=1200, height=400):
+    """Gradient banner with soft blobs and faint diagonal bands, (h, w, 3) uint8"""
+    colors = _palette(seed, 4)
+    image = _gradient(width, height, colors[0] * 0.8, colors[1] * 0.9, seed[10] / 255 * np.pi / 3)
+
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    for i in range(3):
+        cx = seed[11 + i] / 255 * width
+        cy = seed[14 + i] / 255 * height
+        radius = (0.15 + seed[2 + i] / 255 * 0.25) * width
+        weight = np.exp(-((x - cx) ** 2 + (y - cy) ** 2) / (2 * radius ** 2))[..., None]
+        image = image * (1 - 0.6 * weight) + colors[2 + i % 2] * (0.6 * weight)
+
+    period = 60 + seed[9] % 80
+    bands = 0.5 + 0.5 * np.sin((x + y) * (2 * np.pi / period))
+    image *= (0.94 + 0.06 * bands)[..., None]
+    return (np.clip(image, 0, 1) * 255).astype(np.uint8)
+
+
+RENDERERS = {"avatar": render_avatar, "banner": render_banner}
+
+
+def render_to_file(job):
+    """Process pool entry point: (kind, key, (w, h), path) -> (path, rendered?)"""
+    kind, key, (width, height), path = job
+    if os.path.exists(path):
+        return path, False
+    pixels = RENDERERS[kind](digest(kind, key), width, height)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    Image.fromarray(pixels, "RGB").save(tmp, "WEBP", quality=WEBP_QUALITY, method=4)
+    os.replace(tmp, path)
+    return path, True
+
+
+def ensure_image(kind, key, size=None, out_dir=None):
+    """Path of the image for one id, rendered in-process if not cached yet"""
+    size = size or KINDS[kind][0]
+    out_dir = Path(out_dir or KINDS[kind][1])
+    out_dir.mkdir(parents=True, exist_ok=True)
+    path, _ = render_to_file((kind, key, size, str(out_dir / file_name(kind, key, size))))
+    return path
+
+
+def generate(kind, keys, size=None, out_dir=None, workers=DEFAULT_WORKERS):
+    """Render images for many ids; returns {"rendered", "cached", "paths"}"""
+    size = size or KINDS[kind][0]
+    out_dir = Path(out_dir or KINDS[kind][1])
+    out_dir.mkdir(parents=True, exist_ok=True)
+    jobs = [(kind, key, size, str(out_dir / file_name(kind, key, size))) for key in keys]
+    pending = [job for job in jobs if not os.path.exists(job[3])]
+    stats = {"rendered": 0, "cached": len(jobs) - len(pending), "paths": [job[3] for job in jobs]}
+
+    with span(f"render {kind}s", rows=len(pending)):
+        if workers > 1 and len(pending) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = pool.map(render_to_file, pending, chunksize=max(1, len(pending) // (workers * 4)))
+                stats["rendered"] = sum(rendered for _, rendered in results)
+        else:
+            stats["rendered"] = sum(render_to_file(job)[1] for job in pending)
+    return stats
+
+
+def user_ids_from_db():
+    """(id, avatar, backgroundImage) for every user"""
+    import fonana_db
+
+    with fonana_db.connection() as conn:
+        for batch in fonana_db.stream_batches(conn, 'SELECT id, avatar, "backgroundImage" FROM users ORDER BY id'):
+            yield from batch
+
+
+def assign_missing(users, kinds=tuple(KINDS)):
+    """Point empty users.avatar / backgroundImage at the generated files; returns rows updated"""
+    import psycopg2.extras
+
+    import fonana_db
+
+    rows = [
+        (user_id,
+         avatar or (public_url("avatar", user_id) if "avatar" in kinds else None),
+         background or (public_url("banner", user_id) if "banner" in kinds else None))
+        for user_id, avatar, background in users
+        if (not avatar and "avatar" in kinds) or (not background and "banner" in kinds)
+    ]
+    if not rows:
+        return 0
+    with fonana_db.connection() as conn:
+        cursor = conn.cursor()
+        # RETURNING counts every page (rowcount would only cover the last one)
+        updated = len(psycopg2.extras.execute_values(cursor, """
+            UPDATE users AS u SET avatar = v.avatar, "backgroundImage" = v.background
+            FROM (VALUES %s) AS v(id, avatar, background)
+            WHERE u.id = v.id
+            RETURNING u.id
+        """, rows, page_size=1000, fetch=True))
+        conn.commit()
+        cursor.close()
+    return updated
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render deterministic avatars and banners as WebP")
+    parser.add_argument("ids", nargs="*", help="user ids to render")
+    parser.add_argument("--count", type=int, default=0, help="also render N seed ids (seed-0 .. seed-N-1)")
+    parser.add_argument("--from-db", action="store_true", help="render for every users.id")
+    parser.add_argument("--assign", action="store_true", help="with --from-db: fill empty avatar/backgroundImage")
+    parser.add_argument("--kind", choices=sorted(KINDS), action="append", help="avatar and/or banner (default both)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="render processes")
+    fonana_trace.add_arguments(parser)
+    args = parser.parse_args(argv)
+    if args.assign and not args.from_db:
+        parser.error("--assign requires --from-db")
+    fonana_trace.configure(args)
+
+    users = list(user_ids_from_db()) if args.from_db else []
+    keys = list(args.ids) + [f"seed-{i}" for i in range(args.count)] + [user[0] for user in users]
+    if not keys:
+        parser.error("nothing to render: pass ids, --count or --from-db")
+
+    start = time.time()
+    kinds = args.kind or sorted(KINDS)
+    for kind in kinds:
+        stats = generate(kind, keys, workers=args.workers)
+        print(f"🎨 {kind}s: {stats['rendered']} rendered, {stats['cached']} cached → {KINDS[kind][1]}")
+    if args.assign and users:
+        print(f"🔗 Assigned generated media to {assign_missing(users, kinds)} users")
+    print(f"⏱️  Done in {time.time() - start:.1f} seconds")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Fonana bulk-load mode for the importers
+
+- Secondary indexes of the target tables (non-unique, not backing a constraint,
+  so primary keys and ON CONFLICT targets stay in place) are recorded to a
+  state file and dropped before the load
+- After the load they are rebuilt with CREATE INDEX CONCURRENTLY, one
+  dedicated autocommit connection per build; tables are built in parallel,
+  the indexes of one table one after another (PostgreSQL runs only one
+  concurrent build per table, a second one deadlocks against it)
+- Input rows are sorted by their parent key (creatorId / postId / userId) so
+  related rows land in neighbouring heap pages
+- ANALYZE runs on every touched table so the planner sees fresh statistics
+  right away instead of after autovacuum
+
+If a load dies half way, the state file still holds the dropped definitions:
+  python scripts/bulk_load.py --rebuild            # recreate indexes from the state file
+  python scripts/bulk_load.py --list posts likes   # show what bulk mode would drop
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import psycopg2
+
+import fonana_db
+from fonana_db import quote_ident
+from fonana_trace import span
+
+STATE_FILE = os.environ.get(
+    "FONANA_BULK_STATE",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".bulk_load_indexes.json"),
+)
+
+# Parallel CREATE INDEX CONCURRENTLY builds (each on its own connection)
+DEFAULT_WORKERS = int(os.environ.get("FONANA_INDEX_WORKERS", 4))
+
+# entity -> sort key columns for physical locality (parent key first)
+SORT_KEYS = {
+    "posts": ("creatorId", "createdAt"),
+    "comments": ("postId", "createdAt"),
+    "likes": ("postId", "createdAt"),
+    "notifications": ("userId", "createdAt"),
+}
+
+
+def secondary_indexes(conn, tables):
+    """[{table, name, definition}] for indexes safe to drop during a load"""
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT t.relname, i.relname, pg_get_indexdef(x.indexrelid)
+        FROM pg_index x
+        JOIN pg_class i ON i.oid = x.indexrelid
+        JOIN pg_class t ON t.oid = x.indrelid
+        JOIN pg_namespace n ON n.oid = t.relnamespace
+        WHERE n.nspname = current_schema() AND t.relname = ANY(%s)
+          -- partitioned tables keep theirs: CREATE INDEX CONCURRENTLY is not allowed on them
+          AND t.relkind = 'r'
+          AND NOT x.indisprimary AND NOT x.indisunique
+          AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = x.indexrelid)
+        ORDER BY t.relname, i.relname
+    """, (list(tables),))
+    indexes = [{"table": t, "name": i, "definition": d} for t, i, d in cursor.fetchall()]
+    cursor.close()
+    return indexes
+
+
+def drop_indexes(conn, tables, state_file=STATE_FILE):
+    """Record secondary indexes to the state file, then drop them; returns the records"""
+    indexes = secondary_indexes(conn, tables)
+    if not indexes:
+        return []
+    # Merge with an unfinished previous run so no definition is ever lost
+    pending = load_state(state_file)
+    known = {index["name"] for index in pending}
+    save_state(state_file, pending + [index for index in indexes if index["name"] not in known])
+
+    cursor = conn.cursor()
+    with span("drop-indexes"):
+        for index in indexes:
+            cursor.execute(f"DROP INDEX IF EXISTS {quote_ident(index['name'])}")
+    conn.commit()
+    cursor.close()
+    return indexes
+
+
+def concurrent_definition(definition):
+    """CREATE INDEX ... -> CREATE INDEX CONCURRENTLY IF NOT EXISTS ..."""
+    return re.sub(r"^CREATE INDEX ", "CREATE INDEX CONCURRENTLY IF NOT EXISTS ", definition, count=1)
+
+
+def _build_index(index):
+    started = time.time()
+    conn = fonana_db.connect(autocommit=True)
+    cursor = conn.cursor()
+    try:
+        with span(f"index {index['name']}", cat="batch"):
+            cursor.execute(concurrent_definition(index["definition"]))
+        error = None
+    except psycopg2.Error as e:
+        # A failed concurrent build leaves an INVALID index behind
+        cursor.execute(f"DROP INDEX IF EXISTS {quote_ident(index['name'])}")
+        error = str(e).strip()
+    finally:
+        conn.close()
+    return {"name": index["name"], "table": index["table"],
+            "seconds": round(time.time() - started, 2), "error": error}
+
+
+def _build_table_indexes(indexes):
+    return [_build_index(index) for index in indexes]
+
+
+def rebuild_indexes(indexes, workers=DEFAULT_WORKERS, state_file=STATE_FILE):
+    """Recreate indexes, tables in parallel; rebuilt ones are removed from the state file"""
+    if not indexes:
+        return []
+    by_table = {}
+    for index in indexes:
+        by_table.setdefault(index["table"], []).append(index)
+    with span("rebuild-indexes"):
+        with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="index") as pool:
+            results = [result for table_results in pool.map(_build_table_indexes, by_table.values())
+                       for result in table_results]
+    built = {r["name"] for r in results if r["error"] is None}
+    remaining = [index for index in load_state(state_file) if index["name"] not in built]
+    if remaining:
+        save_state(state_file, remaining)
+    elif os.path.exists(state_file):
+        os.remove(state_file)
+    return results
+
+
+def analyze(conn, tables):
+    """ANALYZE each touched table; returns seconds per table"""
+    timings = {}
+    cursor = conn.cursor()
+    with span("analyze"):
+        for table in tables:
+            started = time.time()
+            cursor.execute(f"ANALYZE {quote_ident(table)}")
+            timings[table] = round(time.time() - started, 2)
+    conn.commit()
+    cursor.close()
+    return timings
+
+
+def sort_rows(entity_name, rows):
+    """Rows ordered by parent key for physical locality (missing keys sort first)"""
+    keys = SORT_KEYS.get(entity_name)
+    if not keys:
+        return rows
+    return sorted(rows, key=lambda row: tuple(str(row.get(k) or "") for k in keys))
+
+
+def load_state(state_file=STATE_FILE):
+    if not os.path.exists(state_file):
+        return []
+    with open(state_file) as f:
+        return json.load(f)
+
+
+def save_state(state_file, indexes):
+    with open(state_file, "w") as f:
+        json.dump(indexes, f, indent=2)
+
+
+class BulkLoad:
+    """drop -> load -> rebuild -> analyze, with a report for the import summary"""
+
+    def __init__(self, tables, workers=DEFAULT_WORKERS, state_file=STATE_FILE):
+        self.tables = list(tables)
+        self.workers = workers
+        self.state_file = state_file
+        self.dropped = []
+        self.rebuilt = []
+        self.analyzed = {}
+
+    def before(self, conn):
+        self.dropped = drop_indexes(conn, self.tables, self.state_file)
+        return self.dropped
+
+    def after(self, conn):
+        # CONCURRENTLY waits for open transactions that could see the table
+        conn.commit()
+        self.rebuilt = rebuild_indexes(self.dropped, self.workers, self.state_file)
+        self.analyzed = analyze(conn, self.tables)
+
+    def print_report(self):
+        print("🏗️ Bulk-load mode:")
+        print(f"   - Secondary indexes dropped: {len(self.dropped)}")
+        for result in self.rebuilt:
+            status = "✅" if result["error"] is None else f"❌ {result['error']}"
+            print(f"     {result['table']}.{result['name']}: {result['seconds']}s {status}")
+        failed = [r for r in self.rebuilt if r["error"] is not None]
+        if failed:
+            print(f"   ⚠️  {len(failed)} indexes failed to rebuild, definitions kept in {self.state_file}")
+            print("      Retry with: python scripts/bulk_load.py --rebuild")
+        for table, seconds in self.analyzed.items():
+            print(f"   - ANALYZE {table}: {seconds}s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect or recover bulk-load index state")
+    parser.add_argument("tables", nargs="*", help="tables for --list")
+    parser.add_argument("--list", action="store_true", help="show the secondary indexes bulk mode would drop")
+    parser.add_argument("--rebuild", action="store_true", help="recreate indexes recorded in the state file")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="parallel index builds")
+    args = parser.parse_args(argv)
+
+    if args.rebuild:
+        pending = load_state()
+        print(f"🏗️ Rebuilding {len(pending)} indexes from {STATE_FILE}")
+        results = rebuild_indexes(pending, args.workers)
+        for result in results:
+            status = "✅" if result["error"] is None else f"❌ {result['error']}"
+            print(f"   {result['table']}.{result['name']}: {result['seconds']}s {status}")
+        return all(result["error"] is None for result in results)
+
+    with fonana_db.connection() as conn:
+        for index in secondary_indexes(conn, args.tables):
+            print(f"{index['table']}: {index['definition']}")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
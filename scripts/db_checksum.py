@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+Fonana Table Checksum Verifier
+Merkle-style source/target verification over hashed key ranges
+
+- One scan per table and side: GROUP BY over 4096 leaf ranges (first 12 bits of
+  md5(primary key)), each leaf holds count(*) and the sum of 64-bit row hashes
+- The tree (16 -> 256 -> 4096) is folded from the leaves in memory and only
+  differing nodes are descended into
+- Per-row hashes are fetched only for differing leaves -> exact mismatched keys
+
+A side is either a PostgreSQL table (PostgresSource) or expected rows computed
+in Python (RowsSource).
+"""
+
+import argparse
+import hashlib
+import sys
+
+LEAF_HEX = 3            # 3 hex digits = 12 bits = 4096 leaves
+FANOUT_HEX = 1          # each tree level expands one hex digit (16 children)
+FIELD_SEP = "\x1f"
+KEY_SEP = "\x1e"
+NULL_MARK = "\\N"
+
+# Tables verified by default (key and columns come from the catalog)
+DEFAULT_TABLES = ["users", "posts", "comments", "likes", "notifications", "tags"]
+
+
+def quote_ident(name):
+    """Quote a PostgreSQL identifier"""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def pg_text(value):
+    """Text form of a value as PostgreSQL renders it (col::text)"""
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+def row_text(values):
+    """Canonical row string for hashing (matches the SQL concat_ws expression)"""
+    return FIELD_SEP.join(NULL_MARK if v is None else v for v in values)
+
+
+def leaf_of(key):
+    """Leaf range number for a key"""
+    return int(hashlib.md5(key.encode("utf-8")).hexdigest()[:LEAF_HEX], 16)
+
+
+def row_digest(key, values):
+    """Full md5 of a row (key + values)"""
+    return hashlib.md5((key + KEY_SEP + row_text(values)).encode("utf-8")).hexdigest()
+
+
+def digest_to_int(digest):
+    """First 64 bits of an md5 as a signed bigint, like ('x'||substr(..))::bit(64)::bigint"""
+    return int.from_bytes(bytes.fromhex(digest[:16]), "big", signed=True)
+
+
+class PostgresSource:
+    """Verification side backed by a PostgreSQL table"""
+
+    def __init__(self, conn, table, key, columns, label=None):
+        self.conn = conn
+        self.table = table
+        self.key = key
+        self.columns = list(columns)
+        self.label = label or table
+
+    def _base_sql(self):
+        fields = ", ".join(
+            f"coalesce({quote_ident(c)}::text, E'\\\\N')" for c in self.columns
+        )
+        row_sql = f"concat_ws(E'\\x1f', {fields})" if self.columns else "''"
+        return (
+            f"SELECT {quote_ident(self.key)}::text AS k, {row_sql} AS r "
+            f"FROM {quote_ident(self.table)}"
+        )
+
+    def leaf_digests(self):
+        """Single scan: {leaf: (rows, hash_sum)}"""
+        cursor = self.conn.cursor()
+        cursor.execute(f"""
+            SELECT ('x' || substr(md5(k), 1, {LEAF_HEX}))::bit({LEAF_HEX * 4})::int AS leaf,
+                   count(*),
+                   sum(('x' || substr(md5(k || E'\\x1e' || r), 1, 16))::bit(64)::bigint)
+            FROM ({self._base_sql()}) s
+            GROUP BY 1
+        """)
+        leaves = {leaf: (count, int(total)) for leaf, count, total in cursor.fetchall()}
+        cursor.close()
+        return leaves
+
+    def row_hashes(self, leaves):
+        """Per-row hashes for the given leaves only: {key: md5}"""
+        if not leaves:
+            return {}
+        cursor = self.conn.cursor()
+        cursor.execute(f"""
+            SELECT k, md5(k || E'\\x1e' || r)
+            FROM ({self._base_sql()}) s
+            WHERE ('x' || substr(md5(k), 1, {LEAF_HEX}))::bit({LEAF_HEX * 4})::int = ANY(%s)
+        """, (sorted(leaves),))
+        rows = dict(cursor.fetchall())
+        cursor.close()
+        return rows
+
+
+class RowsSource:
+    """Verification side backed by expected rows computed on the client
+
+    rows_factory() must return a fresh iterable of (key, values) pairs on every
+    call, where values is a tuple of pg_text() strings (None for NULL).
+    """
+
+    def __init__(self, rows_factory, label="expected"):
+        self.rows_factory = rows_factory
+        self.label = label
+
+    def leaf_digests(self):
+        leaves = {}
+        for key, values in self.rows_factory():
+            key = str(key)
+            leaf = leaf_of(key)
+            count, total = leaves.get(leaf, (0, 0))
+            leaves[leaf] = (count + 1, total + digest_to_int(row_digest(key, values)))
+        return leaves
+
+    def row_hashes(self, leaves):
+        wanted = set(leaves)
+        rows = {}
+        for key, values in self.rows_factory():
+            key = str(key)
+            if leaf_of(key) in wanted:
+                rows[key] = row_digest(key, values)
+        return rows
+
+
+def _node_digests(leaves, depth):
+    """Fold leaves up to tree level `depth` (number of hex prefix digits)"""
+    shift = (LEAF_HEX - depth) * 4
+    nodes = {}
+    for leaf, (count, total) in leaves.items():
+        node = leaf >> shift
+        c, t = nodes.get(node, (0, 0))
+        nodes[node] = (c + count, t + total)
+    return nodes
+
+
+def diff_leaves(source_leaves, target_leaves):
+    """Walk down from the root into differing nodes only -> (differing leaves, nodes per level)"""
+    candidates = {0}
+    visited = []
+    for depth in range(0, LEAF_HEX + 1, FANOUT_HEX):
+        src = _node_digests(source_leaves, depth)
+        dst = _node_digests(target_leaves, depth)
+        if depth == 0:
+            level = {0}
+        else:
+            level = {
+                (parent << (FANOUT_HEX * 4)) | child
+                for parent in candidates
+                for child in range(16 ** FANOUT_HEX)
+            }
+        candidates = {n for n in level if src.get(n, (0, 0)) != dst.get(n, (0, 0))}
+        visited.append(len(candidates))
+        if not candidates:
+            break
+    return candidates, visited
+
+
+def verify_table(source, target, table=None):
+    """Compare two sides and return a report with the exact mismatched keys"""
+    source_leaves = source.leaf_digests()
+    target_leaves = target.leaf_digests()
+
+    leaves, per_level = diff_leaves(source_leaves, target_leaves)
+
+    missing, extra, changed = [], [], []
+    if leaves:
+        source_rows = source.row_hashes(leaves)
+        target_rows = target.row_hashes(leaves)
+        for key, digest in source_rows.items():
+            if key not in target_rows:
+                missing.append(key)
+            elif target_rows[key] != digest:
+                changed.append(key)
+        extra = [key for key in target_rows if key not in source_rows]
+
+    return {
+        "table": table or getattr(target, "table", None) or target.label,
+        "ok": not (missing or extra or changed),
+        "source_rows": sum(c for c, _ in source_leaves.values()),
+        "target_rows": sum(c for c, _ in target_leaves.values()),
+        "differing_nodes": per_level,
+        "missing": sorted(missing),
+        "extra": sorted(extra),
+        "changed": sorted(changed),
+    }
+
+
+def print_report(report, limit=20):
+    """Print a verification report"""
+    status = "✅" if report["ok"] else "❌"
+    print(f"{status} {report['table']}: source={report['source_rows']} target={report['target_rows']}"
+          f" (differing nodes per level: {report['differing_nodes']})")
+    for kind in ("missing", "extra", "changed"):
+        keys = report[kind]
+        if keys:
+            shown = ", ".join(keys[:limit])
+            more = f" ... (+{len(keys) - limit})" if len(keys) > limit else ""
+            print(f"   - {kind}: {len(keys)}: {shown}{more}")
+
+
+def table_key(conn, table):
+    """Single-column primary key of a table"""
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT a.attname
+        FROM pg_index i
+        JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey)
+        WHERE i.indrelid = %s::regclass AND i.indisprimary
+    """, (quote_ident(table),))
+    keys = [row[0] for row in cursor.fetchall()]
+    cursor.close()
+    if len(keys) != 1:
+        raise ValueError(f"{table}: expected a single-column primary key, got {keys}")
+    return keys[0]
+
+
+def table_columns(conn, table):
+    """Table columns in declaration order"""
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT column_name FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = %s
+        ORDER BY ordinal_position
+    """, (table,))
+    columns = [row[0] for row in cursor.fetchall()]
+    cursor.close()
+    return columns
+
+
+def verify_databases(source_conn, target_conn, tables, columns=None):
+    """Verify a set of tables between two databases over their common columns"""
+    reports = []
+    for table in tables:
+        key = table_key(target_conn, table)
+        if columns:
+            common = [c for c in columns if c != key]
+        else:
+            source_cols = set(table_columns(source_conn, table))
+            common = [c for c in table_columns(target_conn, table) if c in source_cols and c != key]
+        report = verify_table(
+            PostgresSource(source_conn, table, key, common, label="source"),
+            PostgresSource(target_conn, table, key, common, label="target"),
+            table,
+        )
+        reports.append(report)
+    return reports
+
+
+def main():
+    """CLI: verify tables between two databases"""
+    import psycopg2
+
+    parser = argparse.ArgumentParser(description="Merkle-style checksum verification of tables")
+    parser.add_argument("--source", required=True, help="source DSN (e.g. Supabase)")
+    parser.add_argument("--target", required=True, help="target DSN (local PostgreSQL)")
+    parser.add_argument("--table", action="append", dest="tables",
+                        help="table to verify (repeatable, default: core tables)")
+    parser.add_argument("--columns", help="comma-separated columns to compare (default: common columns)")
+    args = parser.parse_args()
+
+    source_conn = psycopg2.connect(args.source)
+    target_conn = psycopg2.connect(args.target)
+    try:
+        columns = args.columns.split(",") if args.columns else None
+        reports = verify_databases(source_conn, target_conn, args.tables or DEFAULT_TABLES, columns)
+    finally:
+        source_conn.close()
+        target_conn.close()
+
+    for report in reports:
+        print_report(report)
+    return all(r["ok"] for r in reports)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
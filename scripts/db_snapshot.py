@@ -0,0 +1,451 @@
+#!/usr/bin/env python3
+"""
+Fonana Columnar Snapshots
+Export/restore tables as compressed, typed columnar files
+
+- One file per table: Parquet (zstd) or Arrow IPC (memory-mappable, lz4/zstd)
+- Column types come from the PostgreSQL catalog; enums are dictionary-encoded,
+  types without a native Arrow mapping (numeric, json, arrays) are stored as text
+- manifest.json records columns, row counts and per-row-group min/max stats
+- Reads support column projection and row-group skipping (--where col>=value),
+  and restore goes straight into COPY (fonana_db.copy_rows)
+
+Usage:
+  python scripts/db_snapshot.py export --out snapshots/staging
+  python scripts/db_snapshot.py import --snapshot snapshots/staging --truncate
+  python scripts/db_snapshot.py info --snapshot snapshots/staging
+
+Requires pyarrow (pip install pyarrow).
+"""
+
+import argparse
+import datetime
+import json
+import operator
+import sys
+import time
+from pathlib import Path
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.ipc
+    import pyarrow.parquet as pq
+except ImportError:
+    print("❌ pyarrow is not installed. Please install it first:")
+    print("   pip install pyarrow")
+    raise
+
+import fonana_db
+import fonana_trace
+from fonana_db import quote_ident
+from fonana_trace import span
+
+MANIFEST = "manifest.json"
+DEFAULT_ROW_GROUP_SIZE = 50000
+
+# Tables exported by default, in load order
+DEFAULT_TABLES = [
+    "users", "posts", "tags", "post_tags", "comments", "likes", "subscriptions",
+    "follows", "post_purchases", "transactions", "notifications",
+]
+
+# PostgreSQL data_type -> Arrow type; anything else is exported as ::text
+ARROW_TYPES = {
+    "text": pa.string(),
+    "character varying": pa.string(),
+    "character": pa.string(),
+    "integer": pa.int32(),
+    "bigint": pa.int64(),
+    "smallint": pa.int16(),
+    "boolean": pa.bool_(),
+    "double precision": pa.float64(),
+    "real": pa.float32(),
+    "timestamp without time zone": pa.timestamp("us"),
+    "timestamp with time zone": pa.timestamp("us", tz="UTC"),
+    "date": pa.date32(),
+    "USER-DEFINED": pa.dictionary(pa.int32(), pa.string()),
+}
+
+FILTER_OPS = {
+    ">=": operator.ge, "<=": operator.le, ">": operator.gt, "<": operator.lt, "=": operator.eq,
+}
+
+
+def table_schema(conn, table):
+    """[(column, data_type)] for a table, in declaration order"""
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT column_name, data_type FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = %s
+        ORDER BY ordinal_position
+    """, (table,))
+    columns = cursor.fetchall()
+    cursor.close()
+    return columns
+
+
+def column_spec(name, data_type):
+    """Manifest entry for one column"""
+    arrow_type = ARROW_TYPES.get(data_type, pa.string())
+    return {
+        "name": name,
+        "pg_type": data_type,
+        "arrow_type": str(arrow_type),
+        # Exported as text when Arrow has no native type or for enums
+        "as_text": data_type not in ARROW_TYPES or data_type == "USER-DEFINED",
+    }
+
+
+def arrow_schema(columns):
+    return pa.schema([
+        pa.field(c["name"], ARROW_TYPES.get(c["pg_type"], pa.string())) for c in columns
+    ])
+
+
+def _stat_value(value):
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    return value
+
+
+def batch_stats(batch):
+    """Per-column min/max of a record batch (for row-group skipping)"""
+    stats = {}
+    for name, column in zip(batch.schema.names, batch.columns):
+        if pa.types.is_dictionary(column.type) or pa.types.is_boolean(column.type):
+            continue
+        try:
+            result = pc.min_max(column)
+        except (pa.ArrowNotImplementedError, pa.ArrowInvalid):
+            continue
+        low, high = result["min"].as_py(), result["max"].as_py()
+        if low is not None:
+            stats[name] = [_stat_value(low), _stat_value(high)]
+    return stats
+
+
+def _array(values, field, dictionary=None):
+    """Arrow array for one column of a batch
+
+    Dictionary columns are encoded against `dictionary` (value -> index), which
+    keeps growing across the table's batches, so every batch's dictionary
+    extends the previous one.
+    """
+    if dictionary is None:
+        return pa.array(list(values), type=field.type)
+    indices = [None if v is None else dictionary.setdefault(v, len(dictionary)) for v in values]
+    return pa.DictionaryArray.from_arrays(
+        pa.array(indices, type=field.type.index_type), pa.array(list(dictionary), type=field.type.value_type)
+    )
+
+
+class SnapshotWriter:
+    """Writes tables into a snapshot directory and keeps the manifest"""
+
+    def __init__(self, out_dir, fmt="parquet", compression="zstd", row_group_size=DEFAULT_ROW_GROUP_SIZE):
+        self.out_dir = Path(out_dir)
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        self.format = fmt
+        self.compression = compression
+        self.row_group_size = row_group_size
+        self.manifest = {
+            "format": fmt,
+            "compression": compression,
+            "created_at": datetime.datetime.now().isoformat(timespec="seconds"),
+            "tables": {},
+        }
+
+    def write_table(self, table, columns, row_batches):
+        """Write an iterable of row-tuple batches; columns are manifest column specs"""
+        schema = arrow_schema(columns)
+        suffix = "parquet" if self.format == "parquet" else "arrow"
+        path = self.out_dir / f"{table}.{suffix}"
+
+        if self.format == "parquet":
+            writer = pq.ParquetWriter(path, schema, compression=self.compression)
+        else:
+            # IPC files allow one dictionary per field plus deltas, so enum
+            # dictionaries only ever grow (see _array)
+            options = pa.ipc.IpcWriteOptions(compression=self.compression, emit_dictionary_deltas=True)
+            sink = pa.OSFile(str(path), "wb")
+            writer = pa.ipc.new_file(sink, schema, options=options)
+
+        dictionaries = {field.name: {} for field in schema if pa.types.is_dictionary(field.type)}
+        row_groups = []
+        try:
+            for rows in row_batches:
+                if not rows:
+                    continue
+                arrays = [
+                    _array(values, field, dictionaries.get(field.name))
+                    for values, field in zip(zip(*rows), schema)
+                ]
+                batch = pa.RecordBatch.from_arrays(arrays, schema=schema)
+                if self.format == "parquet":
+                    writer.write_table(pa.Table.from_batches([batch]), row_group_size=len(rows))
+                else:
+                    writer.write_batch(batch)
+                row_groups.append({"rows": len(rows), "stats": batch_stats(batch)})
+                fonana_trace.count(rows=len(rows))
+        finally:
+            writer.close()
+            if self.format != "parquet":
+                sink.close()
+
+        self.manifest["tables"][table] = {
+            "file": path.name,
+            "columns": columns,
+            "rows": sum(g["rows"] for g in row_groups),
+            "bytes": path.stat().st_size,
+            "row_groups": row_groups,
+        }
+        fonana_trace.count(bytes=path.stat().st_size)
+        return self.manifest["tables"][table]
+
+    def close(self):
+        with open(self.out_dir / MANIFEST, "w") as f:
+            json.dump(self.manifest, f, indent=2, ensure_ascii=False)
+
+
+def export_table(conn, reader_conn, writer, table, row_group_size=DEFAULT_ROW_GROUP_SIZE, where=None):
+    """Stream one table from PostgreSQL into the snapshot (optionally only rows matching a SQL `where`)"""
+    columns = [column_spec(name, data_type) for name, data_type in table_schema(conn, table)]
+    if not columns:
+        raise ValueError(f"table {table} not found")
+    select = ", ".join(
+        f"{quote_ident(c['name'])}::text" if c["as_text"] else quote_ident(c["name"])
+        for c in columns
+    )
+    names = [c["name"] for c in columns]
+    order = "id" if "id" in names else names[0]
+    condition = f"WHERE {where} " if where else ""
+    batches = fonana_db.stream_batches(
+        reader_conn, f"SELECT {select} FROM {quote_ident(table)} {condition}ORDER BY {quote_ident(order)}",
+        itersize=row_group_size,
+    )
+    return writer.write_table(table, columns, batches)
+
+
+def load_manifest(snapshot_dir):
+    with open(Path(snapshot_dir) / MANIFEST) as f:
+        return json.load(f)
+
+
+def parse_where(expression):
+    """'createdAt>=2025-07-01' -> ('createdAt', '>=', '2025-07-01')
+
+    The column may be scoped to one table: 'posts.createdAt>=2025-07-01'.
+    """
+    for op in (">=", "<=", ">", "<", "="):
+        if op in expression:
+            column, value = expression.split(op, 1)
+            return column.strip(), op, value.strip()
+    raise ValueError(f"unsupported filter: {expression}")
+
+
+def table_plan(table, entry, columns=None, where=None):
+    """(columns, filters) for restoring one table, or None when the table does not apply
+
+    'table.column' filters apply to that table only; unscoped filters and the
+    column projection apply to every table that has all of their columns, and
+    tables lacking one are skipped rather than restored unfiltered.
+    """
+    available = {c["name"] for c in entry["columns"]}
+    filters = []
+    for column, op, value in where or []:
+        scope, _, name = column.rpartition(".")
+        if scope and scope != table:
+            continue
+        if name not in available:
+            if scope:
+                raise ValueError(f"{table}: no column {name!r} for filter {column}{op}{value}")
+            return None
+        filters.append((name, op, value))
+    names = list(columns) if columns else [c["name"] for c in entry["columns"]]
+    if any(name not in available for name in names):
+        return None
+    return names, filters
+
+
+def _coerce(value, pg_type):
+    """Convert a filter/stat value to a comparable Python value for the column type"""
+    if value is None:
+        return None
+    if pg_type.startswith("timestamp"):
+        parsed = datetime.datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+        return parsed.replace(tzinfo=None) if parsed.tzinfo else parsed
+    if pg_type == "date":
+        return datetime.date.fromisoformat(str(value)[:10])
+    if pg_type in ("integer", "bigint", "smallint"):
+        return int(value)
+    if pg_type in ("double precision", "real"):
+        return float(value)
+    return str(value)
+
+
+def _group_may_match(group, filters, types):
+    """False when row-group stats prove no row can satisfy every filter"""
+    for column, op, value in filters:
+        bounds = group["stats"].get(column)
+        if not bounds:
+            continue
+        low, high = (_coerce(b, types[column]) for b in bounds)
+        target = _coerce(value, types[column])
+        if op in (">=", ">") and not FILTER_OPS[op](high, target):
+            return False
+        if op in ("<=", "<") and not FILTER_OPS[op](low, target):
+            return False
+        if op == "=" and not (low <= target <= high):
+            return False
+    return True
+
+
+def _row_mask(batch, filters, types):
+    mask = None
+    for column, op, value in filters:
+        field = batch.schema.field(column)
+        target = _coerce(value, types[column])
+        scalar = pa.scalar(target, type=field.type if not pa.types.is_dictionary(field.type) else pa.string())
+        values = batch.column(column)
+        if pa.types.is_dictionary(field.type):
+            values = values.cast(pa.string())
+        condition = {
+            ">=": pc.greater_equal, "<=": pc.less_equal, ">": pc.greater, "<": pc.less, "=": pc.equal,
+        }[op](values, scalar)
+        mask = condition if mask is None else pc.and_(mask, condition)
+    return mask
+
+
+def read_batches(snapshot_dir, table, columns=None, where=None, manifest=None):
+    """Yield record batches of a table with projection and row-group skipping
+
+    `where` is a list of (column, op, value); row groups whose min/max stats
+    exclude a match are never read, remaining rows are filtered in Arrow.
+    """
+    manifest = manifest or load_manifest(snapshot_dir)
+    entry = manifest["tables"][table]
+    types = {c["name"]: c["pg_type"] for c in entry["columns"]}
+    where = where or []
+    wanted = list(columns) if columns else [c["name"] for c in entry["columns"]]
+    read_columns = list(dict.fromkeys(wanted + [c for c, _, _ in where]))
+    path = Path(snapshot_dir) / entry["file"]
+
+    groups = [i for i, g in enumerate(entry["row_groups"]) if _group_may_match(g, where, types)]
+
+    if manifest["format"] == "parquet":
+        parquet = pq.ParquetFile(path, memory_map=True)
+        reader = (parquet.read_row_group(i, columns=read_columns) for i in groups)
+        batches = (b for t in reader for b in t.to_batches())
+    else:
+        source = pa.memory_map(str(path), "r")
+        ipc = pa.ipc.open_file(source)
+        batches = (ipc.get_batch(i).select(read_columns) for i in groups)
+
+    for batch in batches:
+        if where:
+            batch = batch.filter(_row_mask(batch, where, types))
+        if batch.num_rows:
+            yield batch.select(wanted)
+
+
+def iter_rows(batches):
+    """Record batches -> row tuples"""
+    for batch in batches:
+        for row in zip(*(column.to_pylist() for column in batch.columns)):
+            yield row
+
+
+def restore_snapshot(conn, snapshot_dir, tables=None, columns=None, where=None, truncate=False):
+    """COPY snapshot tables into the database (in manifest order); returns {table: rows}"""
+    manifest = load_manifest(snapshot_dir)
+    tables = [t for t in manifest["tables"] if not tables or t in tables]
+    plans = {table: table_plan(table, manifest["tables"][table], columns, where) for table in tables}
+    for table in [t for t in tables if plans[t] is None]:
+        print(f"⏭️  {table}: skipped, lacks a --columns/--where column (scope filters as table.column)")
+    tables = [t for t in tables if plans[t] is not None]
+    cursor = conn.cursor()
+    if truncate and tables:
+        cursor.execute(f"TRUNCATE {', '.join(quote_ident(t) for t in tables)} CASCADE")
+
+    loaded = {}
+    for table in tables:
+        names, filters = plans[table]
+        with span(f"restore {table}"):
+            rows = iter_rows(read_batches(snapshot_dir, table, names, filters, manifest))
+            loaded[table] = fonana_db.copy_rows(conn, table, names, rows)
+            fonana_trace.count(rows=loaded[table])
+        print(f"✅ {table}: {loaded[table]} rows restored")
+    cursor.close()
+    conn.commit()
+    return loaded
+
+
+def print_info(snapshot_dir):
+    manifest = load_manifest(snapshot_dir)
+    print(f"📦 Snapshot {snapshot_dir} ({manifest['format']}, {manifest['compression']}, "
+          f"created {manifest['created_at']})")
+    total = 0
+    for table, entry in manifest["tables"].items():
+        total += entry["bytes"]
+        print(f"   - {table}: {entry['rows']} rows, {len(entry['row_groups'])} row groups, "
+              f"{entry['bytes'] / 1024:.1f} KiB")
+    print(f"   Total: {total / 1024 / 1024:.2f} MiB")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Columnar snapshots of the Fonana database")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    export = sub.add_parser("export", help="export tables to a snapshot directory")
+    export.add_argument("--out", required=True)
+    export.add_argument("--table", action="append", dest="tables")
+    export.add_argument("--format", choices=["parquet", "ipc"], default="parquet")
+    export.add_argument("--compression", default="zstd")
+    export.add_argument("--row-group-size", type=int, default=DEFAULT_ROW_GROUP_SIZE)
+    fonana_trace.add_arguments(export)
+
+    restore = sub.add_parser("import", help="restore a snapshot through COPY")
+    restore.add_argument("--snapshot", required=True)
+    restore.add_argument("--table", action="append", dest="tables")
+    restore.add_argument("--columns", help="comma-separated column projection")
+    restore.add_argument("--where", action="append", default=[],
+                         help="row filter, e.g. createdAt>=2025-07-01 or posts.createdAt>=2025-07-01 (repeatable)")
+    restore.add_argument("--truncate", action="store_true", help="TRUNCATE ... CASCADE first")
+    fonana_trace.add_arguments(restore)
+
+    info = sub.add_parser("info", help="show snapshot contents")
+    info.add_argument("--snapshot", required=True)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if args.command == "info":
+        print_info(args.snapshot)
+        return True
+
+    fonana_trace.configure(args)
+    start = time.time()
+
+    if args.command == "export":
+        writer = SnapshotWriter(args.out, args.format, args.compression, args.row_group_size)
+        with fonana_db.connection() as conn, fonana_db.connection() as reader:
+            for table in args.tables or DEFAULT_TABLES:
+                with span(f"export {table}"):
+                    entry = export_table(conn, reader, writer, table, args.row_group_size)
+                print(f"✅ {table}: {entry['rows']} rows, {entry['bytes'] / 1024:.1f} KiB")
+        writer.close()
+    else:
+        where = [parse_where(w) for w in args.where]
+        columns = args.columns.split(",") if args.columns else None
+        with fonana_db.connection() as conn:
+            restore_snapshot(conn, args.snapshot, args.tables, columns, where, args.truncate)
+
+    print(f"🎉 Done in {time.time() - start:.1f} seconds")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
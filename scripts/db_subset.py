@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Fonana referentially consistent subset export/load for staging refreshes
+
+- Seed set: the top N creators (by followers), explicit --creator ids, and/or
+  posts created since a date
+- The seed is closed over the schema's foreign keys inside one REPEATABLE READ
+  snapshot of the source: posts -> comments -> likes, post_tags -> tags,
+  subscriptions/follows of the seed creators, then every user any of those
+  rows reference (including the referrer chain)
+- Keys are collected set-based into temp tables on the source; the rows are
+  then either written to a columnar snapshot (--out, see db_snapshot.py) or
+  streamed with COPY into the target (--load) under bulk-load mode
+  (secondary indexes deferred, ANALYZE at the end; see bulk_load.py)
+
+Usage:
+  python scripts/db_subset.py --source "$SUPABASE_DB_URL" --creators 10 --load --truncate
+  python scripts/db_subset.py --source "$SUPABASE_DB_URL" --since 2025-07-01 --out snapshots/staging
+  python scripts/db_subset.py --source "$SUPABASE_DB_URL" --creator cmbv53b7h0000qoe0vy4qwkap --dry-run
+
+The target is the usual fonana_db database (FONANA_DB_DSN / FONANA_DB_* env vars).
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import bulk_load
+import fonana_db
+import fonana_trace
+from fonana_db import quote_ident
+from fonana_trace import span
+
+# Load order: referenced tables first
+TABLES = ["users", "tags", "posts", "post_tags", "comments", "likes", "subscriptions", "follows"]
+
+# Row filter per table, in terms of the key temp tables built by collect_keys()
+ROW_FILTERS = {
+    "users": "id IN (SELECT id FROM subset_users)",
+    "tags": "id IN (SELECT id FROM subset_tags)",
+    "posts": "id IN (SELECT id FROM subset_posts)",
+    "post_tags": '"postId" IN (SELECT id FROM subset_posts)',
+    "comments": "id IN (SELECT id FROM subset_comments)",
+    "likes": "id IN (SELECT id FROM subset_likes)",
+    "subscriptions": "id IN (SELECT id FROM subset_subscriptions)",
+    "follows": "id IN (SELECT id FROM subset_follows)",
+}
+
+CLOSURE_SQL = [
+    # posts of the seed creators (optionally only recent ones)
+    """CREATE TEMP TABLE subset_posts AS
+       SELECT id FROM posts
+       WHERE ("creatorId" IN (SELECT id FROM subset_creators) OR %(creators_from_posts)s)
+         AND (%(since)s::timestamp IS NULL OR "createdAt" >= %(since)s::timestamp)""",
+    # with a date-only seed, the creators follow from the posts
+    """INSERT INTO subset_creators
+       SELECT DISTINCT "creatorId" FROM posts WHERE id IN (SELECT id FROM subset_posts)
+       ON CONFLICT DO NOTHING""",
+    """CREATE TEMP TABLE subset_comments AS
+       SELECT id FROM comments WHERE "postId" IN (SELECT id FROM subset_posts)""",
+    """CREATE TEMP TABLE subset_likes AS
+       SELECT id FROM likes
+       WHERE ("postId" IN (SELECT id FROM subset_posts) OR "commentId" IN (SELECT id FROM subset_comments))
+         AND ("postId" IS NULL OR "postId" IN (SELECT id FROM subset_posts))
+         AND ("commentId" IS NULL OR "commentId" IN (SELECT id FROM subset_comments))""",
+    """CREATE TEMP TABLE subset_tags AS
+       SELECT DISTINCT "tagId" AS id FROM post_tags WHERE "postId" IN (SELECT id FROM subset_posts)""",
+    """CREATE TEMP TABLE subset_subscriptions AS
+       SELECT id FROM subscriptions WHERE "creatorId" IN (SELECT id FROM subset_creators)""",
+    """CREATE TEMP TABLE subset_follows AS
+       SELECT id FROM follows WHERE "followingId" IN (SELECT id FROM subset_creators)""",
+    # every user referenced by the rows above, plus their referrer chains
+    """CREATE TEMP TABLE subset_users AS
+       WITH RECURSIVE referenced AS (
+           SELECT id FROM subset_creators
+           UNION SELECT "userId" FROM comments WHERE id IN (SELECT id FROM subset_comments)
+           UNION SELECT "userId" FROM likes WHERE id IN (SELECT id FROM subset_likes)
+           UNION SELECT "userId" FROM subscriptions WHERE id IN (SELECT id FROM subset_subscriptions)
+           UNION SELECT "followerId" FROM follows WHERE id IN (SELECT id FROM subset_follows)
+       ), chain AS (
+           SELECT id FROM referenced
+           UNION
+           SELECT u."referrerId" FROM users u JOIN chain c ON u.id = c.id WHERE u."referrerId" IS NOT NULL
+       )
+       SELECT id FROM chain""",
+]
+
+
+def collect_keys(conn, creators=0, creator_ids=(), since=None):
+    """Build subset_* key temp tables on the source; returns {table: key count}"""
+    cursor = conn.cursor()
+    # One consistent snapshot for key collection and export (not READ ONLY: temp tables are CREATEd)
+    cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+    cursor.execute("""
+        CREATE TEMP TABLE subset_creators (id text PRIMARY KEY);
+        INSERT INTO subset_creators
+        SELECT id FROM users WHERE id = ANY(%(ids)s)
+        UNION
+        (SELECT id FROM users WHERE "isCreator" AND %(limit)s > 0
+         ORDER BY "followersCount" DESC, "postsCount" DESC, id LIMIT %(limit)s)
+    """, {"ids": list(creator_ids), "limit": creators})
+    params = {
+        "since": since,
+        # no creator seed at all: every post since the date is a seed
+        "creators_from_posts": not creators and not creator_ids,
+    }
+    with span("collect-keys"):
+        for sql in CLOSURE_SQL:
+            cursor.execute(sql, params)
+
+    counts = {}
+    for table in TABLES:
+        cursor.execute(f"SELECT count(*) FROM {quote_ident(table)} WHERE {ROW_FILTERS[table]}")
+        counts[table] = cursor.fetchone()[0]
+    cursor.close()
+    return counts
+
+
+def text_columns(conn, table):
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT column_name FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = %s
+        ORDER BY ordinal_position
+    """, (table,))
+    columns = [row[0] for row in cursor.fetchall()]
+    cursor.close()
+    return columns
+
+
+def stream_table(source, table, columns):
+    """Subset rows as text (COPY-ready regardless of column types)"""
+    select = ", ".join(f"{quote_ident(c)}::text" for c in columns)
+    for batch in fonana_db.stream_batches(
+        source, f"SELECT {select} FROM {quote_ident(table)} WHERE {ROW_FILTERS[table]}"
+    ):
+        yield from batch
+
+
+def load_subset(source, target, truncate=False, index_workers=bulk_load.DEFAULT_WORKERS):
+    """COPY the subset into the target under bulk-load mode; returns (loaded, BulkLoad)"""
+    bulk = bulk_load.BulkLoad(TABLES, index_workers)
+    cursor = target.cursor()
+    if truncate:
+        cursor.execute(f"TRUNCATE {', '.join(quote_ident(t) for t in TABLES)} CASCADE")
+    bulk.before(target)
+
+    loaded = {}
+    try:
+        for table in TABLES:
+            # Only columns present on both sides (e.g. searchVector may exist on one only)
+            target_columns = set(text_columns(target, table))
+            columns = [c for c in text_columns(source, table) if c in target_columns]
+            column_list = ", ".join(quote_ident(c) for c in columns)
+            with span(f"load {table}"):
+                rows = stream_table(source, table, columns)
+                if truncate:
+                    loaded[table] = fonana_db.copy_rows(target, table, columns, rows)
+                else:
+                    cursor.execute("DROP TABLE IF EXISTS _subset_load")
+                    cursor.execute(
+                        f"CREATE TEMP TABLE _subset_load (LIKE {quote_ident(table)} INCLUDING DEFAULTS) ON COMMIT DROP"
+                    )
+                    loaded[table] = fonana_db.copy_rows(target, "_subset_load", columns, rows)
+                    cursor.execute(
+                        f"INSERT INTO {quote_ident(table)} ({column_list}) "
+                        f"SELECT {column_list} FROM _subset_load ON CONFLICT DO NOTHING"
+                    )
+                fonana_trace.count(rows=loaded[table])
+            target.commit()
+            print(f"✅ {table}: {loaded[table]} rows loaded")
+    finally:
+        cursor.close()
+        bulk.after(target)
+    return loaded, bulk
+
+
+def export_subset(source, out_dir):
+    """Write the subset as a columnar snapshot (restore with db_snapshot.py import)"""
+    import db_snapshot
+
+    writer = db_snapshot.SnapshotWriter(out_dir)
+    exported = {}
+    for table in TABLES:
+        with span(f"export {table}"):
+            exported[table] = db_snapshot.export_table(source, source, writer, table, where=ROW_FILTERS[table])
+        print(f"✅ {table}: {exported[table]['rows']} rows exported")
+    writer.close()
+    return exported
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Export or load a referentially closed subset for staging")
+    parser.add_argument("--source", default=os.environ.get("SUPABASE_DB_URL"),
+                        help="source database DSN (default: $SUPABASE_DB_URL)")
+    parser.add_argument("--creators", type=int, default=0, help="seed with the top N creators by followers")
+    parser.add_argument("--creator", action="append", default=[], metavar="ID", help="seed creator id (repeatable)")
+    parser.add_argument("--since", help="only posts created on/after this date (seeds creators if none given)")
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument("--load", action="store_true", help="COPY the subset into the target database")
+    mode.add_argument("--out", metavar="DIR", help="write the subset as a columnar snapshot")
+    mode.add_argument("--dry-run", action="store_true", help="only report subset sizes")
+    parser.add_argument("--truncate", action="store_true", help="with --load: empty the target tables first (TRUNCATE ... CASCADE)")
+    parser.add_argument("--index-workers", type=int, default=bulk_load.DEFAULT_WORKERS,
+                        help="parallel index rebuilds after --load")
+    fonana_trace.add_arguments(parser)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    fonana_trace.configure(args)
+    if not args.source:
+        print("❌ No source database: pass --source or set SUPABASE_DB_URL")
+        return False
+    if not (args.creators or args.creator or args.since):
+        print("❌ Empty seed: pass --creators N, --creator ID or --since DATE")
+        return False
+
+    start = time.time()
+    source = fonana_db.connect(dsn=args.source)
+    try:
+        counts = collect_keys(source, args.creators, args.creator, args.since)
+        print("🌱 Subset (closed over foreign keys):")
+        for table, count in counts.items():
+            print(f"   - {table}: {count}")
+
+        if args.out:
+            with span("export"):
+                export_subset(source, args.out)
+        elif args.load:
+            with fonana_db.connection() as target, span("load"):
+                loaded, bulk = load_subset(source, target, args.truncate, args.index_workers)
+            print(f"\n📦 Loaded {sum(loaded.values())} rows")
+            bulk.print_report()
+    finally:
+        source.close()
+    print(f"✅ Done in {time.time() - start:.1f} seconds")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Fonana client-side foreign key prefilter for the importers
+Rejects rows with dangling references before they reach the database
+
+- Parent key sets (users.id, posts.id, ...) are fetched once per import with a
+  server-side cursor; tables up to FONANA_FK_SET_LIMIT rows become plain
+  sets, larger ones a Bloom filter (FONANA_FK_BLOOM_ERROR false-positive rate)
+- A Bloom filter never rejects a valid row; the rare false positive is left
+  to the database, where the importer's per-row error path already handles it
+- Keys of parent rows in the same import are added on top of the DB keys
+- Rejected rows go to a JSON-lines file with table, id, reason and the row
+
+Usage:
+  fk = ForeignKeyFilter(conn, {"comments": {"postId": "posts", "userId": "users"}})
+  fk.add_keys("posts", ids_being_imported)
+  kept, rejected = fk.split("comments", rows)      # rejected: [(row, reason)]
+
+  python scripts/fk_filter.py users posts          # key set sizes and memory
+"""
+
+import hashlib
+import json
+import math
+import os
+import sys
+
+import fonana_db
+import fonana_trace
+from fonana_db import quote_ident
+from fonana_trace import span
+
+SET_LIMIT = int(os.environ.get("FONANA_FK_SET_LIMIT", 2_000_000))
+BLOOM_ERROR = float(os.environ.get("FONANA_FK_BLOOM_ERROR", 0.001))
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings (double hashing on one blake2b digest)"""
+
+    __slots__ = ("size", "hashes", "bits", "count")
+
+    def __init__(self, capacity, error_rate=BLOOM_ERROR):
+        capacity = max(capacity, 1)
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        size = self.size
+        return ((h1 + i * h2) % size for i in range(self.hashes))
+
+    def add(self, key):
+        bits = self.bits
+        for pos in self._positions(key):
+            bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        bits = self.bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def nbytes(self):
+        return len(self.bits)
+
+
+def estimated_rows(conn, table):
+    """Planner row estimate (exact count if the table was never analyzed)"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)", (quote_ident(table),))
+    row = cursor.fetchone()
+    estimate = row[0] if row else 0
+    if estimate is None or estimate < 0:
+        cursor.execute(f"SELECT count(*) FROM {quote_ident(table)}")
+        estimate = cursor.fetchone()[0]
+    cursor.close()
+    return estimate
+
+
+def load_keys(conn, table, column="id", set_limit=SET_LIMIT, error_rate=BLOOM_ERROR):
+    """All values of table.column as a set, or a Bloom filter for very large tables"""
+    estimate = estimated_rows(conn, table)
+    # headroom: the estimate may lag behind recent inserts
+    keys = set() if estimate <= set_limit else BloomFilter(int(estimate * 1.2) + 1000, error_rate)
+    add = keys.add
+    with span(f"fk-keys {table}"):
+        for batch in fonana_db.stream_batches(conn, f"SELECT {quote_ident(column)} FROM {quote_ident(table)}"):
+            for (key,) in batch:
+                add(key)
+        fonana_trace.count(rows=len(keys))
+    return keys
+
+
+class ForeignKeyFilter:
+    """Splits rows into (kept, rejected) against prefetched parent key sets
+
+    references: {child table: {column: parent table}}
+    """
+
+    def __init__(self, conn, references, set_limit=SET_LIMIT, error_rate=BLOOM_ERROR):
+        self.conn = conn
+        self.references = references
+        self.set_limit = set_limit
+        self.error_rate = error_rate
+        self.keys = {}    # parent table -> set | BloomFilter from the database
+        self.extra = {}   # parent table -> set of keys arriving in this import
+
+    def parent_keys(self, table):
+        if table not in self.keys:
+            self.keys[table] = load_keys(self.conn, table, set_limit=self.set_limit, error_rate=self.error_rate)
+        return self.keys[table]
+
+    def add_keys(self, table, keys):
+        self.extra.setdefault(table, set()).update(keys)
+
+    def split(self, table, rows):
+        checks = [
+            (column, parent, self.parent_keys(parent), self.extra.get(parent, ()))
+            for column, parent in self.references.get(table, {}).items()
+        ]
+        if not checks:
+            return list(rows), []
+        kept, rejected = [], []
+        for row in rows:
+            for column, parent, keys, extra in checks:
+                value = row.get(column)
+                if value is not None and value not in extra and value not in keys:
+                    rejected.append((row, f"{column} {value!r} not in {parent}"))
+                    break
+            else:
+                kept.append(row)
+        return kept, rejected
+
+    def summary(self):
+        """{parent table: (keys, kind, bytes)} of the loaded key sets"""
+        return {
+            table: (len(keys), "bloom", keys.nbytes) if isinstance(keys, BloomFilter)
+            else (len(keys), "set", sys.getsizeof(keys))
+            for table, keys in self.keys.items()
+        }
+
+
+class RejectsWriter:
+    """JSON-lines rejects file, rewritten by every import (removed when nothing is rejected)"""
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self._file = None
+
+    def __enter__(self):
+        return self
+
+    def write(self, table, row, reason):
+        if self._file is None:
+            self._file = open(self.path, "w", encoding="utf-8")
+        record = {"table": table, "id": row.get("id"), "reason": reason, "row": row}
+        self._file.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+        self.count += 1
+
+    def __exit__(self, *exc):
+        if self._file is not None:
+            self._file.close()
+        elif os.path.exists(self.path):
+            os.remove(self.path)  # no rejects this time: drop the stale file
+        return False
+
+
+def main(argv=None):
+    tables = (sys.argv[1:] if argv is None else argv) or ["users", "posts"]
+    with fonana_db.connection() as conn:
+        fk = ForeignKeyFilter(conn, {})
+        for table in tables:
+            fk.parent_keys(table)
+        for table, (count, kind, size) in fk.summary().items():
+            print(f"🔑 {table}: {count} keys as {kind}, {size / (1 << 20):.1f} MB")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Fonana phase tracing and profiling hooks for the migration scripts
+
+- --trace PATH: every phase/batch span is written as a Chrome trace-event JSON
+  ("ph": "X" complete events) that loads into chrome://tracing, Perfetto or speedscope
+- each span records wall and CPU time, RSS and counters (rows, bytes) added with
+  count(), which roll up into every enclosing span of the same thread
+- --profile PHASE: wraps that phase in a sampling profiler (all threads, wall clock)
+  and writes collapsed stacks for flamegraph.pl / speedscope
+
+Spans are no-ops unless tracing or profiling was enabled.
+"""
+
+import atexit
+import json
+import os
+import resource
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def current_rss():
+    """Resident set size in bytes (peak RSS where /proc is unavailable)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+class SamplingProfiler:
+    """Wall-clock sampler over sys._current_frames() for every thread"""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        me = threading.get_ident()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == me:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            stack.append(names.get(ident, str(ident)))
+            self.samples[";".join(reversed(stack))] += 1
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def write_folded(self, path):
+        """Collapsed stacks: 'frame;frame;frame count' per line"""
+        with open(path, "w") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class Tracer:
+    """Collects spans as trace events"""
+
+    def __init__(self):
+        self.enabled = False
+        self.path = None
+        self.profile_phase = None
+        self.profile_path = None
+        self.events = []
+        self.thread_names = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+        self._pid = os.getpid()
+
+    def enable(self, path=None, profile_phase=None, profile_path=None):
+        self.enabled = bool(path)
+        self.path = path
+        self.profile_phase = profile_phase
+        self.profile_path = profile_path
+        self._origin = time.perf_counter()
+        if path:
+            atexit.register(self.write)
+
+    @contextmanager
+    def span(self, name, cat="phase", **args):
+        """Time a block; the yielded dict can be updated with counters (rows, bytes, ...)"""
+        profiler = None
+        if cat == "phase" and self.profile_phase and name == self.profile_phase:
+            profiler = SamplingProfiler()
+            profiler.start()
+
+        if not self.enabled and profiler is None:
+            yield args
+            return
+
+        stack = self._stack()
+        stack.append(args)
+        rss_before = current_rss()
+        start = time.perf_counter()
+        cpu_start = time.thread_time() if cat == "batch" else time.process_time()
+        try:
+            yield args
+        finally:
+            stack.pop()
+            end = time.perf_counter()
+            cpu = (time.thread_time() if cat == "batch" else time.process_time()) - cpu_start
+            if profiler is not None:
+                profiler.stop()
+                out = self.profile_path or f"profile-{name.replace(' ', '_')}.folded"
+                profiler.write_folded(out)
+                print(f"🔬 Profile of '{name}' written to {out} ({sum(profiler.samples.values())} samples)")
+            if self.enabled:
+                rss_after = current_rss()
+                args.update({
+                    "wall_ms": round((end - start) * 1000, 3),
+                    "cpu_ms": round(cpu * 1000, 3),
+                    "rss_bytes": rss_after,
+                    "rss_delta_bytes": rss_after - rss_before,
+                })
+                event = {
+                    "name": name,
+                    "cat": cat,
+                    "ph": "X",
+                    "ts": round((start - self._origin) * 1e6, 1),
+                    "dur": round((end - start) * 1e6, 1),
+                    "pid": self._pid,
+                    "tid": threading.get_ident(),
+                    "args": args,
+                }
+                with self._lock:
+                    self.events.append(event)
+                    self.thread_names[event["tid"]] = threading.current_thread().name
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def count(self, **counters):
+        """Add counters to every open span of the calling thread"""
+        if not self.enabled:
+            return
+        for args in self._stack():
+            for key, value in counters.items():
+                args[key] = args.get(key, 0) + value
+
+    def write(self, path=None):
+        """Write the collected events as trace-event JSON"""
+        path = path or self.path
+        if not path:
+            return
+        with self._lock:
+            events = list(self.events)
+            threads = [
+                {"name": "thread_name", "ph": "M", "pid": self._pid, "tid": tid, "args": {"name": name}}
+                for tid, name in self.thread_names.items()
+            ]
+        with open(path, "w") as f:
+            json.dump({"traceEvents": threads + events, "displayTimeUnit": "ms"}, f)
+        print(f"🧭 Trace written to {path} ({len(events)} spans)")
+
+
+TRACER = Tracer()
+span = TRACER.span
+count = TRACER.count
+
+
+def add_arguments(parser):
+    """Add --trace / --profile / --profile-out to an argparse parser"""
+    parser.add_argument("--trace", metavar="PATH",
+                        help="write phase/batch spans as trace-event JSON")
+    parser.add_argument("--profile", metavar="PHASE",
+                        help="run a sampling profiler during the named phase")
+    parser.add_argument("--profile-out", metavar="PATH",
+                        help="collapsed-stack output for --profile (default: profile-<phase>.folded)")
+
+
+def configure(args):
+    """Enable tracing/profiling from parsed arguments"""
+    TRACER.enable(args.trace, args.profile, args.profile_out)
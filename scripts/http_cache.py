@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Fonana on-disk HTTP cache for media downloads
+
+- Bodies are stored by sha256(url); an SQLite index keeps ETag, Last-Modified,
+  freshness (Cache-Control max-age / Expires), size and last access per URL
+- Fresh entries are served from disk; stale ones are revalidated with
+  If-None-Match / If-Modified-Since, and a 304 only refreshes the metadata
+- Total size is capped: least recently used entries are evicted first
+- Offline mode never touches the network and raises CacheMiss for unknown URLs
+
+Usage:
+  cache = HttpCache(".cache/http", max_bytes=1 << 30)
+  status = cache.fetch(url, Path("public/media/avatars/a.jpg"))   # "cache" | "revalidated" | "network"
+
+  python scripts/http_cache.py            # entry count and size
+  python scripts/http_cache.py --clear
+"""
+
+import argparse
+import email.utils
+import hashlib
+import os
+import re
+import shutil
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+
+import requests
+
+import fonana_trace
+
+DEFAULT_CACHE_DIR = Path(os.environ.get(
+    "FONANA_HTTP_CACHE", Path(__file__).resolve().parent.parent / ".cache" / "http"
+))
+DEFAULT_MAX_BYTES = int(os.environ.get("FONANA_HTTP_CACHE_MB", 1024)) << 20
+
+_MAX_AGE_RE = re.compile(r"max-age=(\d+)")
+
+
+class CacheMiss(Exception):
+    """URL not in the cache while offline"""
+
+
+def freshness(headers, now):
+    """(expires_at, storable) from Cache-Control / Expires response headers"""
+    control = headers.get("Cache-Control", "").lower()
+    if "no-store" in control:
+        return 0, False
+    if "no-cache" in control:
+        return 0, True
+    match = _MAX_AGE_RE.search(control)
+    if match:
+        return now + int(match.group(1)), True
+    expires = headers.get("Expires")
+    if expires:
+        try:
+            return email.utils.parsedate_to_datetime(expires).timestamp(), True
+        except (TypeError, ValueError):
+            pass
+    return 0, True
+
+
+class HttpCache:
+    """URL-keyed body store with conditional revalidation and an LRU size cap"""
+
+    def __init__(self, root=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, offline=False, timeout=30):
+        self.root = Path(root)
+        self.bodies = self.root / "bodies"
+        self.bodies.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.stats = {"cache": 0, "revalidated": 0, "network": 0, "evicted": 0}
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.root / "index.sqlite"), check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                url TEXT PRIMARY KEY,
+                key TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                expires REAL NOT NULL DEFAULT 0,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_lru ON entries (last_access)")
+        self._db.commit()
+
+    def _path(self, key):
+        return self.bodies / key[:2] / key
+
+    def _lookup(self, url):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT key, etag, last_modified, expires FROM entries WHERE url = ?", (url,)
+            ).fetchone()
+        if row and self._path(row[0]).exists():
+            return row
+        return None
+
+    def _touch(self, url, **fields):
+        fields["last_access"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._db.execute(f"UPDATE entries SET {assignments} WHERE url = ?", (*fields.values(), url))
+            self._db.commit()
+
+    def fetch(self, url, dest):
+        """Materialise url at dest; returns where the body came from"""
+        dest = Path(dest)
+        entry = self._lookup(url)
+        now = time.time()
+
+        if entry and (self.offline or entry[3] > now):
+            shutil.copyfile(self._path(entry[0]), dest)
+            self._touch(url)
+            return self._count("cache")
+        if self.offline:
+            raise CacheMiss(url)
+
+        headers = {}
+        if entry:
+            if entry[1]:
+                headers["If-None-Match"] = entry[1]
+            if entry[2]:
+                headers["If-Modified-Since"] = entry[2]
+        response = self.session.get(url, headers=headers, timeout=self.timeout, stream=True)
+
+        if entry and response.status_code == 304:
+            response.close()
+            expires, _ = freshness(response.headers, now)
+            self._touch(url, expires=expires,
+                        etag=response.headers.get("ETag", entry[1]),
+                        last_modified=response.headers.get("Last-Modified", entry[2]))
+            shutil.copyfile(self._path(entry[0]), dest)
+            return self._count("revalidated")
+
+        response.raise_for_status()
+        expires, storable = freshness(response.headers, now)
+        if not storable:
+            self._write_body(response, dest)
+            return self._count("network")
+
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        path = self._path(key)
+        path.parent.mkdir(exist_ok=True)
+        tmp = path.with_name(f"{key}.{threading.get_ident()}.tmp")
+        size = self._write_body(response, tmp)
+        os.replace(tmp, path)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, key, response.headers.get("ETag"), response.headers.get("Last-Modified"),
+                 expires, size, time.time()),
+            )
+            self._db.commit()
+        shutil.copyfile(path, dest)
+        self.evict(keep=url)
+        return self._count("network")
+
+    def _write_body(self, response, path):
+        size = 0
+        with open(path, "wb") as f:
+            for chunk in response.iter_content(chunk_size=65536):
+                f.write(chunk)
+                size += len(chunk)
+                fonana_trace.count(bytes=len(chunk))
+        return size
+
+    def _count(self, status):
+        self.stats[status] += 1
+        return status
+
+    def usage(self):
+        """(entries, bytes) currently cached"""
+        with self._lock:
+            return self._db.execute("SELECT count(*), coalesce(sum(size), 0) FROM entries").fetchone()
+
+    def total_bytes(self):
+        return self.usage()[1]
+
+    def evict(self, keep=None):
+        """Drop least recently used entries until the cache fits max_bytes"""
+        total = self.total_bytes()
+        if total <= self.max_bytes:
+            return 0
+        evicted = 0
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT url, key, size FROM entries ORDER BY last_access"
+            ).fetchall()
+            for url, key, size in rows:
+                if total <= self.max_bytes:
+                    break
+                if url == keep:
+                    continue
+                self._path(key).unlink(missing_ok=True)
+                self._db.execute("DELETE FROM entries WHERE url = ?", (url,))
+                total -= size
+                evicted += 1
+            self._db.commit()
+        self.stats["evicted"] += evicted
+        return evicted
+
+    def clear(self):
+        shutil.rmtree(self.bodies, ignore_errors=True)
+        self.bodies.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            self._db.execute("DELETE FROM entries")
+            self._db.commit()
+
+    def summary(self):
+        """One-line hit/miss report"""
+        s = self.stats
+        return (f"{s['cache']} from cache, {s['revalidated']} revalidated (304), "
+                f"{s['network']} downloaded, {s['evicted']} evicted, "
+                f"{self.total_bytes() / (1 << 20):.1f} MB cached")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect or clear the media download cache")
+    parser.add_argument("--cache-dir", default=str(DEFAULT_CACHE_DIR))
+    parser.add_argument("--clear", action="store_true", help="delete every cached body")
+    args = parser.parse_args(argv)
+
+    cache = HttpCache(args.cache_dir)
+    if args.clear:
+        cache.clear()
+        print(f"🧹 Cache cleared: {args.cache_dir}")
+    count, size = cache.usage()
+    print(f"📦 {count} entries, {size / (1 << 20):.1f} MB in {args.cache_dir}")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+"""
+Fonana streaming log analyzer for PM2 / Next.js / nginx logs
+Finds hot routes and recurring errors in one pass, without loading whole files
+
+- Understands PM2 prefixes ("0|fonana   | ..."), PM2 --time timestamps,
+  Next.js request lines ("GET /api/posts 200 in 45ms"), nginx combined access
+  lines (with an optional trailing $request_time) and nginx error.log lines
+- Per route: request count, status classes and p50/p95/p99 latency from a
+  log-bucketed quantile sketch (1% relative error, memory independent of
+  request count); ids, hashes and file names in paths are collapsed
+- App log tags like [API/posts] are counted per tag
+- Error signatures (numbers, ids and quoted values masked) are counted in
+  total and per time window; only the last --windows windows are kept
+- --follow tails live logs (rotation aware) and reprints the report every
+  --interval seconds
+
+Usage:
+  python scripts/log_analyzer.py production-logs.txt
+  python scripts/log_analyzer.py /var/log/nginx/access.log --top 30
+  pm2 logs fonana --raw | python scripts/log_analyzer.py -
+  python scripts/log_analyzer.py ~/.pm2/logs/fonana-out.log ~/.pm2/logs/fonana-error.log --follow
+"""
+
+import argparse
+import math
+import os
+import re
+import sys
+import time
+from collections import Counter, OrderedDict
+from datetime import datetime
+
+import fonana_trace
+from fonana_trace import span
+
+DEFAULT_WINDOW_SECONDS = 300
+DEFAULT_WINDOWS = 12
+MAX_ROUTES = 2000
+MAX_SIGNATURES = 2000
+
+PM2_RE = re.compile(r"^(\d+)\|([^|]*?)\s*\|\s?(.*)$")
+PM2_TIME_RE = re.compile(r"^(\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d)(?:\.\d+)?Z?:\s?(.*)$")
+ISO_TIME_RE = re.compile(r"\[(\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d)(?:\.\d+)?Z?\]")
+NEXT_REQUEST_RE = re.compile(r"\b(GET|POST|PUT|PATCH|DELETE|HEAD|OPTIONS) (/\S*) (\d{3}) in (\d+(?:\.\d+)?)ms")
+NGINX_ACCESS_RE = re.compile(
+    r'^\S+ \S+ \S+ \[([^\]]+)\] "(\S+) (\S+)[^"]*" (\d{3}) (?:\d+|-)'
+    r'(?: "[^"]*" "[^"]*")?(?:.*?(?:rt=)?(\d+\.\d{3})\s*$)?'
+)
+NGINX_ERROR_RE = re.compile(r"^(\d{4}/\d\d/\d\d \d\d:\d\d:\d\d) \[(\w+)\] \d+#\d+: (?:\*\d+ )?(.*)$")
+APP_TAG_RE = re.compile(r"^\[((?:API|WS|PAYMENT|SSE)[^\]]*)\]")
+ERROR_RE = re.compile(r"\b(?:\w*Error|ERROR|FATAL|Unhandled\w*|[Ff]ailed|E[A-Z]{4,})\b|⨯")
+STACK_RE = re.compile(r"^\s+at |^\s*[}\]]\s*$|^\s+\w+: ")
+
+# Path segments collapsed so /api/posts/<id> counts as one route
+_ID_SEGMENT_RE = re.compile(
+    r"^(?:\d+|c[a-z0-9]{20,}|[0-9a-f]{16,}|[0-9a-f-]{36}|[1-9A-HJ-NP-Za-km-z]{32,})$"
+)
+_FILE_SEGMENT_RE = re.compile(r"^[^.]+(\.[A-Za-z0-9]{1,5})$")
+
+# Signature masking: quoted values, long tokens, numbers
+_MASKS = [
+    (re.compile(r"'[^']*'|\"[^\"]*\""), "'…'"),
+    (re.compile(r"\b[0-9A-Za-z]{24,}\b"), "<id>"),
+    (re.compile(r"\b\d+(?:\.\d+)?\b"), "N"),
+]
+
+
+class QuantileSketch:
+    """Log-bucketed quantile sketch (DDSketch-style)
+
+    Values land in buckets whose bounds grow by gamma = (1+a)/(1-a), so any
+    reported quantile is within relative error a of the true value. Memory is
+    the number of distinct buckets touched, i.e. proportional to log(max/min).
+    """
+
+    __slots__ = ("gamma_log", "buckets", "zeros", "count", "total")
+
+    def __init__(self, relative_accuracy=0.01):
+        gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.gamma_log = math.log(gamma)
+        self.buckets = Counter()
+        self.zeros = 0
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        if value <= 0:
+            self.zeros += 1
+        else:
+            self.buckets[math.ceil(math.log(value) / self.gamma_log)] += 1
+
+    def merge(self, other):
+        self.buckets.update(other.buckets)
+        self.zeros += other.zeros
+        self.count += other.count
+        self.total += other.total
+
+    def quantile(self, q):
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zeros
+        if rank < seen:
+            return 0.0
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if seen > rank:
+                # midpoint of the bucket in the relative-error sense
+                return 2 * math.exp(key * self.gamma_log) / (1 + math.exp(self.gamma_log))
+        return math.exp(max(self.buckets) * self.gamma_log)
+
+
+class RouteStats:
+    __slots__ = ("count", "statuses", "latency")
+
+    def __init__(self):
+        self.count = 0
+        self.statuses = Counter()
+        self.latency = QuantileSketch()
+
+
+def normalize_route(path):
+    """'/api/posts/cmbv...?x=1' -> '/api/posts/:id'; '/media/avatars/a.jpg' -> '/media/avatars/*.jpg'"""
+    path = path.split("?", 1)[0].split("#", 1)[0]
+    segments = []
+    for segment in path.split("/"):
+        if _ID_SEGMENT_RE.match(segment):
+            segments.append(":id")
+            continue
+        file_match = _FILE_SEGMENT_RE.match(segment)
+        segments.append(f"*{file_match.group(1).lower()}" if file_match else segment)
+    return "/".join(segments) or "/"
+
+
+def error_signature(message):
+    message = message.strip()
+    for pattern, replacement in _MASKS:
+        message = pattern.sub(replacement, message)
+    return message[:160]
+
+
+def parse_time(text, fmt):
+    try:
+        return datetime.strptime(text, fmt).timestamp()
+    except ValueError:
+        return None
+
+
+class LogAnalyzer:
+    """Single-pass aggregator; feed() one line at a time"""
+
+    def __init__(self, window_seconds=DEFAULT_WINDOW_SECONDS, windows=DEFAULT_WINDOWS):
+        self.window_seconds = window_seconds
+        self.max_windows = windows
+        self.lines = 0
+        self.routes = {}
+        self.tags = Counter()
+        self.processes = Counter()
+        self.signatures = Counter()
+        self.timeline = OrderedDict()  # window start -> Counter of signatures
+        self.last_time = None
+
+    # --- routing of a line to its parser ---
+
+    def feed(self, line):
+        self.lines += 1
+        line = line.rstrip("\r\n")
+        if not line:
+            return
+
+        match = PM2_RE.match(line)
+        if match:
+            self.processes[match.group(2)] += 1
+            line = match.group(3)
+            stamped = PM2_TIME_RE.match(line)
+            if stamped:
+                self.last_time = parse_time(stamped.group(1), "%Y-%m-%dT%H:%M:%S") or self.last_time
+                line = stamped.group(2)
+
+        match = NGINX_ACCESS_RE.match(line)
+        if match:
+            stamp, method, path, status, seconds = match.groups()
+            self.last_time = parse_time(stamp.split()[0], "%d/%b/%Y:%H:%M:%S") or self.last_time
+            self.request(method, path, int(status), float(seconds) * 1000 if seconds else None)
+            if status.startswith("5"):
+                self.error(f"HTTP {status[0]}xx {method} {normalize_route(path)}")
+            return
+
+        match = NGINX_ERROR_RE.match(line)
+        if match:
+            self.last_time = parse_time(match.group(1), "%Y/%m/%d %H:%M:%S") or self.last_time
+            if match.group(2) in ("error", "crit", "alert", "emerg"):
+                self.error(f"nginx: {match.group(3).split(', client:')[0]}")
+            return
+
+        stamped = ISO_TIME_RE.search(line)
+        if stamped:
+            self.last_time = parse_time(stamped.group(1), "%Y-%m-%dT%H:%M:%S") or self.last_time
+            line = ISO_TIME_RE.sub("", line, count=1).strip()
+
+        match = NEXT_REQUEST_RE.search(line)
+        if match:
+            method, path, status, ms = match.groups()
+            self.request(method, path, int(status), float(ms))
+            return
+
+        stripped = line.strip()
+        match = APP_TAG_RE.match(stripped)
+        if match:
+            self.tags[match.group(1)] += 1
+        if STACK_RE.match(line):
+            return  # stack frames / object dumps belong to the error above them
+        if ERROR_RE.search(stripped):
+            self.error(stripped)
+
+    # --- aggregates ---
+
+    def request(self, method, path, status, latency_ms):
+        route = f"{method} {normalize_route(path)}"
+        stats = self.routes.get(route)
+        if stats is None:
+            if len(self.routes) >= MAX_ROUTES:
+                route = f"{method} (other)"
+                stats = self.routes.setdefault(route, RouteStats())
+            else:
+                stats = self.routes[route] = RouteStats()
+        stats.count += 1
+        stats.statuses[f"{status // 100}xx"] += 1
+        if latency_ms is not None:
+            stats.latency.add(latency_ms)
+
+    def error(self, message):
+        signature = error_signature(message)
+        if signature not in self.signatures and len(self.signatures) >= MAX_SIGNATURES:
+            signature = "(other)"
+        self.signatures[signature] += 1
+        if self.last_time is None:
+            return
+        window = int(self.last_time // self.window_seconds * self.window_seconds)
+        bucket = self.timeline.get(window)
+        if bucket is None:
+            bucket = self.timeline[window] = Counter()
+            while len(self.timeline) > self.max_windows:
+                self.timeline.popitem(last=False)
+        bucket[signature] += 1
+
+    # --- output ---
+
+    def report(self, top=20):
+        print(f"📊 {self.lines} lines, {sum(s.count for s in self.routes.values())} requests, "
+              f"{sum(self.signatures.values())} error lines")
+        if self.processes:
+            print("   Processes: " + ", ".join(f"{name} {count}" for name, count in self.processes.most_common()))
+
+        if self.routes:
+            print(f"\n🚦 Top routes by requests:")
+            print(f"   {'route':<48} {'count':>7} {'2xx':>6} {'3xx':>6} {'4xx':>6} {'5xx':>6} "
+                  f"{'p50':>8} {'p95':>8} {'p99':>8}")
+            ranked = sorted(self.routes.items(), key=lambda item: -item[1].count)[:top]
+            for route, stats in ranked:
+                codes = " ".join(f"{stats.statuses.get(c, 0):>6}" for c in ("2xx", "3xx", "4xx", "5xx"))
+                quantiles = " ".join(_ms(stats.latency.quantile(q)) for q in (0.5, 0.95, 0.99))
+                print(f"   {route[:48]:<48} {stats.count:>7} {codes} {quantiles}")
+
+        if self.tags:
+            print(f"\n🏷️  App log tags:")
+            for tag, count in self.tags.most_common(top):
+                print(f"   {count:>7}  [{tag}]")
+
+        if self.signatures:
+            print(f"\n❌ Error signatures:")
+            for signature, count in self.signatures.most_common(top):
+                print(f"   {count:>7}  {signature}")
+
+        if self.timeline:
+            print(f"\n🕒 Errors per {self.window_seconds // 60}-minute window (last {len(self.timeline)}):")
+            for window, bucket in self.timeline.items():
+                label = datetime.fromtimestamp(window).strftime("%Y-%m-%d %H:%M")
+                leader, leader_count = bucket.most_common(1)[0]
+                print(f"   {label}  {sum(bucket.values()):>6}  top: {leader_count}× {leader[:80]}")
+
+
+def _ms(value):
+    return f"{value:>6.0f}ms" if value is not None else f"{'-':>8}"
+
+
+def read_lines(path):
+    """Lines of a file (or stdin for '-'), decoded leniently"""
+    if path == "-":
+        yield from sys.stdin
+        return
+    with open(path, encoding="utf-8", errors="replace") as f:
+        yield from f
+
+
+def follow(paths, analyzer, interval, top, from_start=False, poll=0.5):
+    """Tail files like tail -F: handles truncation and rotation, reports every interval"""
+    handles = {}
+
+    def reopen(path, at_end):
+        try:
+            f = open(path, encoding="utf-8", errors="replace")
+        except FileNotFoundError:
+            return None
+        if at_end:
+            f.seek(0, os.SEEK_END)
+        return f
+
+    for path in paths:
+        handles[path] = reopen(path, not from_start)
+    next_report = time.time() + interval
+    try:
+        while True:
+            idle = True
+            for path, f in list(handles.items()):
+                if f is None:
+                    handles[path] = reopen(path, False)
+                    continue
+                for line in iter(f.readline, ""):
+                    analyzer.feed(line)
+                    idle = False
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                if st.st_ino != os.fstat(f.fileno()).st_ino or st.st_size < f.tell():
+                    f.close()  # rotated or truncated
+                    handles[path] = reopen(path, False)
+            if time.time() >= next_report:
+                print(f"\n===== {datetime.now():%H:%M:%S} =====")
+                analyzer.report(top)
+                next_report = time.time() + interval
+            if idle:
+                time.sleep(poll)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for f in handles.values():
+            if f is not None:
+                f.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Aggregate routes, latencies and errors from PM2/Next/nginx logs")
+    parser.add_argument("paths", nargs="+", help="log files ('-' for stdin)")
+    parser.add_argument("--top", type=int, default=20, help="rows per report section")
+    parser.add_argument("--window", type=int, default=DEFAULT_WINDOW_SECONDS,
+                        help=f"error timeline window in seconds (default {DEFAULT_WINDOW_SECONDS})")
+    parser.add_argument("--windows", type=int, default=DEFAULT_WINDOWS, help="timeline windows kept")
+    parser.add_argument("--follow", action="store_true", help="tail the files and report periodically")
+    parser.add_argument("--from-start", action="store_true", help="with --follow: read existing content first")
+    parser.add_argument("--interval", type=float, default=30, help="with --follow: seconds between reports")
+    fonana_trace.add_arguments(parser)
+    args = parser.parse_args(argv)
+    fonana_trace.configure(args)
+
+    analyzer = LogAnalyzer(args.window, args.windows)
+    if args.follow:
+        follow(args.paths, analyzer, args.interval, args.top, args.from_start)
+        analyzer.report(args.top)
+        return True
+
+    start = time.time()
+    for path in args.paths:
+        try:
+            with span("analyze", path=path):
+                before = analyzer.lines
+                for line in read_lines(path):
+                    analyzer.feed(line)
+                fonana_trace.count(rows=analyzer.lines - before)
+        except OSError as e:
+            print(f"❌ {path}: {e}")
+            return False
+    analyzer.report(args.top)
+    print(f"\n⏱️  Done in {time.time() - start:.1f} seconds")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
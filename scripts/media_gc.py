@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Fonana media garbage collector
+Finds media files no database row refers to and retires them in two steps
+
+- The live set is built from every media column, including the *_backup
+  columns written by update_database_media_paths.py, streamed in one query
+  (see media_integrity.py for URL normalization)
+- References are counted per file stem, so an original keeps its derivatives
+  alive: /media/posts/a.jpg also protects a.webp, and the copy under
+  backup-images-before-webp/media/posts/
+- Scanned roots: public/media and backup-images-before-webp; files newer than
+  --min-age-hours are skipped so a running setup/import is never raced
+- Never collected: paths under GC_IGNORE (the Playwright fixtures in
+  public/media/tests, referenced only from the test seeding scripts) and any
+  file tracked by git
+- --quarantine moves orphans into .media-quarantine/<batch>/ with a manifest;
+  --purge deletes batches older than the grace period; --restore puts a batch
+  back (files whose original path is taken again stay in the batch)
+
+Usage:
+  python scripts/media_gc.py                        # report orphans and their size
+  python scripts/media_gc.py --quarantine
+  python scripts/media_gc.py --purge --grace-days 7
+  python scripts/media_gc.py --restore 20250801-120000
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+import fonana_db
+import fonana_trace
+from fonana_trace import span
+from media_integrity import (
+    BASE_DIR, PUBLIC_DIR, REFERENCE_COLUMNS, FileIndex,
+    existing_reference_columns, normalize_ref, stream_references,
+)
+
+BACKUP_COLUMNS = [
+    ("posts", "mediaUrl_backup"),
+    ("posts", "thumbnail_backup"),
+    ("users", "avatar_backup"),
+]
+
+# Scanned directory -> URL prefix its files are served under
+GC_ROOTS = {
+    PUBLIC_DIR / "media": "/media",
+    BASE_DIR / "backup-images-before-webp": "",
+}
+
+# Public path prefixes that are never collected: referenced from code, not from the DB
+GC_IGNORE = (
+    "/media/tests/",  # Playwright fixtures (scripts/enhance-playwright-test-data.ts)
+)
+
+QUARANTINE_DIR = Path(os.environ.get("FONANA_MEDIA_QUARANTINE", BASE_DIR / ".media-quarantine"))
+MANIFEST = "manifest.json"
+DEFAULT_GRACE_DAYS = 7
+DEFAULT_MIN_AGE_HOURS = 24
+
+
+def stem_key(path):
+    """Reference-counting key: public path without extension, case-folded"""
+    return os.path.splitext(path)[0].lower()
+
+
+def live_references(conn):
+    """Counter {stem key: references} over every media and backup column"""
+    columns = existing_reference_columns(conn, REFERENCE_COLUMNS + BACKUP_COLUMNS)
+    refs = Counter()
+    with span("live-set"):
+        for _, _, _, value in stream_references(conn, columns):
+            path = normalize_ref(value)
+            if path is not None:
+                refs[stem_key(path)] += 1
+        fonana_trace.count(rows=sum(refs.values()))
+    return refs, columns
+
+
+def tracked_files(base=BASE_DIR):
+    """Absolute paths of the files git tracks under `base` (empty outside a checkout)"""
+    try:
+        listed = subprocess.run(["git", "-C", str(base), "ls-files", "-z"],
+                                capture_output=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return set()
+    return {os.path.join(base, os.fsdecode(path)) for path in listed.split(b"\0") if path}
+
+
+def find_orphans(refs, min_age_hours=DEFAULT_MIN_AGE_HOURS):
+    """[(absolute path, size)] of unreferenced files under GC_ROOTS, plus per-root stats"""
+    cutoff = time.time() - min_age_hours * 3600
+    tracked = tracked_files(BASE_DIR)
+    orphans = []
+    stats = {}
+    for root, prefix in GC_ROOTS.items():
+        if not root.exists():
+            continue
+        index = FileIndex(root)
+        root_stats = stats[str(root.relative_to(BASE_DIR))] = Counter()
+        for path, full in index.files.items():
+            st = os.stat(full)
+            root_stats["files"] += 1
+            root_stats["bytes"] += st.st_size
+            if refs.get(stem_key(prefix + path)):
+                continue
+            if (prefix + path).startswith(GC_IGNORE) or full in tracked:
+                root_stats["kept"] += 1
+                continue
+            if st.st_mtime > cutoff:
+                root_stats["recent"] += 1
+                continue
+            root_stats["orphans"] += 1
+            root_stats["orphan_bytes"] += st.st_size
+            orphans.append((full, st.st_size))
+    return orphans, stats
+
+
+def _move(src, dest):
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        os.replace(src, dest)
+    except OSError:
+        shutil.move(src, dest)  # quarantine on another filesystem
+
+
+def quarantine(orphans, quarantine_dir=QUARANTINE_DIR):
+    """Move orphans into a new batch directory; returns (batch name, bytes moved)"""
+    batch = datetime.now().strftime("%Y%m%d-%H%M%S")
+    batch_dir = Path(quarantine_dir) / batch
+    moved = []
+    with span("quarantine"):
+        for full, size in orphans:
+            rel = os.path.relpath(full, BASE_DIR)
+            _move(full, batch_dir / rel)
+            moved.append({"path": rel, "size": size})
+            fonana_trace.count(rows=1, bytes=size)
+    batch_dir.mkdir(parents=True, exist_ok=True)
+    write_manifest(batch_dir, {"created": time.time(), "files": moved})
+    return batch, sum(item["size"] for item in moved)
+
+
+def write_manifest(batch_dir, manifest):
+    with open(batch_dir / MANIFEST, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1)
+
+
+def batches(quarantine_dir=QUARANTINE_DIR):
+    """[(batch name, manifest)] oldest first"""
+    root = Path(quarantine_dir)
+    if not root.exists():
+        return []
+    found = []
+    for batch_dir in sorted(root.iterdir()):
+        manifest = batch_dir / MANIFEST
+        if manifest.exists():
+            with open(manifest, encoding="utf-8") as f:
+                found.append((batch_dir.name, json.load(f)))
+    return found
+
+
+def purge(grace_days=DEFAULT_GRACE_DAYS, quarantine_dir=QUARANTINE_DIR):
+    """Delete batches older than the grace period; returns (batches, files, bytes reclaimed)"""
+    cutoff = time.time() - grace_days * 86400
+    purged = files = reclaimed = 0
+    with span("purge"):
+        for batch, manifest in batches(quarantine_dir):
+            if manifest["created"] > cutoff:
+                continue
+            shutil.rmtree(Path(quarantine_dir) / batch)
+            purged += 1
+            files += len(manifest["files"])
+            reclaimed += sum(item["size"] for item in manifest["files"])
+        fonana_trace.count(rows=files, bytes=reclaimed)
+    return purged, files, reclaimed
+
+
+def restore(batch, quarantine_dir=QUARANTINE_DIR):
+    """Move a quarantined batch back to its original paths; returns (restored, kept)
+
+    A file whose original path exists again is kept in the batch, whose
+    manifest then lists only such files; the batch is removed once empty.
+    """
+    batch_dir = Path(quarantine_dir) / batch
+    with open(batch_dir / MANIFEST, encoding="utf-8") as f:
+        manifest = json.load(f)
+    restored = 0
+    kept = []
+    for item in manifest["files"]:
+        src = batch_dir / item["path"]
+        dest = BASE_DIR / item["path"]
+        if not src.exists():
+            continue
+        if dest.exists():
+            kept.append(item)
+            continue
+        _move(src, dest)
+        restored += 1
+    if kept:
+        write_manifest(batch_dir, dict(manifest, files=kept))
+    else:
+        shutil.rmtree(batch_dir)
+    return restored, kept
+
+
+def format_mb(size):
+    return f"{size / (1 << 20):.1f} MB"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Quarantine and purge media files no DB row references")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--quarantine", action="store_true", help="move orphans into the quarantine area")
+    mode.add_argument("--purge", action="store_true", help="delete quarantine batches past the grace period")
+    mode.add_argument("--restore", metavar="BATCH", help="move a quarantine batch back")
+    parser.add_argument("--grace-days", type=float, default=DEFAULT_GRACE_DAYS,
+                        help=f"days a batch stays in quarantine before --purge (default {DEFAULT_GRACE_DAYS})")
+    parser.add_argument("--min-age-hours", type=float, default=DEFAULT_MIN_AGE_HOURS,
+                        help=f"never touch files modified more recently (default {DEFAULT_MIN_AGE_HOURS})")
+    parser.add_argument("--quarantine-dir", default=str(QUARANTINE_DIR))
+    fonana_trace.add_arguments(parser)
+    args = parser.parse_args(argv)
+    fonana_trace.configure(args)
+
+    start = time.time()
+    if args.purge:
+        purged, files, reclaimed = purge(args.grace_days, args.quarantine_dir)
+        print(f"🗑️  Purged {purged} batches ({files} files), reclaimed {format_mb(reclaimed)}")
+        pending = batches(args.quarantine_dir)
+        if pending:
+            print(f"⏳ {len(pending)} batches still within the {args.grace_days:g}-day grace period")
+        return True
+    if args.restore:
+        restored, kept = restore(args.restore, args.quarantine_dir)
+        print(f"♻️  Restored {restored} files from {args.restore}")
+        if kept:
+            print(f"⚠️  {len(kept)} files kept in the batch, their original paths exist again:")
+            for item in kept:
+                print(f"   - {item['path']}")
+        return True
+
+    with fonana_db.connection() as conn:
+        refs, columns = live_references(conn)
+    if not refs:
+        # An empty live set means the wrong database, not that every file is garbage
+        print("❌ No media references found in the database, refusing to collect")
+        return False
+    print(f"🔗 {sum(refs.values())} references to {len(refs)} files "
+          f"({', '.join(f'{t}.{c}' for t, c in columns)})")
+
+    orphans, stats = find_orphans(refs, args.min_age_hours)
+    for root, s in stats.items():
+        print(f"📁 {root}: {s['files']} files ({format_mb(s['bytes'])}), "
+              f"{s['orphans']} orphans ({format_mb(s['orphan_bytes'])}), {s['recent']} too recent, "
+              f"{s['kept']} ignored or tracked by git")
+    total = sum(size for _, size in orphans)
+
+    if args.quarantine and orphans:
+        batch, moved = quarantine(orphans, args.quarantine_dir)
+        print(f"📦 Quarantined {len(orphans)} files ({format_mb(moved)}) as batch {batch}")
+        print(f"   Purge after {args.grace_days:g} days with --purge, or undo with --restore {batch}")
+    else:
+        print(f"🧹 Reclaimable: {len(orphans)} files, {format_mb(total)}"
+              + ("" if args.quarantine else " (dry run, pass --quarantine)"))
+    print(f"⏱️  Done in {time.time() - start:.1f} seconds")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Fonana media reference integrity scanner
+Checks that every media URL in the database points at a real file under public/
+
+- posts.mediaUrl / posts.thumbnail / users.avatar / users.backgroundImage are
+  streamed with one UNION ALL query through a server-side cursor
+- public/ is walked once into an in-memory index; every lookup is a set probe,
+  never a stat() per row
+- URLs are normalized the way lib/utils/mediaUrl.ts resolves them: query
+  strings and hosts stripped, Supabase storage URLs mapped to /posts/images/,
+  CDN URLs (BunnyCDN, other hosts) counted as external
+- A reference is ok when the file exists; otherwise its WebP twin or a
+  case-insensitive match can be used, or it is dangling
+- --repair rewrites twin/case matches in bulk; --null-missing also clears
+  references that have no file at all
+
+Usage:
+  python scripts/media_integrity.py                  # report only
+  python scripts/media_integrity.py --repair         # point refs at twins / case matches
+  python scripts/media_integrity.py --repair --null-missing
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+from urllib.parse import unquote, urlsplit
+
+import psycopg2.extras
+
+import fonana_db
+import fonana_trace
+from fonana_db import quote_ident
+from fonana_trace import span
+
+BASE_DIR = Path(__file__).parent.parent
+PUBLIC_DIR = BASE_DIR / "public"
+
+# (table, column) pairs holding media URLs
+REFERENCE_COLUMNS = [
+    ("posts", "mediaUrl"),
+    ("posts", "thumbnail"),
+    ("users", "avatar"),
+    ("users", "backgroundImage"),
+]
+
+# Hosts serving this app's own public/ directory
+LOCAL_HOSTS = {"fonana.me", "www.fonana.me", "localhost", "127.0.0.1"}
+
+TWIN_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+_SUPABASE_FILE_RE = re.compile(r"/([^/]+\.(?:jpg|jpeg|png|webp|gif))$", re.I)
+
+
+def normalize_ref(value):
+    """Public path ('/media/avatars/a.jpg') for a stored URL, or None if it lives elsewhere"""
+    value = (value or "").strip()
+    if not value:
+        return None
+    if value.startswith("//"):
+        value = "/" + value.lstrip("/")  # doubled slashes, not a protocol-relative host
+    parts = urlsplit(value)
+    if parts.scheme in ("http", "https"):
+        host = parts.hostname or ""
+        if "supabase.co" in host and "/storage/" in parts.path:
+            match = _SUPABASE_FILE_RE.search(parts.path)
+            return f"/posts/images/{match.group(1)}" if match else None
+        if host not in LOCAL_HOSTS:
+            return None
+    elif parts.scheme:
+        return None  # data:, blob: ...
+    path = re.sub(r"/{2,}", "/", unquote(parts.path))
+    return path if path.startswith("/") else "/" + path
+
+
+def webp_twin(path):
+    """'/a/b.jpg' -> '/a/b.webp' (None if the path has no convertible extension)"""
+    root, ext = os.path.splitext(path)
+    return root + ".webp" if ext.lower() in TWIN_EXTENSIONS else None
+
+
+class FileIndex:
+    """Every file under a root, indexed once for exact and case-insensitive lookups"""
+
+    def __init__(self, root=PUBLIC_DIR):
+        self.root = Path(root)
+        self.files = {}
+        with span("walk", root=str(self.root)):
+            for dirpath, _, filenames in os.walk(self.root):
+                rel_dir = "/" + os.path.relpath(dirpath, self.root).replace(os.sep, "/")
+                rel_dir = "" if rel_dir == "/." else rel_dir
+                for name in filenames:
+                    self.files[f"{rel_dir}/{name}"] = os.path.join(dirpath, name)
+            fonana_trace.count(rows=len(self.files))
+        self.lower = {}
+        for path in self.files:
+            self.lower.setdefault(path.lower(), path)
+
+    def __contains__(self, path):
+        return path in self.files
+
+    def __len__(self):
+        return len(self.files)
+
+    def resolve(self, path):
+        """(status, existing path): ok | twin | case | missing"""
+        if path in self.files:
+            return "ok", path
+        twin = webp_twin(path)
+        if twin and twin in self.files:
+            return "twin", twin
+        actual = self.lower.get(path.lower())
+        if actual:
+            return "case", actual
+        if twin:
+            actual = self.lower.get(twin.lower())
+            if actual:
+                return "twin", actual
+        return "missing", None
+
+
+def existing_reference_columns(conn, columns):
+    """Filter (table, column) pairs down to columns present in the database"""
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT table_name, column_name FROM information_schema.columns
+        WHERE table_schema = current_schema()
+    """)
+    present = set(cursor.fetchall())
+    cursor.close()
+    return [pair for pair in columns if pair in present]
+
+
+def reference_sql(columns):
+    """One UNION ALL query yielding (table, id, column, value) for every non-null reference"""
+    return "\nUNION ALL\n".join(
+        f"SELECT '{table}', id, '{column}', {quote_ident(column)} FROM {quote_ident(table)} "
+        f"WHERE {quote_ident(column)} IS NOT NULL AND {quote_ident(column)} <> ''"
+        for table, column in columns
+    )
+
+
+def stream_references(conn, columns):
+    """(table, id, column, value) rows, streamed in server-side cursor batches"""
+    for batch in fonana_db.stream_batches(conn, reference_sql(columns)):
+        yield from batch
+
+
+def scan(conn, index, columns=REFERENCE_COLUMNS):
+    """Classify every reference; returns (counts, findings)
+
+    counts: Counter of (table.column, status); findings: rows needing attention as
+    (table, id, column, value, status, fixed_value).
+    """
+    counts = Counter()
+    findings = []
+    with span("scan"):
+        for table, row_id, column, value in stream_references(conn, existing_reference_columns(conn, columns)):
+            path = normalize_ref(value)
+            if path is None:
+                counts[(f"{table}.{column}", "external")] += 1
+                continue
+            status, actual = index.resolve(path)
+            counts[(f"{table}.{column}", status)] += 1
+            if status != "ok":
+                findings.append((table, row_id, column, value, status, actual))
+        fonana_trace.count(rows=sum(counts.values()))
+    return counts, findings
+
+
+def repair(conn, findings, null_missing=False):
+    """Bulk-rewrite twin/case matches (and optionally clear missing refs); returns rows updated"""
+    fixes = {}
+    for table, row_id, column, value, status, actual in findings:
+        if status in ("twin", "case"):
+            fixes.setdefault((table, column), []).append((row_id, value, actual))
+        elif status == "missing" and null_missing:
+            fixes.setdefault((table, column), []).append((row_id, value, None))
+
+    cursor = conn.cursor()
+    updated = 0
+    with span("repair"):
+        for (table, column), rows in fixes.items():
+            col = quote_ident(column)
+            # Only rows still holding the scanned value are touched; RETURNING
+            # counts every page (rowcount would only cover the last one)
+            updated += len(psycopg2.extras.execute_values(cursor, f"""
+                UPDATE {quote_ident(table)} AS t SET {col} = v.new
+                FROM (VALUES %s) AS v(id, old, new)
+                WHERE t.id = v.id AND t.{col} = v.old
+                RETURNING t.id
+            """, rows, template="(%s, %s, %s::text)", page_size=1000, fetch=True))
+    conn.commit()
+    cursor.close()
+    fonana_trace.count(rows=updated)
+    return updated
+
+
+def print_report(counts, findings, index, limit=20):
+    print(f"📁 Indexed {len(index)} files under {index.root}")
+    by_column = {}
+    for (column, status), count in counts.items():
+        by_column.setdefault(column, Counter())[status] = count
+    for column, statuses in sorted(by_column.items()):
+        details = ", ".join(f"{status}: {count}" for status, count in sorted(statuses.items()))
+        print(f"   - {column}: {details}")
+
+    dangling = [f for f in findings if f[4] == "missing"]
+    fixable = len(findings) - len(dangling)
+    print(f"🔧 Fixable (WebP twin / case mismatch): {fixable}")
+    print(f"❌ Dangling references: {len(dangling)}")
+    for table, row_id, column, value, _, _ in dangling[:limit]:
+        print(f"     {table}.{column} {row_id}: {value}")
+    if len(dangling) > limit:
+        print(f"     ... and {len(dangling) - limit} more")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check DB media references against public/")
+    parser.add_argument("--public-dir", default=str(PUBLIC_DIR), help="directory served as / (default: public)")
+    parser.add_argument("--repair", action="store_true", help="rewrite references to WebP twins / case matches")
+    parser.add_argument("--null-missing", action="store_true", help="with --repair: clear references with no file")
+    parser.add_argument("--show", type=int, default=20, help="dangling references to list")
+    fonana_trace.add_arguments(parser)
+    args = parser.parse_args(argv)
+    fonana_trace.configure(args)
+
+    start = time.time()
+    index = FileIndex(args.public_dir)
+    with fonana_db.connection() as conn:
+        counts, findings = scan(conn, index)
+        print_report(counts, findings, index, args.show)
+        if args.repair:
+            updated = repair(conn, findings, args.null_missing)
+            print(f"✅ Repaired {updated} references")
+    print(f"⏱️  Done in {time.time() - start:.1f} seconds")
+    return not any(f[4] == "missing" for f in findings) or (args.repair and args.null_missing)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,536 @@
+#!/usr/bin/env python3
+"""
+Fonana monthly partitioning for append-mostly history tables
+notifications, partitioned by RANGE ("createdAt")
+
+- migrate: online, chunked conversion of a plain table
+  0. a table with a unique index that does not include "createdAt" is refused:
+     PostgreSQL can only enforce uniqueness per partition, and widening the
+     index would silently drop a guarantee (transactions is not partitioned
+     for this reason: txSignature and postPurchaseId must stay globally unique)
+  1. a partitioned twin is created (same columns/defaults/checks, primary key
+     (id, "createdAt"), secondary indexes and foreign keys copied), with monthly
+     partitions covering the data plus --ahead months and a DEFAULT partition
+  2. a trigger mirrors every INSERT/UPDATE/DELETE on the old table into it
+  3. existing rows are backfilled in keyset chunks ("createdAt", id), one
+     commit per chunk (ON CONFLICT DO NOTHING: mirrored rows are newer)
+  4. a short ACCESS EXCLUSIVE swap verifies row counts and renames tables,
+     indexes and the primary key; the old table stays as <table>_unpartitioned
+- ensure: create upcoming monthly partitions (run from cron); rows sitting in
+  the DEFAULT partition for that month are moved into it
+- archive: partitions older than --retention-months are exported to
+  compressed columnar snapshots (db_snapshot.py, zstd Parquet), verified,
+  detached and dropped; archived months are recorded in _partition_archive
+- The importers call route_rows() to write straight into the month partition
+
+Usage:
+  python scripts/partition_history.py migrate --table notifications
+  python scripts/partition_history.py ensure --ahead 3
+  python scripts/partition_history.py archive --retention-months 12 --out snapshots/archive
+  python scripts/partition_history.py status
+"""
+
+import argparse
+import datetime
+import os
+import re
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import fonana_db
+import fonana_trace
+from fonana_db import quote_ident
+from fonana_trace import span
+
+# Partitioned table -> range key
+TABLES = {"notifications": "createdAt"}
+
+ARCHIVE_TABLE = "_partition_archive"
+ARCHIVE_DIR = Path(os.environ.get(
+    "FONANA_ARCHIVE_DIR", Path(__file__).resolve().parent.parent / "snapshots" / "archive"
+))
+
+DEFAULT_CHUNK_SIZE = 5000
+DEFAULT_AHEAD_MONTHS = 3
+DEFAULT_RETENTION_MONTHS = 12
+
+_BOUND_RE = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+
+def month_start(value):
+    """First day of the month of a date, datetime or ISO string"""
+    if isinstance(value, str):
+        return datetime.date(int(value[:4]), int(value[5:7]), 1)
+    return datetime.date(value.year, value.month, 1)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table, month):
+    return f"{table}_p{month:%Y_%m}"
+
+
+def is_partitioned(conn, table):
+    cursor = conn.cursor()
+    cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", (quote_ident(table),))
+    row = cursor.fetchone()
+    cursor.close()
+    return row is not None and row[0] == "p"
+
+
+def partitions(conn, table):
+    """[(partition, lower month, upper month)] sorted; DEFAULT partition has None bounds"""
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+        FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(%s)
+    """, (quote_ident(table),))
+    found = []
+    for name, bound in cursor.fetchall():
+        match = _BOUND_RE.search(bound)
+        if match:
+            found.append((name, month_start(match.group(1)), month_start(match.group(2))))
+        else:
+            found.append((name, None, None))
+    cursor.close()
+    return sorted(found, key=lambda p: (p[1] is not None, p[1] or datetime.date.min))
+
+
+def ensure_archive_table(cursor):
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {ARCHIVE_TABLE} (
+            table_name text NOT NULL,
+            month date NOT NULL,
+            location text NOT NULL,
+            rows bigint NOT NULL,
+            bytes bigint NOT NULL,
+            archived_at timestamp NOT NULL DEFAULT now(),
+            PRIMARY KEY (table_name, month)
+        )
+    """)
+
+
+def archived_months(conn, table):
+    cursor = conn.cursor()
+    cursor.execute("SELECT to_regclass(%s) IS NOT NULL", (ARCHIVE_TABLE,))
+    if not cursor.fetchone()[0]:
+        cursor.close()
+        return set()
+    cursor.execute(f"SELECT month FROM {ARCHIVE_TABLE} WHERE table_name = %s", (table,))
+    months = {row[0] for row in cursor.fetchall()}
+    cursor.close()
+    return months
+
+
+def attach_month(cursor, table, month, key=None):
+    """Create and attach one monthly partition, moving its rows out of DEFAULT first"""
+    key = quote_ident(key or TABLES[table])
+    name = partition_name(table, month)
+    lower, upper = month.isoformat(), add_months(month, 1).isoformat()
+    cursor.execute("SELECT to_regclass(%s) IS NOT NULL", (quote_ident(name),))
+    if cursor.fetchone()[0]:
+        return None
+    cursor.execute(
+        f"CREATE TABLE {quote_ident(name)} (LIKE {quote_ident(table)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+    )
+    default = quote_ident(f"{table}_default")
+    cursor.execute("SELECT to_regclass(%s) IS NOT NULL", (default,))
+    if cursor.fetchone()[0]:
+        cursor.execute(f"""
+            WITH moved AS (
+                DELETE FROM {default} WHERE {key} >= %s AND {key} < %s RETURNING *
+            )
+            INSERT INTO {quote_ident(name)} SELECT * FROM moved
+        """, (lower, upper))
+    cursor.execute(
+        f"ALTER TABLE {quote_ident(table)} ATTACH PARTITION {quote_ident(name)} "
+        f"FOR VALUES FROM (%s) TO (%s)", (lower, upper)
+    )
+    return name
+
+
+def ensure_partitions(conn, table, months):
+    """Attach missing partitions for the given months (archived months are skipped)"""
+    archived = archived_months(conn, table)
+    cursor = conn.cursor()
+    created = []
+    for month in sorted(set(months) - archived):
+        name = attach_month(cursor, table, month)
+        if name:
+            created.append(name)
+    conn.commit()
+    cursor.close()
+    return created
+
+
+def route_rows(conn, table, rows):
+    """Group import rows by month partition: ({partition: rows}, rows of archived months)
+
+    Missing partitions are created on the way; None when the table is not partitioned.
+    """
+    if not is_partitioned(conn, table):
+        return None
+    key = TABLES[table]
+    by_month = defaultdict(list)
+    for row in rows:
+        by_month[month_start(row[key])].append(row)
+    archived = archived_months(conn, table)
+    ensure_partitions(conn, table, [m for m in by_month if m not in archived])
+    routed, skipped = {}, []
+    for month, month_rows in sorted(by_month.items()):
+        if month in archived:
+            skipped.extend(month_rows)
+        else:
+            routed[partition_name(table, month)] = month_rows
+    return routed, skipped
+
+
+# --- online migration ---
+
+def _indexes(cursor, table):
+    """[(index name, definition, is unique)] excluding the primary key"""
+    cursor.execute("""
+        SELECT i.relname, pg_get_indexdef(x.indexrelid), x.indisunique
+        FROM pg_index x JOIN pg_class i ON i.oid = x.indexrelid
+        WHERE x.indrelid = to_regclass(%s) AND NOT x.indisprimary
+    """, (quote_ident(table),))
+    return cursor.fetchall()
+
+
+def _foreign_keys(cursor, table):
+    cursor.execute("""
+        SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint
+        WHERE conrelid = to_regclass(%s) AND contype = 'f'
+    """, (quote_ident(table),))
+    return cursor.fetchall()
+
+
+def _columns(cursor, table):
+    """Column names in table order (dropped columns excluded)"""
+    cursor.execute("""
+        SELECT attname FROM pg_attribute
+        WHERE attrelid = to_regclass(%s) AND attnum > 0 AND NOT attisdropped
+        ORDER BY attnum
+    """, (quote_ident(table),))
+    return [name for name, in cursor.fetchall()]
+
+
+def _primary_key_name(cursor, table):
+    cursor.execute("""
+        SELECT conname FROM pg_constraint WHERE conrelid = to_regclass(%s) AND contype = 'p'
+    """, (quote_ident(table),))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def _unique_without_key(cursor, table, key):
+    """Unique indexes (other than the primary key) a partitioned twin could not enforce"""
+    cursor.execute("""
+        SELECT i.relname
+        FROM pg_index x JOIN pg_class i ON i.oid = x.indexrelid
+        WHERE x.indrelid = to_regclass(%s) AND x.indisunique AND NOT x.indisprimary
+          AND NOT EXISTS (
+              SELECT 1 FROM pg_attribute a
+              WHERE a.attrelid = x.indrelid AND a.attname = %s AND a.attnum = ANY(x.indkey)
+          )
+    """, (quote_ident(table), key))
+    return [name for name, in cursor.fetchall()]
+
+
+def _rewrite_index(definition, old_name, new_name, table, new_table):
+    """Index definition retargeted at the partitioned twin"""
+    definition = definition.replace(f"INDEX {quote_ident(old_name)} ON", f"INDEX {quote_ident(new_name)} ON", 1)
+    definition = definition.replace(f"INDEX {old_name} ON", f"INDEX {quote_ident(new_name)} ON", 1)
+    definition = re.sub(rf"ON (?:\S+\.)?{re.escape(quote_ident(table))}|ON (?:\S+\.)?{re.escape(table)}\b",
+                        f"ON {quote_ident(new_table)}", definition, count=1)
+    definition = definition.replace(" ON ONLY ", " ON ")
+    return definition
+
+
+def create_twin(conn, table, ahead=DEFAULT_AHEAD_MONTHS):
+    """Partitioned twin with indexes, foreign keys, partitions and the mirror trigger"""
+    key = TABLES[table]
+    twin = f"{table}_partitioned"
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        CREATE TABLE {quote_ident(twin)}
+        (LIKE {quote_ident(table)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING STORAGE)
+        PARTITION BY RANGE ({quote_ident(key)})
+    """)
+    cursor.execute(f'ALTER TABLE {quote_ident(twin)} ADD CONSTRAINT {quote_ident(twin + "_pkey")} '
+                   f'PRIMARY KEY (id, {quote_ident(key)})')
+    for name, definition, _ in _indexes(cursor, table):
+        cursor.execute(_rewrite_index(definition, name, f"{name}_part", table, twin))
+    for name, definition in _foreign_keys(cursor, table):
+        cursor.execute(f"ALTER TABLE {quote_ident(twin)} ADD CONSTRAINT {quote_ident(name)} {definition}")
+
+    cursor.execute(f"SELECT min({quote_ident(key)}) FROM {quote_ident(table)}")
+    oldest = cursor.fetchone()[0]
+    current = month_start(datetime.date.today())
+    month = month_start(oldest) if oldest else current
+    while month <= add_months(current, ahead):
+        cursor.execute(
+            f"CREATE TABLE {quote_ident(partition_name(table, month))} PARTITION OF {quote_ident(twin)} "
+            f"FOR VALUES FROM (%s) TO (%s)", (month.isoformat(), add_months(month, 1).isoformat())
+        )
+        month = add_months(month, 1)
+    cursor.execute(f"CREATE TABLE {quote_ident(table + '_default')} PARTITION OF {quote_ident(twin)} DEFAULT")
+
+    # Mirror live writes while the backfill runs. A backfill chunk may hold the
+    # same row uncommitted: the upsert waits for it and then writes the newer
+    # version over it instead of failing with unique_violation
+    updates = ", ".join(f"{quote_ident(c)} = EXCLUDED.{quote_ident(c)}"
+                        for c in _columns(cursor, table) if c not in ("id", key))
+    conflict = f"ON CONFLICT (id, {quote_ident(key)}) " + (f"DO UPDATE SET {updates}" if updates else "DO NOTHING")
+    function = quote_ident(f"{table}_partition_mirror")
+    cursor.execute(f"""
+        CREATE OR REPLACE FUNCTION {function}() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                DELETE FROM {quote_ident(twin)} WHERE id = OLD.id AND {quote_ident(key)} = OLD.{quote_ident(key)};
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                INSERT INTO {quote_ident(twin)} SELECT (NEW).* {conflict};
+            END IF;
+            RETURN NULL;
+        END $$ LANGUAGE plpgsql
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER {quote_ident(f"{table}_partition_mirror")}
+        AFTER INSERT OR UPDATE OR DELETE ON {quote_ident(table)}
+        FOR EACH ROW EXECUTE FUNCTION {function}()
+    """)
+    conn.commit()
+    cursor.close()
+    return twin
+
+
+def backfill(conn, table, twin, chunk_size=DEFAULT_CHUNK_SIZE, pause=0.0):
+    """Copy existing rows in ("createdAt", id) keyset chunks; returns rows inserted"""
+    key = quote_ident(TABLES[table])
+    # Keyset index on the old table, built without blocking writers
+    helper = fonana_db.connect(autocommit=True)
+    try:
+        helper.cursor().execute(
+            f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {quote_ident(table + '_backfill_idx')} "
+            f"ON {quote_ident(table)} ({key}, id)"
+        )
+    finally:
+        helper.close()
+
+    cursor = conn.cursor()
+    inserted = 0
+    last = None
+    while True:
+        after = f"WHERE ({key}, id) > (%s, %s)" if last else ""
+        cursor.execute(
+            f"SELECT {key}, id FROM {quote_ident(table)} {after} ORDER BY {key}, id OFFSET %s LIMIT 1",
+            (*(last or ()), chunk_size - 1),
+        )
+        upper = cursor.fetchone()
+        bounds = f"({key}, id) <= (%s, %s)" if upper else "TRUE"
+        lower = f"({key}, id) > (%s, %s) AND " if last else ""
+        with span("partition chunk", cat="batch"):
+            cursor.execute(
+                f"INSERT INTO {quote_ident(twin)} SELECT * FROM {quote_ident(table)} "
+                f"WHERE {lower}{bounds} ON CONFLICT DO NOTHING",
+                (*(last or ()), *(upper or ())),
+            )
+            inserted += cursor.rowcount
+            conn.commit()
+            fonana_trace.count(rows=cursor.rowcount)
+        if upper is None:
+            break
+        last = upper
+        if pause:
+            time.sleep(pause)
+    cursor.close()
+    return inserted
+
+
+def swap(conn, table, twin, lock_timeout="5s"):
+    """Atomically replace the old table with the partitioned twin; returns the row count"""
+    backup = f"{table}_unpartitioned"
+    cursor = conn.cursor()
+    cursor.execute("SET LOCAL lock_timeout = %s", (lock_timeout,))
+    cursor.execute(f"LOCK TABLE {quote_ident(table)} IN ACCESS EXCLUSIVE MODE")
+    # Rows deleted between a chunk's snapshot and its insert
+    cursor.execute(f"""
+        DELETE FROM {quote_ident(twin)} t
+        WHERE NOT EXISTS (SELECT 1 FROM {quote_ident(table)} o WHERE o.id = t.id)
+    """)
+    cursor.execute(f"SELECT (SELECT count(*) FROM {quote_ident(table)}), (SELECT count(*) FROM {quote_ident(twin)})")
+    old_count, new_count = cursor.fetchone()
+    if old_count != new_count:
+        conn.rollback()
+        raise RuntimeError(f"{table}: {old_count} rows in the old table, {new_count} in the partitioned one")
+
+    cursor.execute(f"DROP TRIGGER {quote_ident(f'{table}_partition_mirror')} ON {quote_ident(table)}")
+    cursor.execute(f"DROP FUNCTION {quote_ident(f'{table}_partition_mirror')}()")
+    indexes = _indexes(cursor, table)
+    pkey = _primary_key_name(cursor, table)
+    cursor.execute(f"ALTER TABLE {quote_ident(table)} RENAME TO {quote_ident(backup)}")
+    if pkey:
+        cursor.execute(f"ALTER TABLE {quote_ident(backup)} RENAME CONSTRAINT {quote_ident(pkey)} "
+                       f"TO {quote_ident(backup + '_pkey')}")
+    for name, _, _ in indexes:
+        if name == f"{table}_backfill_idx":
+            continue
+        cursor.execute(f"ALTER INDEX {quote_ident(name)} RENAME TO {quote_ident(name + '_old')}")
+        cursor.execute(f"ALTER INDEX {quote_ident(name + '_part')} RENAME TO {quote_ident(name)}")
+    cursor.execute(f"ALTER TABLE {quote_ident(twin)} RENAME TO {quote_ident(table)}")
+    cursor.execute(f"ALTER TABLE {quote_ident(table)} RENAME CONSTRAINT {quote_ident(twin + '_pkey')} "
+                   f"TO {quote_ident(pkey or table + '_pkey')}")
+    conn.commit()
+    cursor.execute(f"ANALYZE {quote_ident(table)}")
+    conn.commit()
+    cursor.close()
+    return new_count
+
+
+def migrate(conn, table, chunk_size=DEFAULT_CHUNK_SIZE, ahead=DEFAULT_AHEAD_MONTHS, pause=0.0):
+    """Online conversion of one table; returns stats or None if already partitioned
+
+    Raises RuntimeError before touching anything if a unique index lacks the range key.
+    """
+    if is_partitioned(conn, table):
+        return None
+    cursor = conn.cursor()
+    blockers = _unique_without_key(cursor, table, TABLES[table])
+    cursor.close()
+    conn.rollback()
+    if blockers:
+        raise RuntimeError(
+            f"{table}: unique indexes without {TABLES[table]!r} ({', '.join(blockers)}) "
+            f"cannot be enforced across partitions, refusing to migrate"
+        )
+    stats = {}
+    with span(f"partition-twin {table}"):
+        twin = create_twin(conn, table, ahead)
+    with span(f"partition-backfill {table}"):
+        stats["backfilled"] = backfill(conn, table, twin, chunk_size, pause)
+    with span(f"partition-swap {table}"):
+        stats["rows"] = swap(conn, table, twin)
+    stats["partitions"] = len(partitions(conn, table))
+    return stats
+
+
+# --- retention ---
+
+def archive(conn, table, retention_months=DEFAULT_RETENTION_MONTHS, out_dir=ARCHIVE_DIR, keep_detached=False):
+    """Export, verify, detach and drop partitions older than the retention window"""
+    import db_snapshot
+
+    cutoff = add_months(month_start(datetime.date.today()), -retention_months)
+    cursor = conn.cursor()
+    ensure_archive_table(cursor)
+    conn.commit()
+    archived = []
+    for name, lower, upper in partitions(conn, table):
+        if lower is None or upper > cutoff:
+            continue
+        location = Path(out_dir) / table / f"{lower:%Y-%m}"
+        with span(f"archive {name}"):
+            writer = db_snapshot.SnapshotWriter(location)
+            exported = db_snapshot.export_table(conn, conn, writer, name)
+            writer.close()
+            cursor.execute(f"SELECT count(*) FROM {quote_ident(name)}")
+            if cursor.fetchone()[0] != exported["rows"]:
+                raise RuntimeError(f"{name}: snapshot row count mismatch, partition kept")
+            cursor.execute(f"ALTER TABLE {quote_ident(table)} DETACH PARTITION {quote_ident(name)}")
+            if not keep_detached:
+                cursor.execute(f"DROP TABLE {quote_ident(name)}")
+            cursor.execute(f"""
+                INSERT INTO {ARCHIVE_TABLE} (table_name, month, location, rows, bytes)
+                VALUES (%s, %s, %s, %s, %s)
+                ON CONFLICT (table_name, month) DO UPDATE SET
+                    location = EXCLUDED.location, rows = EXCLUDED.rows,
+                    bytes = EXCLUDED.bytes, archived_at = now()
+            """, (table, lower, str(location), exported["rows"], exported["bytes"]))
+            conn.commit()
+        archived.append((name, exported["rows"], exported["bytes"]))
+    cursor.close()
+    return archived
+
+
+def print_status(conn, table):
+    if not is_partitioned(conn, table):
+        print(f"📋 {table}: not partitioned")
+        return
+    cursor = conn.cursor()
+    print(f"📋 {table}:")
+    for name, lower, _ in partitions(conn, table):
+        cursor.execute("SELECT reltuples::bigint, pg_total_relation_size(oid) FROM pg_class WHERE oid = to_regclass(%s)",
+                       (quote_ident(name),))
+        rows, size = cursor.fetchone()
+        label = f"{lower:%Y-%m}" if lower else "default"
+        print(f"   {label:<8} {name:<32} ~{max(rows, 0):>10} rows {size / (1 << 20):>8.1f} MB")
+    cursor.close()
+    months = sorted(archived_months(conn, table))
+    if months:
+        print(f"   archived: {months[0]:%Y-%m} .. {months[-1]:%Y-%m} ({len(months)} months)")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Monthly partitioning and retention for history tables")
+    parser.add_argument("command", choices=["migrate", "ensure", "archive", "status"])
+    parser.add_argument("--table", action="append", choices=sorted(TABLES),
+                        help="table to process (repeatable, default: all)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="rows per backfill chunk")
+    parser.add_argument("--pause", type=float, default=0.0, help="seconds to sleep between backfill chunks")
+    parser.add_argument("--ahead", type=int, default=DEFAULT_AHEAD_MONTHS, help="future months to pre-create")
+    parser.add_argument("--retention-months", type=int, default=DEFAULT_RETENTION_MONTHS,
+                        help="archive partitions older than this")
+    parser.add_argument("--out", default=str(ARCHIVE_DIR), help="archive snapshot directory")
+    parser.add_argument("--keep-detached", action="store_true", help="archive: detach but do not drop partitions")
+    fonana_trace.add_arguments(parser)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    fonana_trace.configure(args)
+    tables = args.table or list(TABLES)
+
+    start = time.time()
+    ok = True
+    with fonana_db.connection() as conn:
+        for table in tables:
+            if args.command == "migrate":
+                try:
+                    stats = migrate(conn, table, args.chunk_size, args.ahead, args.pause)
+                except RuntimeError as e:
+                    print(f"❌ {e}")
+                    ok = False
+                    continue
+                if stats is None:
+                    print(f"✅ {table}: already partitioned")
+                else:
+                    print(f"✅ {table}: {stats['rows']} rows in {stats['partitions']} partitions "
+                          f"(old table kept as {table}_unpartitioned)")
+            elif args.command == "ensure":
+                if not is_partitioned(conn, table):
+                    print(f"⚠️  {table}: not partitioned, run migrate first")
+                    continue
+                current = month_start(datetime.date.today())
+                created = ensure_partitions(conn, table, [add_months(current, i) for i in range(args.ahead + 1)])
+                print(f"✅ {table}: {len(created)} partitions created")
+            elif args.command == "archive":
+                archived = archive(conn, table, args.retention_months, args.out, args.keep_detached)
+                size = sum(b for _, _, b in archived)
+                print(f"📦 {table}: {len(archived)} partitions archived "
+                      f"({sum(r for _, r, _ in archived)} rows, {size / (1 << 20):.1f} MB of snapshots)")
+            else:
+                print_status(conn, table)
+    print(f"⏱️  Done in {time.time() - start:.1f} seconds")
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
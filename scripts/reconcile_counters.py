@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Fonana Counter Reconciliation
+Recomputes denormalized counters from the real rows with set-based statements
+
+- One UPDATE per table: grouped aggregates joined back to the table, writing
+  only rows whose counters actually changed (IS DISTINCT FROM)
+- Full mode scans everything; incremental mode (--touched FILE or
+  reconcile(conn, touched)) limits every aggregate to the keys touched by the
+  last import
+- posts.viewsCount has no backing rows and is left as imported
+
+Usage:
+  python scripts/reconcile_counters.py                         # full reconciliation
+  python scripts/reconcile_counters.py --touched .last_import.json
+  python scripts/reconcile_counters.py --dry-run               # report drift only
+"""
+
+import argparse
+import json
+import sys
+import time
+
+import fonana_db
+import fonana_trace
+from fonana_db import quote_ident
+from fonana_trace import span
+
+# table -> [(counter column, source table, source foreign key)]
+COUNTERS = {
+    "users": [
+        ("followersCount", "follows", "followingId"),
+        ("followingCount", "follows", "followerId"),
+        ("postsCount", "posts", "creatorId"),
+    ],
+    "posts": [
+        ("likesCount", "likes", "postId"),
+        ("commentsCount", "comments", "postId"),
+    ],
+    "comments": [
+        ("likesCount", "likes", "commentId"),
+    ],
+    "tags": [
+        ("usageCount", "post_tags", "tagId"),
+    ],
+}
+
+
+def existing_columns(conn):
+    """{table: set(columns)} for the counter tables"""
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT table_name, column_name FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = ANY(%s)
+    """, (list(COUNTERS) + sorted({src for specs in COUNTERS.values() for _, src, _ in specs}),))
+    columns = {}
+    for table, column in cursor.fetchall():
+        columns.setdefault(table, set()).add(column)
+    cursor.close()
+    return columns
+
+
+def reconcile_sql(table, counters, incremental, dry_run):
+    """UPDATE (or drift SELECT) recomputing every counter of one table"""
+    key_filter = "WHERE {fk} = ANY(%(keys)s)" if incremental else "WHERE {fk} IS NOT NULL"
+    ctes, joins, values = [], [], []
+    for i, (column, source, fk) in enumerate(counters):
+        fk_sql = quote_ident(fk)
+        ctes.append(
+            f"c{i} AS (SELECT {fk_sql} AS id, count(*) AS n FROM {quote_ident(source)} "
+            f"{key_filter.format(fk=fk_sql)} GROUP BY 1)"
+        )
+        joins.append(f"LEFT JOIN c{i} ON c{i}.id = t.id")
+        values.append((column, f"coalesce(c{i}.n, 0)"))
+
+    scope = "WHERE t.id = ANY(%(keys)s)" if incremental else ""
+    computed = ", ".join(f"{expr} AS {quote_ident(column)}" for column, expr in values)
+    drift = " OR ".join(
+        f"target.{quote_ident(column)} IS DISTINCT FROM fresh.{quote_ident(column)}"
+        for column, _ in values
+    )
+    fresh = (
+        f"SELECT t.id, {computed} FROM {quote_ident(table)} t {' '.join(joins)} {scope}"
+    )
+
+    if dry_run:
+        return (
+            f"WITH {', '.join(ctes)} SELECT count(*) FROM {quote_ident(table)} target "
+            f"JOIN ({fresh}) fresh ON fresh.id = target.id WHERE {drift}"
+        )
+    assignments = ", ".join(
+        f"{quote_ident(column)} = fresh.{quote_ident(column)}" for column, _ in values
+    )
+    return (
+        f"WITH {', '.join(ctes)} UPDATE {quote_ident(table)} target SET {assignments} "
+        f"FROM ({fresh}) fresh WHERE fresh.id = target.id AND ({drift})"
+    )
+
+
+def reconcile(conn, touched=None, dry_run=False):
+    """Reconcile every counter; `touched` = {table: ids} limits work to those rows
+
+    Returns {table: rows changed (or drifted, with dry_run)}.
+    """
+    columns = existing_columns(conn)
+    cursor = conn.cursor()
+    changed = {}
+    for table, specs in COUNTERS.items():
+        present = [
+            spec for spec in specs
+            if spec[0] in columns.get(table, ()) and spec[2] in columns.get(spec[1], ())
+        ]
+        if not present:
+            continue
+        keys = None
+        if touched is not None:
+            keys = sorted(touched.get(table, ()))
+            if not keys:
+                continue
+        with span(f"reconcile {table}", cat="batch"):
+            cursor.execute(reconcile_sql(table, present, keys is not None, dry_run), {"keys": keys})
+            changed[table] = cursor.fetchone()[0] if dry_run else cursor.rowcount
+            fonana_trace.count(rows=changed[table])
+    cursor.close()
+    if dry_run:
+        conn.rollback()
+    else:
+        conn.commit()
+    return changed
+
+
+def print_summary(changed, dry_run=False):
+    verb = "drifted" if dry_run else "updated"
+    print(f"🔢 Counter reconciliation:")
+    for table, count in changed.items():
+        print(f"   - {table}: {count} rows {verb}")
+
+
+def load_touched(path):
+    """{table: set(ids)} from a JSON file written by the importer"""
+    with open(path) as f:
+        return {table: set(ids) for table, ids in json.load(f).items()}
+
+
+def save_touched(path, touched):
+    with open(path, "w") as f:
+        json.dump({table: sorted(ids) for table, ids in touched.items()}, f)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recompute denormalized counters from real rows")
+    parser.add_argument("--touched", metavar="FILE",
+                        help="incremental mode: JSON {table: [ids]} of rows touched by the last import")
+    parser.add_argument("--dry-run", action="store_true", help="only count rows whose counters drifted")
+    fonana_trace.add_arguments(parser)
+    args = parser.parse_args(argv)
+    fonana_trace.configure(args)
+
+    touched = load_touched(args.touched) if args.touched else None
+    start = time.time()
+    with fonana_db.connection() as conn:
+        changed = reconcile(conn, touched, args.dry_run)
+    print_summary(changed, args.dry_run)
+    print(f"✅ Done in {time.time() - start:.1f} seconds")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Fonana schema-driven row codec for the generators and importers
+
+- Column order, nullability and types come from prisma/schema.prisma (scalar
+  fields only, @map/@@map honoured, enums treated as text)
+- Rows are tuple-backed records (namedtuple: no per-row dict, fields by name
+  or position) and double as DB-API parameter tuples
+- Per-column converters are compiled once per codec into a single decode()
+  and literal() function, so a row is never re-looked-up field by field
+- String literals are always safe: quotes doubled, backslashes only inside E''
+
+Usage:
+  codec = RowCodec("posts")
+  record = codec.decode(row_dict)            # typed record in schema column order
+  cursor.execute(sql, record)                # records are parameter tuples
+  codec.insert_sql(records, "ON CONFLICT (id) DO NOTHING")
+
+  python scripts/row_codec.py posts          # print the compiled column layout
+"""
+
+import datetime
+import decimal
+import json
+import math
+import os
+import re
+import sys
+from collections import namedtuple
+from functools import lru_cache
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "prisma", "schema.prisma")
+
+SCALAR_TYPES = {"String", "Int", "BigInt", "Float", "Decimal", "Boolean", "DateTime", "Json", "Bytes"}
+
+Field = namedtuple("Field", "name column type optional")
+
+_BLOCK_RE = re.compile(r"^(model|enum)\s+(\w+)\s*\{(.*?)^\}", re.S | re.M)
+_FIELD_RE = re.compile(r"^(\w+)\s+(\w+)(\[\])?(\?)?(.*)$")
+_MAP_RE = re.compile(r'@map\("([^"]+)"\)')
+
+
+@lru_cache(maxsize=None)
+def load_schema(path=SCHEMA_PATH):
+    """{table: [Field]} for every model, scalar columns in declaration order"""
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    blocks = _BLOCK_RE.findall(text)
+    enums = {name for kind, name, _ in blocks if kind == "enum"}
+
+    tables = {}
+    for kind, name, body in blocks:
+        if kind != "model":
+            continue
+        table, fields = name, []
+        for line in body.splitlines():
+            line = line.split("//", 1)[0].strip()
+            if not line:
+                continue
+            if line.startswith("@@"):
+                mapped = re.match(r'@@map\("([^"]+)"\)', line)
+                if mapped:
+                    table = mapped.group(1)
+                continue
+            match = _FIELD_RE.match(line)
+            if not match:
+                continue
+            field, ftype, is_list, optional, attrs = match.groups()
+            if is_list or (ftype not in SCALAR_TYPES and ftype not in enums):
+                continue  # relation fields have no column
+            column = _MAP_RE.search(attrs)
+            fields.append(Field(
+                field,
+                column.group(1) if column else field,
+                "Enum" if ftype in enums else ftype,
+                bool(optional),
+            ))
+        tables[table] = fields
+    return tables
+
+
+# --- decode: loose JSON/CSV values -> typed values ---
+
+def _to_bool(value):
+    if type(value) is bool:
+        return value
+    if isinstance(value, str):
+        return value.strip().lower() in ("true", "t", "1", "yes")
+    return bool(value)
+
+
+def _to_json(value):
+    return value if isinstance(value, str) else json.dumps(value, ensure_ascii=False)
+
+
+DECODERS = {
+    "Int": int,
+    "BigInt": int,
+    "Float": float,
+    "Decimal": lambda value: decimal.Decimal(str(value)),
+    "Boolean": _to_bool,
+    "Json": _to_json,
+}
+
+# --- literal: typed values -> SQL literal text ---
+
+
+def quote_literal(value):
+    """SQL string literal, valid with any standard_conforming_strings setting"""
+    value = str(value)
+    if "\\" in value:
+        return "E'" + value.replace("\\", "\\\\").replace("'", "''") + "'"
+    return "'" + value.replace("'", "''") + "'"
+
+
+def _special_float(value, cast):
+    """NaN/±Infinity as quoted PostgreSQL literals (bare nan/inf are not SQL)"""
+    if value != value:
+        return f"'NaN'::{cast}"
+    return f"'{'-' if value < 0 else ''}Infinity'::{cast}"
+
+
+def _float_literal(value):
+    return repr(value) if math.isfinite(value) else _special_float(value, "float8")
+
+
+def _decimal_literal(value):
+    return str(value) if value.is_finite() else _special_float(float(value), "numeric")
+
+
+def _datetime_literal(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        value = value.isoformat(sep=" ") if isinstance(value, datetime.datetime) else value.isoformat()
+    return quote_literal(value)
+
+
+ENCODERS = {
+    "Int": str,
+    "BigInt": str,
+    "Float": _float_literal,
+    "Decimal": _decimal_literal,
+    "Boolean": lambda value: "true" if value else "false",
+    "DateTime": _datetime_literal,
+    "Json": lambda value: quote_literal(_to_json(value)),
+}
+
+
+class MissingFieldError(KeyError):
+    """A row lacks a non-nullable column that has no default"""
+
+    def __str__(self):
+        return self.args[0]
+
+
+def _missing_field(table, row, columns):
+    missing = next(c for c in columns if c not in row)
+    return MissingFieldError(f"{table} row {row.get('id')!r}: missing non-nullable field {missing!r}")
+
+
+def quote_ident(name):
+    """Quote a PostgreSQL identifier"""
+    return '"' + name.replace('"', '""') + '"'
+
+
+class RowCodec:
+    """Compiled decoder/encoder for one table
+
+    columns: subset/order of columns (default: every scalar column of the model)
+    defaults: {column: value} used when a row lacks the column; other
+      non-nullable columns must be present (MissingFieldError names the row
+      and the field), nullable ones default to None
+    extra_types: {column: prisma type} for live columns missing from the schema
+    """
+
+    __slots__ = ("table", "columns", "types", "record", "decode", "literal")
+
+    def __init__(self, table, columns=None, defaults=None, extra_types=None, schema_path=SCHEMA_PATH):
+        fields = {f.column: f for f in load_schema(schema_path).get(table, [])}
+        for column, ftype in (extra_types or {}).items():
+            fields.setdefault(column, Field(column, column, ftype, True))
+        if not fields:
+            raise KeyError(f"table {table!r} is not in {schema_path}")
+        columns = list(columns) if columns else list(fields)
+        unknown = [c for c in columns if c not in fields]
+        if unknown:
+            raise KeyError(f"{table}: columns not in schema: {', '.join(unknown)}")
+
+        self.table = table
+        self.columns = columns
+        self.types = [fields[c].type for c in columns]
+        self.record = namedtuple(f"{table.title().replace('_', '')}Row", columns, rename=True)
+        self.decode = self._compile_decode([fields[c] for c in columns], defaults or {})
+        self.literal = self._compile_literal()
+
+    def _compile_decode(self, fields, defaults):
+        env = {"_new": tuple.__new__, "_Record": self.record, "_missing": _missing_field,
+               "_table": self.table}
+        required = []
+        lines = ["def decode(row):", "  try:"]
+        for i, field in enumerate(fields):
+            if field.column in defaults:
+                env[f"_d{i}"] = defaults[field.column]
+                access = f"row.get({field.column!r}, _d{i})"
+            elif field.optional:
+                access = f"row.get({field.column!r})"
+            else:
+                access = f"row[{field.column!r}]"
+                required.append(field.column)
+            lines.append(f"    v{i} = {access}")
+            converter = DECODERS.get(field.type)
+            if converter is not None:
+                env[f"_c{i}"] = converter
+                lines.append(f"    if v{i} is not None: v{i} = _c{i}(v{i})")
+        values = ", ".join(f"v{i}" for i in range(len(fields)))
+        lines.append(f"    return _new(_Record, ({values},))")
+        env["_required"] = tuple(required)
+        # Only a missing required key can raise KeyError; name the row and the field
+        lines.append("  except KeyError:")
+        lines.append("    raise _missing(_table, row, _required) from None")
+        exec("\n".join(lines), env)
+        return env["decode"]
+
+    def _compile_literal(self):
+        env = {}
+        parts = []
+        for i, ftype in enumerate(self.types):
+            env[f"_e{i}"] = ENCODERS.get(ftype, quote_literal)
+            parts.append(f'("null" if v{i} is None else _e{i}(v{i}))')
+        unpack = ", ".join(f"v{i}" for i in range(len(self.types)))
+        joined = ' + ", " + '.join(parts)
+        source = (
+            f"def literal(record):\n"
+            f"    {unpack}, = record\n"
+            f"    return '(' + {joined} + ')'"
+        )
+        exec(source, env)
+        return env["literal"]
+
+    def columns_sql(self):
+        return ", ".join(quote_ident(c) for c in self.columns)
+
+    def decode_all(self, rows):
+        decode = self.decode
+        return [decode(row) for row in rows]
+
+    def insert_sql(self, records, conflict=""):
+        """Multi-row INSERT ... VALUES statement for already decoded records"""
+        literal = self.literal
+        values = ",\n".join(literal(record) for record in records)
+        tail = f"\n{conflict}" if conflict else ""
+        return f"INSERT INTO {quote_ident(self.table)} ({self.columns_sql()}) VALUES\n{values}{tail};"
+
+
+@lru_cache(maxsize=None)
+def codec(table):
+    """Shared full-width codec for a table"""
+    return RowCodec(table)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    tables = load_schema()
+    for table in argv or sorted(tables):
+        print(f"{table}:")
+        for field in tables[table]:
+            print(f"   {field.column:<22} {field.type}{'?' if field.optional else ''}")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
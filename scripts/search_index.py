@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Fonana post search index
+Builds and refreshes a weighted tsvector column on posts for full-text search
+
+- posts."searchVector" = title (weight A) || content (B) || tag names (C)
+- Filled in chunked set-based UPDATEs (keyset over posts.id, one commit per
+  chunk) that only write rows whose vector actually changed
+- A full build drops the GIN index first and recreates it CONCURRENTLY after
+  the fill, then ANALYZEs posts
+- Incremental mode refreshes only the posts touched by the last import; the
+  importers call refresh() from finish_import
+
+Queries hit the GIN index instead of scanning posts.content:
+  SELECT id, ts_rank("searchVector", q) AS rank
+  FROM posts, websearch_to_tsquery('simple', 'solana art') q
+  WHERE "searchVector" @@ q ORDER BY rank DESC LIMIT 20
+
+Usage:
+  python scripts/search_index.py                            # full build
+  python scripts/search_index.py --touched .last_import.json
+  python scripts/search_index.py --query "solana art"       # ranked test search
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import fonana_db
+import fonana_trace
+import reconcile_counters
+from fonana_trace import span
+
+COLUMN = "searchVector"
+INDEX = "posts_search_vector_idx"
+
+# 'simple' keeps mixed Russian/English content searchable without stemming surprises
+TS_CONFIG = os.environ.get("FONANA_SEARCH_CONFIG", "simple")
+
+DEFAULT_CHUNK_SIZE = 2000
+
+VECTOR_SQL = """
+    setweight(to_tsvector(%(config)s::regconfig, coalesce(p.title, '')), 'A') ||
+    setweight(to_tsvector(%(config)s::regconfig, coalesce(p.content, '')), 'B') ||
+    setweight(to_tsvector(%(config)s::regconfig, coalesce(t.names, '')), 'C')
+"""
+
+UPDATE_SQL = f"""
+    UPDATE posts target SET "{COLUMN}" = fresh.vector
+    FROM (
+        SELECT p.id, {VECTOR_SQL} AS vector
+        FROM posts p
+        LEFT JOIN (
+            SELECT pt."postId", string_agg(tg.name, ' ') AS names
+            FROM post_tags pt JOIN tags tg ON tg.id = pt."tagId"
+            WHERE pt."postId" = ANY(%(ids)s)
+            GROUP BY pt."postId"
+        ) t ON t."postId" = p.id
+        WHERE p.id = ANY(%(ids)s)
+    ) fresh
+    WHERE fresh.id = target.id AND target."{COLUMN}" IS DISTINCT FROM fresh.vector
+"""
+
+
+def column_exists(conn):
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT 1 FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = 'posts' AND column_name = %s
+    """, (COLUMN,))
+    exists = cursor.fetchone() is not None
+    cursor.close()
+    return exists
+
+
+def update_chunk(cursor, ids, config=TS_CONFIG):
+    """Recompute vectors for one chunk of post ids; returns rows changed"""
+    cursor.execute(UPDATE_SQL, {"ids": list(ids), "config": config})
+    return cursor.rowcount
+
+
+def iter_id_chunks(conn, chunk_size):
+    """Keyset pagination over posts.id (each chunk is its own short query)"""
+    cursor = conn.cursor()
+    last = ""
+    while True:
+        cursor.execute("SELECT id FROM posts WHERE id > %s ORDER BY id LIMIT %s", (last, chunk_size))
+        ids = [row[0] for row in cursor.fetchall()]
+        if not ids:
+            break
+        yield ids
+        last = ids[-1]
+    cursor.close()
+
+
+def create_index():
+    """GIN index built CONCURRENTLY on a dedicated autocommit connection"""
+    conn = fonana_db.connect(autocommit=True)
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS "{INDEX}" ON posts USING gin ("{COLUMN}")')
+        cursor.execute("ANALYZE posts")
+        cursor.close()
+    finally:
+        conn.close()
+
+
+def build(conn, chunk_size=DEFAULT_CHUNK_SIZE, config=TS_CONFIG):
+    """Full build: add column, drop index, chunked fill, recreate index; returns stats"""
+    cursor = conn.cursor()
+    cursor.execute(f'ALTER TABLE posts ADD COLUMN IF NOT EXISTS "{COLUMN}" tsvector')
+    cursor.execute(f'DROP INDEX IF EXISTS "{INDEX}"')
+    conn.commit()
+
+    stats = {"posts": 0, "updated": 0, "chunks": 0}
+    with span("fill-search-vectors"):
+        for ids in iter_id_chunks(conn, chunk_size):
+            with span("search chunk", cat="batch"):
+                changed = update_chunk(cursor, ids, config)
+                conn.commit()
+                fonana_trace.count(rows=changed)
+            stats["posts"] += len(ids)
+            stats["updated"] += changed
+            stats["chunks"] += 1
+    cursor.close()
+
+    started = time.time()
+    with span("create-search-index"):
+        create_index()
+    stats["index_seconds"] = round(time.time() - started, 2)
+    return stats
+
+
+def refresh(conn, post_ids, chunk_size=DEFAULT_CHUNK_SIZE, config=TS_CONFIG):
+    """Incremental refresh for the given posts; None if the column was never built"""
+    if not column_exists(conn):
+        return None
+    ids = sorted(post_ids)
+    cursor = conn.cursor()
+    updated = 0
+    with span("refresh-search-vectors"):
+        for start in range(0, len(ids), chunk_size):
+            updated += update_chunk(cursor, ids[start:start + chunk_size], config)
+            conn.commit()
+    cursor.close()
+    fonana_trace.count(rows=updated)
+    return updated
+
+
+def search(conn, text, limit=20, config=TS_CONFIG):
+    """Ranked search over the index: [(id, title, rank)]"""
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT p.id, p.title, ts_rank(p."{COLUMN}", q) AS rank
+        FROM posts p, websearch_to_tsquery(%s::regconfig, %s) q
+        WHERE p."{COLUMN}" @@ q
+        ORDER BY rank DESC, p."createdAt" DESC
+        LIMIT %s
+    """, (config, text, limit))
+    rows = cursor.fetchall()
+    cursor.close()
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or refresh the posts full-text search column")
+    parser.add_argument("--touched", metavar="FILE",
+                        help="incremental mode: refresh posts listed in the importer's touched-keys file")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                        help=f"posts per UPDATE (default {DEFAULT_CHUNK_SIZE})")
+    parser.add_argument("--config", default=TS_CONFIG, help=f"text search configuration (default {TS_CONFIG})")
+    parser.add_argument("--query", help="run a ranked test search instead of building")
+    fonana_trace.add_arguments(parser)
+    args = parser.parse_args(argv)
+    fonana_trace.configure(args)
+
+    start = time.time()
+    with fonana_db.connection() as conn:
+        if args.query:
+            for post_id, title, rank in search(conn, args.query, config=args.config):
+                print(f"{rank:.4f}  {post_id}  {title[:60]}")
+            return True
+
+        if args.touched:
+            post_ids = reconcile_counters.load_touched(args.touched).get("posts", set())
+            updated = refresh(conn, post_ids, args.chunk_size, args.config)
+            if updated is None:
+                print(f'❌ posts."{COLUMN}" does not exist yet, run a full build first')
+                return False
+            print(f"🔎 Search vectors refreshed: {updated} of {len(post_ids)} touched posts changed")
+        else:
+            stats = build(conn, args.chunk_size, args.config)
+            print(f"🔎 Search vectors built: {stats['updated']} of {stats['posts']} posts updated "
+                  f"in {stats['chunks']} chunks")
+            print(f"   - GIN index {INDEX}: {stats['index_seconds']}s")
+    print(f"✅ Done in {time.time() - start:.1f} seconds")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
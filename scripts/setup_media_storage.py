@@ -2,6 +2,7 @@
 """
 Fonana Media Storage Setup Script [media_storage_2025_001]
 Загружает placeholder изображения и настраивает локальное медиа-хранилище
+(аватары и фоны рендерятся локально и детерминированно: scripts/avatar_generator.py)
 
 Базируется на IMPLEMENTATION_SIMULATION.md:
 - 60 аватаров (square 400x400)
@@ -10,17 +11,28 @@ Fonana Media Storage Setup Script [media_storage_2025_001]
 - Optimized images для веб
 """
 
+import argparse
 import os
 import requests
 import time
-import random
 from urllib.parse import urlparse
 from pathlib import Path
 
+import avatar_generator
+import fonana_trace
+from fonana_trace import span
+from http_cache import DEFAULT_CACHE_DIR, DEFAULT_MAX_BYTES, CacheMiss, HttpCache
+
 # [media_storage_2025_001] Configuration
 BASE_DIR = Path(__file__).parent.parent
 MEDIA_DIR = BASE_DIR / "public" / "media"
 
+# Image source; point at a local stand-in server for tests
+PICSUM_BASE = os.environ.get("FONANA_PICSUM_BASE", "https://picsum.photos")
+
+# On-disk HTTP cache (set up in main(); None = always download)
+CACHE = None
+
 # Categories for content generation
 POST_CATEGORIES = {
     "art": {"keywords": ["art", "digital-art", "abstract"], "count": 50},
@@ -35,19 +47,33 @@ POST_CATEGORIES = {
 }
 
 def download_image(url, filepath, max_retries=3):
-    """Download image with retry logic and error handling"""
+    """Download image with retry logic and error handling
+
+    Returns where the body came from ("network", "revalidated", "cache") or False.
+    """
     for attempt in range(max_retries):
         try:
-            response = requests.get(url, timeout=30, stream=True)
-            response.raise_for_status()
-            
-            with open(filepath, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
-            
-            print(f"✅ Downloaded: {filepath.name}")
-            return True
+            with span("download", cat="batch", file=filepath.name, attempt=attempt + 1) as args:
+                if CACHE is not None:
+                    source = CACHE.fetch(url, filepath)
+                else:
+                    response = requests.get(url, timeout=30, stream=True)
+                    response.raise_for_status()
+
+                    with open(filepath, 'wb') as f:
+                        for chunk in response.iter_content(chunk_size=8192):
+                            f.write(chunk)
+                            fonana_trace.count(bytes=len(chunk))
+                    source = "network"
+                args["source"] = source
+                fonana_trace.count(rows=1)
             
+            print(f"✅ {'Cached' if source == 'cache' else 'Downloaded'}: {filepath.name}")
+            return source
+
+        except CacheMiss:
+            print(f"❌ Offline and not cached: {filepath.name}")
+            return False
         except Exception as e:
             print(f"❌ Attempt {attempt + 1} failed for {filepath.name}: {e}")
             if attempt < max_retries - 1:
@@ -55,54 +81,27 @@ def download_image(url, filepath, max_retries=3):
             
     return False
 
-def generate_avatars(count=60):
-    """Generate avatar images using Lorem Picsum"""
-    avatar_dir = MEDIA_DIR / "avatars"
-    success_count = 0
-    
+def rate_limit(sources, delay):
+    """Pause if any of the download results actually hit the image host"""
+    if any(source in ("network", "revalidated") for source in sources):
+        time.sleep(delay)
+
+def generate_avatars(count=60, workers=avatar_generator.DEFAULT_WORKERS):
+    """Render deterministic identicon avatars locally (scripts/avatar_generator.py)"""
     print(f"\n🎨 Generating {count} avatar images...")
-    
-    for i in range(count):
-        # Generate square 400x400 avatars with different seeds
-        seed = random.randint(1, 1000)
-        filename = f"avatar_{int(time.time())}_{random.randint(1000, 9999)}.jpg"
-        filepath = avatar_dir / filename
-        
-        # Lorem Picsum URL for square images
-        url = f"https://picsum.photos/400/400?random={seed}"
-        
-        if download_image(url, filepath):
-            success_count += 1
-            
-        # Rate limiting
-        time.sleep(0.5)
-    
-    print(f"✅ Avatars: {success_count}/{count} successfully downloaded")
+    with span("render", cat="batch", kind="avatar"):
+        stats = avatar_generator.generate("avatar", [f"seed-{i}" for i in range(count)], workers=workers)
+    success_count = stats["rendered"] + stats["cached"]
+    print(f"✅ Avatars: {success_count}/{count} ready ({stats['rendered']} rendered, {stats['cached']} cached)")
     return success_count
 
-def generate_backgrounds(count=60):
-    """Generate background images using Lorem Picsum"""
-    bg_dir = MEDIA_DIR / "backgrounds"
-    success_count = 0
-    
+def generate_backgrounds(count=60, workers=avatar_generator.DEFAULT_WORKERS):
+    """Render deterministic gradient banners locally (scripts/avatar_generator.py)"""
     print(f"\n🌅 Generating {count} background images...")
-    
-    for i in range(count):
-        # Generate landscape 1200x400 backgrounds
-        seed = random.randint(1, 1000)
-        filename = f"bg_{int(time.time())}_{random.randint(1000, 9999)}.jpg"
-        filepath = bg_dir / filename
-        
-        # Lorem Picsum URL for landscape backgrounds
-        url = f"https://picsum.photos/1200/400?random={seed}"
-        
-        if download_image(url, filepath):
-            success_count += 1
-            
-        # Rate limiting
-        time.sleep(0.5)
-    
-    print(f"✅ Backgrounds: {success_count}/{count} successfully downloaded")
+    with span("render", cat="batch", kind="banner"):
+        stats = avatar_generator.generate("banner", [f"seed-{i}" for i in range(count)], workers=workers)
+    success_count = stats["rendered"] + stats["cached"]
+    print(f"✅ Backgrounds: {success_count}/{count} ready ({stats['rendered']} rendered, {stats['cached']} cached)")
     return success_count
 
 def generate_posts_by_category():
@@ -118,19 +117,19 @@ def generate_posts_by_category():
         category_success = 0
         
         for i in range(config["count"]):
-            # Generate main post image
-            seed = random.randint(1, 1000)
-            timestamp = int(time.time()) + i  # Ensure unique timestamps
+            # Seed and file names derive from (category, index): every rebuild
+            # requests the same URLs, so the HTTP cache (and --offline) can serve it
+            seed = f"{category}-{i:03d}"
             
             # Main post image (800x600)
-            post_filename = f"post_{category}_{timestamp}_{random.randint(1000, 9999)}.jpg"
+            post_filename = f"post_{category}_{i:03d}.jpg"
             post_filepath = posts_dir / post_filename
-            post_url = f"https://picsum.photos/800/600?random={seed}"
+            post_url = f"{PICSUM_BASE}/seed/{seed}/800/600"
             
-            # Thumbnail image (300x200)
-            thumb_filename = f"thumb_{category}_{timestamp}_{random.randint(1000, 9999)}.jpg"
+            # Thumbnail image (300x200), same picture as the post
+            thumb_filename = f"thumb_{category}_{i:03d}.jpg"
             thumb_filepath = thumbs_dir / thumb_filename
-            thumb_url = f"https://picsum.photos/300/200?random={seed}"
+            thumb_url = f"{PICSUM_BASE}/seed/{seed}/300/200"
             
             # Download both images
             post_downloaded = download_image(post_url, post_filepath)
@@ -141,7 +140,7 @@ def generate_posts_by_category():
                 total_success += 1
             
             # Rate limiting between downloads
-            time.sleep(0.3)
+            rate_limit((post_downloaded, thumb_downloaded), 0.3)
         
         print(f"✅ {category}: {category_success}/{config['count']} completed")
     
@@ -161,17 +160,42 @@ def verify_downloads():
     
     results = {}
     for name, (directory, expected) in directories.items():
-        actual = len(list(directory.glob("*.jpg")))
+        # A .jpg and its .webp twin are one image
+        actual = len({p.stem for p in directory.iterdir() if p.suffix in (".jpg", ".webp")})
         results[name] = {"actual": actual, "expected": expected}
         status = "✅" if actual >= expected * 0.9 else "⚠️"  # 90% threshold
         print(f"{status} {name}: {actual}/{expected} files")
     
     return results
 
-def main():
-    """Main execution function"""
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Render and download placeholder media into public/media")
+    parser.add_argument("--cache-dir", default=str(DEFAULT_CACHE_DIR),
+                        help="on-disk HTTP cache (default: .cache/http or $FONANA_HTTP_CACHE)")
+    parser.add_argument("--cache-max-mb", type=int, default=DEFAULT_MAX_BYTES >> 20,
+                        help="cache size cap, least recently used entries are evicted")
+    parser.add_argument("--offline", action="store_true", help="serve only from the cache, never download")
+    parser.add_argument("--no-cache", action="store_true", help="always download, bypassing the cache")
+    parser.add_argument("--workers", type=int, default=avatar_generator.DEFAULT_WORKERS,
+                        help="processes rendering avatars and backgrounds")
+    fonana_trace.add_arguments(parser)
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """Main execution function
+
+    Phases (names for --profile): avatars, backgrounds, posts, verify.
+    """
+    global CACHE
+    args = parse_args(argv)
+    fonana_trace.configure(args)
+    if not args.no_cache:
+        CACHE = HttpCache(args.cache_dir, args.cache_max_mb << 20, offline=args.offline)
+
     print("🚀 Starting Fonana Media Storage Setup [media_storage_2025_001]")
     print(f"📁 Media directory: {MEDIA_DIR}")
+    if CACHE is not None:
+        print(f"📦 HTTP cache: {args.cache_dir}{' (offline)' if args.offline else ''}")
     
     # Ensure directories exist
     for subdir in ["avatars", "backgrounds", "posts", "thumbposts", "temp"]:
@@ -181,16 +205,20 @@ def main():
     
     try:
         # Phase 1: Generate avatars
-        avatar_count = generate_avatars(60)
+        with span("avatars"):
+            avatar_count = generate_avatars(60, args.workers)
         
         # Phase 2: Generate backgrounds  
-        bg_count = generate_backgrounds(60)
+        with span("backgrounds"):
+            bg_count = generate_backgrounds(60, args.workers)
         
         # Phase 3: Generate categorized posts
-        posts_count = generate_posts_by_category()
+        with span("posts"):
+            posts_count = generate_posts_by_category()
         
         # Verification
-        results = verify_downloads()
+        with span("verify"):
+            results = verify_downloads()
         
         elapsed = time.time() - start_time
         print(f"\n🎉 Media setup completed in {elapsed:.1f} seconds")
@@ -202,6 +230,8 @@ def main():
         
         total_files = sum(r["actual"] for r in results.values())
         print(f"   - Total files: {total_files}/720")
+        if CACHE is not None:
+            print(f"   - Cache: {CACHE.summary()}")
         
         if total_files >= 648:  # 90% success rate
             print("✅ Media storage setup successful!")
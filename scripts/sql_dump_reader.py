@@ -0,0 +1,531 @@
+#!/usr/bin/env python3
+"""
+Fonana SQL Dump Reader
+Streaming parser for INSERT ... VALUES dumps (and pg_dump COPY blocks)
+
+- Reads the file in chunks and yields (table, columns, row) tuples lazily,
+  so dumps of any size can be loaded or converted in constant memory
+- Handles the quoting produced by escape_sql_string ('' for quotes, doubled
+  backslashes), E'...' strings, multi-line values, comments, ::casts,
+  ON CONFLICT clauses and multi-row VALUES lists
+- Values are typed: None, bool, int, float, str
+- Other statements (DDL, SET, TRUNCATE, functions with $$ bodies) are skipped
+
+Usage:
+  python scripts/sql_dump_reader.py all_posts.sql                      # row counts per table
+  python scripts/sql_dump_reader.py all_posts.sql --load               # COPY into the database
+  python scripts/sql_dump_reader.py all_posts.sql --to-snapshot snapshots/all_posts
+"""
+
+import argparse
+import datetime
+import itertools
+import re
+import sys
+import time
+
+CHUNK_SIZE = 1 << 16
+
+TOKEN_RE = re.compile(r"""
+    (?P<ws>\s+)
+  | (?P<comment>--[^\n]*(?:\n|\Z)|/\*.*?\*/)
+  | (?P<estring>[eE]'[^'\\]*(?:(?:\\.|'')[^'\\]*)*')
+  | (?P<string>'[^']*(?:''[^']*)*')
+  | (?P<dollar>\$(?P<tag>[A-Za-z_]*)\$.*?\$(?P=tag)\$)
+  | (?P<qident>"[^"]*(?:""[^"]*)*")
+  | (?P<number>\d+(?:\.\d*)?(?:[eE][-+]?\d+)?|\.\d+(?:[eE][-+]?\d+)?)
+  | (?P<word>[A-Za-z_][A-Za-z0-9_$]*)
+  | (?P<punct>::|[(),;.\[\]=+*/<>!|&%^~-])
+""", re.VERBOSE | re.DOTALL)
+
+E_ESCAPES = {"b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+E_ESCAPE_RE = re.compile(r"\\(x[0-9A-Fa-f]{1,2}|u[0-9A-Fa-f]{4}|U[0-9A-Fa-f]{8}|[0-7]{1,3}|.)", re.DOTALL)
+COPY_ESCAPE_RE = re.compile(r"\\(x[0-9A-Fa-f]{1,2}|[0-7]{1,3}|.)", re.DOTALL)
+# Buffer tail after a number that may still become its exponent ("1.5" + "e-" | "3")
+EXPONENT_TAIL_RE = re.compile(r"[eE][-+]?\Z")
+
+
+class DumpParseError(ValueError):
+    """Malformed statement in a dump"""
+
+
+class RawSql(str):
+    """A value expression that is not a literal (e.g. now()), kept as SQL text"""
+
+
+def _decode_escape(match, table):
+    code = match.group(1)
+    if code[0] in "xuU" and len(code) > 1:
+        return chr(int(code[1:], 16))
+    if code.isdigit():
+        return chr(int(code, 8))
+    return table.get(code, code)
+
+
+def decode_estring(body):
+    """Body of E'...' -> text"""
+    body = body.replace("''", "'")
+    return E_ESCAPE_RE.sub(lambda m: _decode_escape(m, E_ESCAPES), body)
+
+
+def decode_string(body, unescape_backslashes=True):
+    """Body of '...' -> text; optionally undo the backslash doubling of escape_sql_string"""
+    body = body.replace("''", "'")
+    if unescape_backslashes:
+        body = body.replace("\\\\", "\\")
+    return body
+
+
+def decode_copy_field(field):
+    """COPY text-format field -> text (None for \\N)"""
+    if field == "\\N":
+        return None
+    if "\\" not in field:
+        return field
+    return COPY_ESCAPE_RE.sub(lambda m: _decode_escape(m, E_ESCAPES), field)
+
+
+def parse_number(text):
+    if re.fullmatch(r"\d+", text):
+        return int(text)
+    return float(text)
+
+
+class Lexer:
+    """Chunked tokenizer over a text stream"""
+
+    def __init__(self, stream, chunk_size=CHUNK_SIZE):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        self.line = 1
+        self._peeked = None
+
+    def _fill(self):
+        if self.eof:
+            return False
+        chunk = self.stream.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def _advance(self, end):
+        self.line += self.buffer.count("\n", self.pos, end)
+        self.pos = end
+
+    def _next(self):
+        while True:
+            if self.pos >= len(self.buffer) and not self._fill():
+                return None
+            match = TOKEN_RE.match(self.buffer, self.pos)
+            # A token touching the end of the buffer may continue in the next chunk;
+            # a quoted token followed by its quote was cut inside a '' / "" escape,
+            # a bare E may prefix an E'...' string, a number may still take an exponent,
+            # and a '/' before '*' opens a block comment whose end is not buffered yet
+            incomplete = match is None or match.end() == len(self.buffer)
+            if match is not None and not incomplete:
+                follow = self.buffer[match.end()]
+                kind = match.lastgroup
+                incomplete = (
+                    (kind in ("string", "estring") and follow == "'")
+                    or (kind == "qident" and follow == '"')
+                    or (kind == "word" and match.group() in ("e", "E") and follow == "'")
+                    or (kind == "number" and EXPONENT_TAIL_RE.match(self.buffer, match.end()) is not None)
+                    or (kind == "punct" and match.group() == "/" and follow == "*")
+                )
+            if incomplete and not self.eof:
+                if self._fill():
+                    continue
+                match = TOKEN_RE.match(self.buffer, self.pos)
+            if match is None:
+                raise DumpParseError(f"line {self.line}: cannot tokenize {self.buffer[self.pos:self.pos + 40]!r}")
+            kind = match.lastgroup if match.lastgroup != "tag" else "dollar"
+            text = match.group()
+            self._advance(match.end())
+            if kind in ("ws", "comment"):
+                continue
+            return kind, text
+
+    def next(self):
+        if self._peeked is not None:
+            token, self._peeked = self._peeked, None
+            return token
+        return self._next()
+
+    def peek(self):
+        if self._peeked is None:
+            self._peeked = self._next()
+        return self._peeked
+
+    def read_line(self):
+        """Raw line from the current position (for COPY data); None at EOF"""
+        if self._peeked is not None:
+            raise DumpParseError("read_line() after peek()")
+        while True:
+            end = self.buffer.find("\n", self.pos)
+            if end >= 0:
+                line = self.buffer[self.pos:end]
+                self._advance(end + 1)
+                return line
+            if not self._fill():
+                if self.pos < len(self.buffer):
+                    line = self.buffer[self.pos:]
+                    self._advance(len(self.buffer))
+                    return line
+                return None
+
+
+def _ident(token):
+    kind, text = token
+    if kind == "qident":
+        return text[1:-1].replace('""', '"')
+    if kind == "word":
+        return text.lower()
+    raise DumpParseError(f"expected identifier, got {text!r}")
+
+
+class DumpReader:
+    """Iterate (table, columns, row) over every INSERT/COPY row in a dump"""
+
+    def __init__(self, stream, unescape_backslashes=True, chunk_size=CHUNK_SIZE):
+        self.lexer = Lexer(stream, chunk_size)
+        self.unescape_backslashes = unescape_backslashes
+
+    def _expect(self, text):
+        token = self.lexer.next()
+        if token is None or token[1].lower() != text:
+            got = token[1] if token else "end of file"
+            raise DumpParseError(f"line {self.lexer.line}: expected {text!r}, got {got!r}")
+
+    def _qualified_name(self):
+        name = _ident(self.lexer.next())
+        while self.lexer.peek() and self.lexer.peek()[1] == ".":
+            self.lexer.next()
+            name = _ident(self.lexer.next())
+        return name
+
+    def _column_list(self):
+        self._expect("(")
+        columns = []
+        while True:
+            columns.append(_ident(self.lexer.next()))
+            token = self.lexer.next()
+            if token[1] == ")":
+                return tuple(columns)
+            if token[1] != ",":
+                raise DumpParseError(f"line {self.lexer.line}: bad column list near {token[1]!r}")
+
+    def _skip_cast(self):
+        """Skip '::type' (with modifiers/arrays) up to the next ',' or ')' at depth 0"""
+        depth = 0
+        while True:
+            token = self.lexer.peek()
+            if token is None:
+                return
+            if depth == 0 and token[1] in (",", ")"):
+                return
+            if token[1] == "(":
+                depth += 1
+            elif token[1] == ")":
+                depth -= 1
+            self.lexer.next()
+
+    def _raw_expression(self, first):
+        """Collect a non-literal expression (function call etc.) as SQL text"""
+        parts = [first[1]]
+        depth = 0
+        while True:
+            token = self.lexer.peek()
+            if token is None or (depth == 0 and token[1] in (",", ")")):
+                return RawSql(" ".join(parts))
+            if token[1] == "(":
+                depth += 1
+            elif token[1] == ")":
+                depth -= 1
+            parts.append(self.lexer.next()[1])
+
+    def _value(self):
+        token = self.lexer.next()
+        if token is None:
+            raise DumpParseError("unexpected end of file inside VALUES")
+        kind, text = token
+        if kind == "string":
+            value = decode_string(text[1:-1], self.unescape_backslashes)
+        elif kind == "estring":
+            value = decode_estring(text[2:-1])
+        elif kind == "number":
+            value = parse_number(text)
+        elif kind == "punct" and text in ("-", "+") and self.lexer.peek() and self.lexer.peek()[0] == "number":
+            number = parse_number(self.lexer.next()[1])
+            value = -number if text == "-" else number
+        elif kind == "word" and text.lower() == "null":
+            value = None
+        elif kind == "word" and text.lower() in ("true", "false"):
+            value = text.lower() == "true"
+        else:
+            return self._raw_expression(token)
+
+        if self.lexer.peek() and self.lexer.peek()[1] == "::":
+            self._skip_cast()
+        return value
+
+    def _row(self):
+        self._expect("(")
+        values = []
+        while True:
+            values.append(self._value())
+            token = self.lexer.next()
+            if token is None:
+                raise DumpParseError("unexpected end of file inside a row")
+            if token[1] == ")":
+                return tuple(values)
+            if token[1] != ",":
+                raise DumpParseError(f"line {self.lexer.line}: expected ',' or ')', got {token[1]!r}")
+
+    def _skip_statement(self):
+        depth = 0
+        while True:
+            token = self.lexer.next()
+            if token is None:
+                return
+            if token[1] == "(":
+                depth += 1
+            elif token[1] == ")":
+                depth -= 1
+            elif token[1] == ";" and depth <= 0:
+                return
+
+    def _insert(self):
+        self._expect("into")
+        table = self._qualified_name()
+        columns = None
+        if self.lexer.peek() and self.lexer.peek()[1] == "(":
+            columns = self._column_list()
+        token = self.lexer.next()
+        if token is None or token[1].lower() != "values":
+            # INSERT ... SELECT etc. cannot be streamed as rows
+            self._skip_statement()
+            return
+        while True:
+            yield table, columns, self._row()
+            token = self.lexer.peek()
+            if token is not None and token[1] == ",":
+                self.lexer.next()
+                continue
+            break
+        # Trailing ON CONFLICT / RETURNING clauses
+        self._skip_statement()
+
+    def _copy(self):
+        table = self._qualified_name()
+        columns = self._column_list() if self.lexer.peek() and self.lexer.peek()[1] == "(" else None
+        is_stdin = False
+        while True:
+            token = self.lexer.next()
+            if token is None:
+                return
+            if token[1].lower() == "stdin":
+                is_stdin = True
+            if token[1] == ";":
+                break
+        if not is_stdin:
+            return
+        self.lexer.read_line()  # rest of the COPY line
+        while True:
+            line = self.lexer.read_line()
+            if line is None or line == "\\.":
+                return
+            yield table, columns, tuple(decode_copy_field(f) for f in line.split("\t"))
+
+    def __iter__(self):
+        while True:
+            token = self.lexer.next()
+            if token is None:
+                return
+            keyword = token[1].lower()
+            if token[0] == "word" and keyword == "insert":
+                yield from self._insert()
+            elif token[0] == "word" and keyword == "copy":
+                yield from self._copy()
+            elif token[1] != ";":
+                self._skip_statement()
+
+
+def read_dump(path, unescape_backslashes=True):
+    """Yield (table, columns, row) for every row in a dump file, lazily"""
+    with open(path, encoding="utf-8") as stream:
+        yield from DumpReader(stream, unescape_backslashes)
+
+
+def table_runs(rows):
+    """Group consecutive rows of the same (table, columns) -> ((table, columns), row iterator)"""
+    for key, group in itertools.groupby(rows, key=lambda r: (r[0], r[1])):
+        yield key, (row for _, _, row in group)
+
+
+TIMESTAMP_RE = re.compile(r"^\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}:\d{2}(\.\d+)?$")
+
+
+def infer_pg_type(values):
+    """PostgreSQL type for a sample of parsed values"""
+    present = [v for v in values if v is not None and not isinstance(v, RawSql)]
+    if not present:
+        return "text"
+    if all(isinstance(v, bool) for v in present):
+        return "boolean"
+    if all(isinstance(v, int) and not isinstance(v, bool) for v in present):
+        return "bigint"
+    if all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in present):
+        return "double precision"
+    if all(isinstance(v, str) and TIMESTAMP_RE.match(v) for v in present):
+        return "timestamp without time zone"
+    return "text"
+
+
+def _converter(pg_type):
+    if pg_type == "timestamp without time zone":
+        return lambda v: None if v is None else datetime.datetime.fromisoformat(v)
+    if pg_type == "double precision":
+        return lambda v: None if v is None else float(v)
+    return lambda v: v
+
+
+def convert_to_snapshot(path, out_dir, unescape_backslashes=True, fmt="parquet", batch_size=50000):
+    """Convert a dump into a columnar snapshot (one streaming pass per table)"""
+    from db_snapshot import SnapshotWriter, column_spec
+
+    tables = {}
+    for table, columns, _ in read_dump(path, unescape_backslashes):
+        tables.setdefault(table, columns)
+
+    writer = SnapshotWriter(out_dir, fmt, row_group_size=batch_size)
+    for table, columns in tables.items():
+        if columns is None:
+            raise DumpParseError(f"{table}: INSERT without a column list cannot be converted")
+        rows = (row for t, c, row in read_dump(path, unescape_backslashes) if t == table and c == columns)
+        batches = iter(lambda: list(itertools.islice(rows, batch_size)), [])
+        first = next(batches, [])
+        pg_types = [infer_pg_type(sample) for sample in zip(*first)] or ["text"] * len(columns)
+        converters = [_converter(t) for t in pg_types]
+        specs = [column_spec(name, t) for name, t in zip(columns, pg_types)]
+
+        def typed(batch):
+            return [tuple(conv(v) for conv, v in zip(converters, row)) for row in batch]
+
+        entry = writer.write_table(table, specs, (typed(b) for b in itertools.chain([first], batches)))
+        print(f"✅ {table}: {entry['rows']} rows -> {entry['file']} ({entry['bytes'] / 1024:.1f} KiB)")
+    writer.close()
+
+
+def has_raw_sql(row):
+    return any(isinstance(value, RawSql) for value in row)
+
+
+def values_sql(row, literal):
+    """'(v1, v2, ...)' with RawSql expressions inlined and other values rendered by literal()"""
+    return "(" + ", ".join(value if isinstance(value, RawSql) else literal(value) for value in row) + ")"
+
+
+def insert_rows(cursor, table_sql, column_list, rows, page_size=1000):
+    """INSERT rows holding expressions (now(), gen_random_uuid() ...); returns the row count
+
+    COPY would store the expression text (or fail on typed columns), so these
+    rows are evaluated by the server like the original dump statement.
+    """
+    def literal(value):
+        return cursor.mogrify("%s", (value,)).decode("utf-8")
+
+    count = 0
+    for page in iter(lambda: list(itertools.islice(rows, page_size)), []):
+        cursor.execute(
+            f"INSERT INTO {table_sql} ({column_list}) VALUES {', '.join(values_sql(row, literal) for row in page)}"
+        )
+        count += len(page)
+    return count
+
+
+def load_dump(conn, path, unescape_backslashes=True, on_conflict="nothing"):
+    """COPY every row of a dump into the database; returns {table: rows}
+
+    With on_conflict="nothing" each run is copied into a temp table first and
+    inserted with ON CONFLICT DO NOTHING, matching how the dumps are replayed.
+    Consecutive rows with non-literal values (RawSql) are INSERTed instead of
+    COPYed, so the server evaluates them.
+    """
+    import fonana_db
+    from fonana_db import quote_ident
+
+    loaded = {}
+    cursor = conn.cursor()
+    for (table, columns), rows in table_runs(read_dump(path, unescape_backslashes)):
+        if columns is None:
+            raise DumpParseError(f"{table}: INSERT without a column list cannot be loaded with COPY")
+        column_list = ", ".join(quote_ident(c) for c in columns)
+        target = "_dump_load" if on_conflict == "nothing" else table
+        if on_conflict == "nothing":
+            cursor.execute("DROP TABLE IF EXISTS _dump_load")
+            cursor.execute(
+                f"CREATE TEMP TABLE _dump_load (LIKE {quote_ident(table)} INCLUDING DEFAULTS) ON COMMIT DROP"
+            )
+        count = 0
+        for raw, group in itertools.groupby(rows, key=has_raw_sql):
+            if raw:
+                count += insert_rows(cursor, quote_ident(target), column_list, group)
+            else:
+                count += fonana_db.copy_rows(conn, target, columns, group)
+        if on_conflict == "nothing":
+            cursor.execute(
+                f"INSERT INTO {quote_ident(table)} ({column_list}) "
+                f"SELECT {column_list} FROM _dump_load ON CONFLICT DO NOTHING"
+            )
+        loaded[table] = loaded.get(table, 0) + count
+    cursor.close()
+    conn.commit()
+    return loaded
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Stream rows out of INSERT/COPY SQL dumps")
+    parser.add_argument("dump", help="path to the .sql dump")
+    parser.add_argument("--literal-backslashes", action="store_true",
+                        help="keep '\\\\' as two backslashes (standard_conforming_strings dumps)")
+    parser.add_argument("--load", action="store_true", help="COPY the rows into the database")
+    parser.add_argument("--on-conflict", choices=["nothing", "error"], default="nothing",
+                        help="duplicate handling for --load (default: skip existing rows)")
+    parser.add_argument("--to-snapshot", metavar="DIR", help="convert into a columnar snapshot")
+    parser.add_argument("--format", choices=["parquet", "ipc"], default="parquet")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    unescape = not args.literal_backslashes
+    start = time.time()
+
+    if args.load:
+        import fonana_db
+        with fonana_db.connection() as conn:
+            loaded = load_dump(conn, args.dump, unescape, args.on_conflict)
+        for table, count in loaded.items():
+            print(f"✅ {table}: {count} rows copied")
+    elif args.to_snapshot:
+        convert_to_snapshot(args.dump, args.to_snapshot, unescape, args.format)
+    else:
+        counts = {}
+        for table, _, _ in read_dump(args.dump, unescape):
+            counts[table] = counts.get(table, 0) + 1
+        print(f"📄 {args.dump}")
+        for table, count in counts.items():
+            print(f"   - {table}: {count} rows")
+
+    print(f"🎉 Done in {time.time() - start:.1f} seconds")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
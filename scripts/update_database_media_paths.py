@@ -5,44 +5,61 @@ Fonana Database Media Paths Update Script [media_storage_2025_001]
 
 Базируется на IMPLEMENTATION_SIMULATION.md:
 - Добавляет backgroundImage поле к users
-- Обновляет avatar пути
+- Обновляет avatar пути: у каждого пользователя свои аватар и фон,
+  отрисованные по его id (scripts/avatar_generator.py)
 - Обновляет mediaUrl и thumbnail в posts
 - Сохраняет оригинальные Supabase URLs в backup полях
+- Сверяет результат с ожидаемыми путями по checksum (db_checksum.py)
 """
 
+import argparse
 import os
-import psycopg2
 import random
 from pathlib import Path
 from typing import List, Dict
 
-# [media_storage_2025_001] Database Configuration
-DB_CONFIG = {
-    "host": "localhost",
-    "port": 5432,
-    "database": "fonana", 
-    "user": "fonana_user",
-    "password": "fonana_pass"
-}
+import psycopg2.extras
+
+import avatar_generator
+import fonana_db
+import fonana_trace
+from fonana_trace import span
+from db_checksum import PostgresSource, RowsSource, verify_table, print_report
 
 MEDIA_DIR = Path(__file__).parent.parent / "public" / "media"
 
+MEDIA_EXTENSIONS = (".jpg", ".webp")
+
 def get_available_files(directory: Path) -> List[str]:
-    """Get list of available media files in directory"""
+    """Get list of available media files in directory
+
+    Rendered avatars/backgrounds (scripts/avatar_generator.py) are .webp only;
+    a .jpg and its .webp twin are one image, and the .webp is the one listed.
+    """
     if not directory.exists():
         return []
-    return [f.name for f in directory.glob("*.jpg")]
+    files = {}
+    for f in sorted(directory.iterdir()):
+        if f.suffix in MEDIA_EXTENSIONS and (f.stem not in files or f.suffix == ".webp"):
+            files[f.stem] = f.name
+    return sorted(files.values())
 
 def connect_db():
-    """Connect to PostgreSQL database"""
+    """Borrow a connection from the shared pool (scripts/fonana_db.py)"""
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
+        conn = fonana_db.get_pool().getconn()
         conn.autocommit = False
         return conn
     except Exception as e:
         print(f"❌ Database connection failed: {e}")
         return None
 
+def release_db(conn):
+    """Return a connection to the shared pool"""
+    if not conn.closed:
+        conn.rollback()
+    fonana_db.get_pool().putconn(conn, close=bool(conn.closed))
+
 def add_background_image_column(conn):
     """Add backgroundImage column to users table"""
     try:
@@ -110,55 +127,85 @@ def backup_original_media_urls(conn):
         conn.rollback()
         return False
 
-def update_user_avatars(conn):
-    """Update user avatar paths to local files"""
+# Category mapping for better file distribution
+POST_CATEGORIES = ["art", "tech", "lifestyle", "trading", "gaming", "music", "education", "comedy", "intimate"]
+
+# Rows written per UPDATE ... FROM (VALUES ...) statement
+WRITE_PAGE_SIZE = 1000
+
+def user_media_paths(user_id):
+    """Avatar and background paths assigned to a user
+
+    Both are rendered from the user id (scripts/avatar_generator.py), so the
+    same user gets the same files on every run and every machine.
+    """
+    return avatar_generator.public_url("avatar", user_id), avatar_generator.public_url("banner", user_id)
+
+def render_user_media(user_ids, workers=avatar_generator.DEFAULT_WORKERS):
+    """Render the avatars and backgrounds of these users (existing files are kept)"""
+    for kind in ("avatar", "banner"):
+        avatar_generator.generate(kind, user_ids, workers=workers)
+
+def post_media_paths(post_id, category, post_files, thumb_files, category_files):
+    """Media and thumbnail paths assigned to a post (None = keep current value)"""
+    # Select appropriate files based on category
+    if category and category.lower() in category_files and category_files[category.lower()]:
+        available_posts = category_files[category.lower()]
+        available_thumbs = [f for f in thumb_files if category.lower() in f]
+    else:
+        available_posts = post_files
+        available_thumbs = thumb_files
+
+    # Use hash of post_id for consistent distribution
+    post_hash = abs(hash(str(post_id))) if post_id else 0
+
+    media_path = None
+    if available_posts:
+        post_file = available_posts[post_hash % len(available_posts)]
+        media_path = f"/media/posts/{post_file}"
+
+    thumb_path = None
+    if available_thumbs:
+        thumb_file = available_thumbs[post_hash % len(available_thumbs)]
+        thumb_path = f"/media/thumbposts/{thumb_file}"
+
+    return media_path, thumb_path
+
+def get_category_files(post_files):
+    """Post files grouped by the category name embedded in the file name"""
+    return {category: [f for f in post_files if category in f] for category in POST_CATEGORIES}
+
+def update_user_avatars(conn, itersize=fonana_db.DEFAULT_ITERSIZE, workers=avatar_generator.DEFAULT_WORKERS):
+    """Update user avatar paths to local files
+
+    Users are streamed through a server-side cursor on a second pooled
+    connection; each batch's images are rendered and its rows bulk-written
+    on `conn` while the next batch is being read.
+    """
     try:
         cursor = conn.cursor()
-        
-        # Get available avatar files
-        avatar_files = get_available_files(MEDIA_DIR / "avatars")
-        background_files = get_available_files(MEDIA_DIR / "backgrounds")
-        
-        if not avatar_files:
-            print("⚠️ No avatar files found, skipping avatar update")
-            return True
-            
-        print(f"📁 Found {len(avatar_files)} avatar files and {len(background_files)} background files")
-            
-        # Get all users
-        cursor.execute("SELECT id, nickname FROM users ORDER BY id")
-        users = cursor.fetchall()
-        
-        print(f"🔄 Updating avatars for {len(users)} users...")
-        
-        updated_count = 0
-        for user_id, nickname in users:
-            try:
-                # Distribute files using hash for consistency (UUIDs are strings)
-                user_hash = abs(hash(str(user_id))) if user_id else 0
-                avatar_file = avatar_files[user_hash % len(avatar_files)]
-                avatar_path = f"/media/avatars/{avatar_file}"
-                
-                # Background image (if available)
-                bg_path = None
-                if background_files:
-                    bg_file = background_files[user_hash % len(background_files)]
-                    bg_path = f"/media/backgrounds/{bg_file}"
-                
-                # Update user
-                cursor.execute("""
-                    UPDATE users 
-                    SET avatar = %s, "backgroundImage" = %s 
-                    WHERE id = %s
-                """, (avatar_path, bg_path, user_id))
-                
-                updated_count += 1
-                
-            except Exception as user_error:
-                print(f"❌ Error updating user {user_id}: {user_error}")
-                continue
+
+        print(f"🔄 Rendering and assigning avatars (streaming, itersize={itersize})...")
+
+        def compute(users):
+            user_ids = [user_id for user_id, in users]
+            render_user_media(user_ids, workers)
+            return [(user_id,) + user_media_paths(user_id) for user_id in user_ids]
+
+        def write(rows):
+            psycopg2.extras.execute_values(cursor, """
+                UPDATE users AS u
+                SET avatar = v.avatar, "backgroundImage" = v.bg
+                FROM (VALUES %s) AS v(id, avatar, bg)
+                WHERE u.id = v.id
+            """, rows, template="(%s, %s, %s::text)", page_size=WRITE_PAGE_SIZE)
+
+        with fonana_db.connection() as reader:
+            batches = fonana_db.stream_batches(reader, "SELECT id FROM users ORDER BY id", itersize=itersize)
+            _, _, updated_count = fonana_db.pipeline(batches, compute, write)
         
         conn.commit()
+        fonana_trace.count(rows=updated_count)
         print(f"✅ Updated {updated_count} user avatars and backgrounds")
         return True
         
@@ -169,8 +216,11 @@ def update_user_avatars(conn):
         conn.rollback()
         return False
 
-def update_post_media(conn):
-    """Update post media URLs to local files"""
+def update_post_media(conn, itersize=fonana_db.DEFAULT_ITERSIZE):
+    """Update post media URLs to local files
+
+    Posts are streamed and written in overlapping batches like update_user_avatars.
+    """
     try:
         cursor = conn.cursor()
         
@@ -181,71 +231,37 @@ def update_post_media(conn):
         if not post_files:
             print("⚠️ No post files found, skipping post media update")
             return True
-            
-        # Get all posts with their categories
-        cursor.execute("""
-            SELECT id, "creatorId", category, title 
-            FROM posts 
-            ORDER BY id
-        """)
-        posts = cursor.fetchall()
-        
-        print(f"🔄 Updating media for {len(posts)} posts...")
-        
-        # Category mapping for better file distribution
-        category_files = {
-            "art": [f for f in post_files if "art" in f],
-            "tech": [f for f in post_files if "tech" in f],
-            "lifestyle": [f for f in post_files if "lifestyle" in f],
-            "trading": [f for f in post_files if "trading" in f],
-            "gaming": [f for f in post_files if "gaming" in f],
-            "music": [f for f in post_files if "music" in f],
-            "education": [f for f in post_files if "education" in f],
-            "comedy": [f for f in post_files if "comedy" in f],
-            "intimate": [f for f in post_files if "intimate" in f]
-        }
-        
-        updated_count = 0
-        for post_id, creator_id, category, title in posts:
-            try:
-                # Select appropriate files based on category
-                if category and category.lower() in category_files and category_files[category.lower()]:
-                    available_posts = category_files[category.lower()]
-                    available_thumbs = [f for f in thumb_files if category.lower() in f]
-                else:
-                    available_posts = post_files
-                    available_thumbs = thumb_files
-                
-                # Use hash of post_id for consistent distribution (post IDs are integers)
-                post_hash = abs(hash(str(post_id))) if post_id else 0
-                
-                if available_posts:
-                    post_file = available_posts[post_hash % len(available_posts)]
-                    media_path = f"/media/posts/{post_file}"
-                else:
-                    media_path = None
-                    
-                if available_thumbs:
-                    thumb_file = available_thumbs[post_hash % len(available_thumbs)]
-                    thumb_path = f"/media/thumbposts/{thumb_file}"
-                else:
-                    thumb_path = None
-                
-                # Update post
+
+        print(f"🔄 Updating post media (streaming, itersize={itersize})...")
+        category_files = get_category_files(post_files)
+
+        def compute(posts):
+            rows = []
+            for post_id, category in posts:
+                media_path, thumb_path = post_media_paths(
+                    post_id, category, post_files, thumb_files, category_files
+                )
                 if media_path or thumb_path:
-                    cursor.execute("""
-                        UPDATE posts 
-                        SET "mediaUrl" = COALESCE(%s, "mediaUrl"), 
-                            thumbnail = COALESCE(%s, thumbnail)
-                        WHERE id = %s
-                    """, (media_path, thumb_path, post_id))
-                    updated_count += 1
-                    
-            except Exception as post_error:
-                print(f"❌ Error updating post {post_id}: {post_error}")
-                continue
+                    rows.append((post_id, media_path, thumb_path))
+            return rows
+
+        def write(rows):
+            psycopg2.extras.execute_values(cursor, """
+                UPDATE posts AS p
+                SET "mediaUrl" = COALESCE(v.media, p."mediaUrl"),
+                    thumbnail = COALESCE(v.thumb, p.thumbnail)
+                FROM (VALUES %s) AS v(id, media, thumb)
+                WHERE p.id = v.id
+            """, rows, template="(%s, %s::text, %s::text)", page_size=WRITE_PAGE_SIZE)
+
+        with fonana_db.connection() as reader:
+            batches = fonana_db.stream_batches(
+                reader, "SELECT id, category FROM posts ORDER BY id", itersize=itersize
+            )
+            _, _, updated_count = fonana_db.pipeline(batches, compute, write)
         
         conn.commit()
+        fonana_trace.count(rows=updated_count)
         print(f"✅ Updated {updated_count} post media files")
         return True
         
@@ -256,8 +272,44 @@ def update_post_media(conn):
         conn.rollback()
         return False
 
+def expected_user_rows(conn):
+    """Stream users and yield (id, (avatar, backgroundImage)) as update_user_avatars assigns them"""
+    for batch in fonana_db.stream_batches(conn, "SELECT id FROM users"):
+        for user_id, in batch:
+            yield user_id, user_media_paths(user_id)
+
+def expected_post_rows(conn):
+    """Stream posts and yield (id, (mediaUrl, thumbnail)) as update_post_media assigns them"""
+    post_files = get_available_files(MEDIA_DIR / "posts")
+    thumb_files = get_available_files(MEDIA_DIR / "thumbposts")
+    category_files = get_category_files(post_files)
+    sql = 'SELECT id, category, "mediaUrl", thumbnail FROM posts'
+    for batch in fonana_db.stream_batches(conn, sql):
+        for post_id, category, current_media, current_thumb in batch:
+            media_path, thumb_path = post_media_paths(
+                post_id, category, post_files, thumb_files, category_files
+            )
+            # COALESCE in the update keeps the current value when no file was picked
+            yield post_id, (media_path or current_media, thumb_path or current_thumb)
+
+def verify_checksums(conn, table, columns, expected_rows):
+    """Checksum-compare expected (id, values) rows against the table contents"""
+    with fonana_db.connection() as reader:
+        report = verify_table(
+            RowsSource(lambda: expected_rows(reader)),
+            PostgresSource(conn, table, "id", columns),
+            table,
+        )
+    print_report(report)
+    return report["ok"]
+
 def verify_database_updates(conn):
-    """Verify database updates were successful"""
+    """Verify database updates were successful
+
+    Counts are informational; every row's media columns are verified by
+    checksum against the paths the updaters assign, and mismatched ids are
+    reported. Expected rows are streamed, so memory stays flat.
+    """
     try:
         cursor = conn.cursor()
         
@@ -288,15 +340,37 @@ def verify_database_updates(conn):
         print(f"   Posts: {post_stats[0]} total") 
         print(f"   - With media: {post_stats[1]}")
         print(f"   - With thumbnails: {post_stats[2]}")
-        
-        return True
+
+        # Same skip condition as update_post_media: nothing was assigned without files
+        print(f"\n🔐 Checksum verification:")
+        ok = verify_checksums(conn, "users", ["avatar", "backgroundImage"], expected_user_rows)
+        if get_available_files(MEDIA_DIR / "posts"):
+            ok = verify_checksums(conn, "posts", ["mediaUrl", "thumbnail"], expected_post_rows) and ok
+
+        return ok
         
     except Exception as e:
         print(f"❌ Verification failed: {e}")
         return False
 
-def main():
-    """Main execution function"""
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Update media paths in the database")
+    parser.add_argument("--itersize", type=int, default=fonana_db.DEFAULT_ITERSIZE,
+                        help="rows per server-side cursor fetch")
+    parser.add_argument("--render-workers", type=int, default=avatar_generator.DEFAULT_WORKERS,
+                        help="processes rendering user avatars and backgrounds")
+    fonana_trace.add_arguments(parser)
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """Main execution function
+
+    Phases (names for --profile): add-columns, backup-urls, update-avatars,
+    update-posts, verify.
+    """
+    args = parse_args(argv)
+    fonana_trace.configure(args)
+
     print("🚀 Starting Database Media Paths Update [media_storage_2025_001]")
     
     # Check if media files exist
@@ -311,24 +385,29 @@ def main():
     
     try:
         # Phase 1: Add backgroundImage column
-        if not add_background_image_column(conn):
-            return False
+        with span("add-columns"):
+            if not add_background_image_column(conn):
+                return False
             
         # Phase 2: Backup original URLs
-        if not backup_original_media_urls(conn):
-            return False
+        with span("backup-urls"):
+            if not backup_original_media_urls(conn):
+                return False
             
         # Phase 3: Update user avatars and backgrounds
-        if not update_user_avatars(conn):
-            return False
+        with span("update-avatars"):
+            if not update_user_avatars(conn, args.itersize, args.render_workers):
+                return False
             
         # Phase 4: Update post media
-        if not update_post_media(conn):
-            return False
+        with span("update-posts"):
+            if not update_post_media(conn, args.itersize):
+                return False
             
         # Phase 5: Verify updates
-        if not verify_database_updates(conn):
-            return False
+        with span("verify"):
+            if not verify_database_updates(conn):
+                return False
         
         print("✅ Database media paths update completed successfully!")
         return True
@@ -337,7 +416,7 @@ def main():
         print(f"❌ Database update failed: {e}")
         return False
     finally:
-        conn.close()
+        release_db(conn)
 
 if __name__ == "__main__":
     success = main()
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Конвейерный асинхронный импорт данных Supabase (asyncio + psycopg 3 pipeline mode)
+
+Те же сущности, колонки и правила ON CONFLICT, что и в supabase_full_import.py,
+но запросы не ждут друг друга:
+- строки рендерятся в пачки и передаются воркерам через ограниченную очередь
+  (back-pressure: рендеринг останавливается, пока очередь полна)
+- каждый воркер держит своё соединение в pipeline mode: до --window пачек
+  executemany уходят в сеть без ожидания ответа, синхронизация — на COMMIT
+- если в окне произошла ошибка, окно откатывается и повторяется построчно,
+  ошибочные строки выводятся так же, как в синхронном импорте
+
+Использование:
+  python supabase_async_import.py --data supabase_export.json
+  python supabase_async_import.py --data supabase_export.json --connections 8 --window 16
+  python supabase_async_import.py --data supabase_export.json --bulk-load
+
+Файл --data: JSON-объект {"posts": [...], "comments": [...], "likes": [...],
+"notifications": [...], "tags": [...]}, как его возвращает выгрузка через MCP Supabase.
+
+Требуется psycopg 3 (pip install "psycopg[binary]").
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+try:
+    import psycopg
+    from psycopg.conninfo import make_conninfo
+except ImportError:
+    print("❌ psycopg 3 не установлен. Установите:")
+    print('   pip install "psycopg[binary]"')
+    raise
+
+from supabase_full_import import (
+    ENTITIES, finish_import, loaded_tables, partition_targets, prefilter_orphans, row_values,
+    sorted_datasets,
+)
+
+import bulk_load
+import fonana_db
+import fonana_trace
+from fonana_trace import span
+
+DEFAULT_CONNECTIONS = 4
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_WINDOW = 8
+
+# Запросы в стиле драйвера (%s) из тех же описаний сущностей
+UPSERT_SQL = {
+    entity["name"]: fonana_db.upsert_sql(entity["name"], entity["columns"], entity["conflict"], "%s")
+    for entity in ENTITIES
+}
+
+
+def upsert_sql_for(entity):
+    """Запрос сущности или её месячной секции (entity["table"])"""
+    table = entity.get("table")
+    if table is None:
+        return UPSERT_SQL[entity["name"]]
+    if table not in UPSERT_SQL:
+        UPSERT_SQL[table] = fonana_db.upsert_sql(table, entity["columns"], entity["conflict"], "%s")
+    return UPSERT_SQL[table]
+
+
+def conninfo():
+    """Строка подключения из настроек scripts/fonana_db.py"""
+    if fonana_db.DB_DSN:
+        return fonana_db.DB_DSN
+    params = dict(fonana_db.DB_CONFIG)
+    params["dbname"] = params.pop("database")
+    return make_conninfo(**params)
+
+
+def render_rows(entity, rows):
+    """Значения строк для upsert; строки, которые не удалось разобрать, выводятся и пропускаются"""
+    batch = []
+    for row in rows:
+        try:
+            batch.append(row_values(entity, row))
+        except Exception as e:
+            # Как в синхронном import_entity_rows: ошибка строки не прерывает импорт
+            print(f"✗ Ошибка с {entity['error']} {row.get('id')}: {str(e)}")
+    return batch
+
+
+async def render_batches(entity, rows, queue, batch_size, workers):
+    """Рендер строк в пачки значений; await put() ждёт, пока воркеры разгрузят очередь"""
+    for start in range(0, len(rows), batch_size):
+        batch = render_rows(entity, rows[start:start + batch_size])
+        if batch:
+            await queue.put(batch)
+    for _ in range(workers):
+        await queue.put(None)
+
+
+async def replay_rows(conn, entity, sql, batches):
+    """Построчный повтор окна после ошибки: каждая строка в своей транзакции"""
+    imported = 0
+    async with conn.cursor() as cursor:
+        for batch in batches:
+            for values in batch:
+                try:
+                    await cursor.execute(sql, values)
+                    await conn.commit()
+                    imported += 1
+                except psycopg.Error as e:
+                    await conn.rollback()
+                    print(f"✗ Ошибка с {entity['error']} {values[0]}: {str(e).strip()}")
+    return imported
+
+
+async def pipeline_worker(conn, entity, queue, window):
+    """Отправка пачек в pipeline mode окнами по `window` пачек на один COMMIT"""
+    sql = upsert_sql_for(entity)
+    imported = 0
+    done = False
+    while not done:
+        sent = []
+        try:
+            async with conn.pipeline():
+                async with conn.cursor() as cursor:
+                    while len(sent) < window:
+                        batch = await queue.get()
+                        if batch is None:
+                            done = True
+                            break
+                        sent.append(batch)
+                        await cursor.executemany(sql, batch)
+                await conn.commit()
+            imported += sum(len(batch) for batch in sent)
+        except psycopg.Error:
+            await conn.rollback()
+            imported += await replay_rows(conn, entity, sql, sent)
+    return imported
+
+
+async def import_entity(connections, entity, rows, batch_size, window):
+    """Импорт одной сущности всеми соединениями сразу"""
+    queue = asyncio.Queue(maxsize=len(connections) * 2)
+    results = await asyncio.gather(
+        render_batches(entity, rows, queue, batch_size, len(connections)),
+        *(pipeline_worker(conn, entity, queue, window) for conn in connections),
+    )
+    imported = sum(results[1:])
+    fonana_trace.count(rows=imported)
+    return imported
+
+
+async def open_connections(count):
+    return list(await asyncio.gather(*(
+        psycopg.AsyncConnection.connect(conninfo()) for _ in range(count)
+    )))
+
+
+async def import_all_data_async(datasets, connections, batch_size=DEFAULT_BATCH_SIZE,
+                                window=DEFAULT_WINDOW):
+    """Асинхронный аналог import_all_data; возвращает {сущность: импортировано строк}"""
+    imported = {}
+    # Порядок сущностей тот же, что и в синхронном импорте (посты раньше комментариев и лайков)
+    for entity in ENTITIES:
+        rows = datasets[entity["name"]]
+        if entity["name"] != "posts" and not rows:
+            continue
+        print("\n" + entity["title"].format(count=len(rows)))
+        started = time.time()
+        with fonana_db.connection() as conn:
+            targets = partition_targets(conn, entity, rows)
+        imported[entity["name"]] = 0
+        with span(f"import-{entity['name']}"):
+            for target, target_rows in targets:
+                imported[entity["name"]] += await import_entity(connections, target, target_rows, batch_size, window)
+        elapsed = time.time() - started
+        rate = imported[entity["name"]] / elapsed if elapsed else 0
+        print(f"✓ {imported[entity['name']]}/{len(rows)} строк за {elapsed:.1f} с ({rate:.0f} строк/с)")
+    return imported
+
+
+async def load_datasets(path):
+    """Разбор JSON-выгрузки в потоке, чтобы не блокировать цикл событий"""
+    def parse():
+        with open(path) as f:
+            data = json.load(f)
+        return {entity["name"]: data.get(entity["name"]) or [] for entity in ENTITIES}
+
+    return await asyncio.to_thread(parse)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Конвейерный асинхронный импорт данных Supabase")
+    parser.add_argument("--data", required=True, help="JSON-выгрузка {сущность: [строки]}")
+    parser.add_argument("--connections", type=int, default=DEFAULT_CONNECTIONS,
+                        help=f"параллельных соединений (по умолчанию {DEFAULT_CONNECTIONS})")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f"строк в одном executemany (по умолчанию {DEFAULT_BATCH_SIZE})")
+    parser.add_argument("--window", type=int, default=DEFAULT_WINDOW,
+                        help=f"пачек в полёте на соединение до COMMIT (по умолчанию {DEFAULT_WINDOW})")
+    parser.add_argument("--bulk-load", action="store_true",
+                        help="удалить вторичные индексы на время загрузки, затем пересоздать и ANALYZE")
+    parser.add_argument("--index-workers", type=int, default=bulk_load.DEFAULT_WORKERS,
+                        help="параллельных CREATE INDEX CONCURRENTLY в bulk-режиме")
+    fonana_trace.add_arguments(parser)
+    return parser.parse_args(argv)
+
+
+async def run(args, bulk=None):
+    """Разбор выгрузки и открытие соединений идут одновременно, затем импорт"""
+    with span("parse-and-connect"):
+        datasets, connections = await asyncio.gather(
+            load_datasets(args.data), open_connections(args.connections)
+        )
+    print(f"✅ Подключено к локальной PostgreSQL ({args.connections} соединений, pipeline mode)")
+    try:
+        with fonana_db.connection() as conn:
+            datasets = prefilter_orphans(conn, datasets)
+        if bulk is not None:
+            datasets = sorted_datasets(datasets)
+            bulk.tables = loaded_tables(datasets)
+            with fonana_db.connection() as conn:
+                dropped = bulk.before(conn)
+            print(f"🏗️ Bulk-режим: удалено вторичных индексов: {len(dropped)}")
+        await import_all_data_async(datasets, connections, args.batch_size, args.window)
+    finally:
+        await asyncio.gather(*(conn.close() for conn in connections))
+    return datasets
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    fonana_trace.configure(args)
+    print("🚀 Запуск асинхронного импорта данных из Supabase...")
+
+    bulk = bulk_load.BulkLoad([], args.index_workers) if args.bulk_load else None
+    try:
+        try:
+            datasets = asyncio.run(run(args, bulk))
+        finally:
+            # Индексы пересоздаются даже после сбоя загрузки
+            if bulk is not None and bulk.dropped:
+                print("\n🏗️ Пересоздание индексов и ANALYZE...")
+                with fonana_db.connection() as conn:
+                    bulk.after(conn)
+        with fonana_db.connection() as conn:
+            finish_import(conn, datasets, bulk)
+    except Exception as e:
+        print(f"❌ Критическая ошибка: {str(e)}")
+        return False
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
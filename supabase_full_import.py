@@ -3,187 +3,289 @@
 Полный импорт ВСЕХ данных из Supabase в локальную PostgreSQL
 """
 
-import psycopg2
+import os
 import sys
 from datetime import datetime
 
-# Конфигурация локальной БД
-LOCAL_DB = {
-    'host': 'localhost',
-    'database': 'fonana',
-    'user': 'fonana_user', 
-    'password': 'fonana_pass',
-    'port': 5432
-}
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "scripts"))
+import bulk_load
+import fk_filter
+import fonana_db
+import fonana_trace
+import partition_history
+import reconcile_counters
+import search_index
+from fonana_trace import span
+from row_codec import RowCodec
 
-def escape_sql_string(value):
-    """Экранирование строк для SQL"""
-    if value is None:
-        return "null"
-    
-    # Заменяем одинарные кавычки
-    value = str(value).replace("'", "''")
-    # Экранируем обратные слеши
-    value = value.replace("\\", "\\\\")
-    return f"'{value}'"
-
-def format_sql_value(value):
-    """Форматирование значения для SQL"""
-    if value is None:
-        return "null"
-    elif isinstance(value, bool):
-        return "true" if value else "false"
-    elif isinstance(value, (int, float)):
-        return str(value)
-    else:
-        return escape_sql_string(value)
+# Ключи строк, затронутых последним импортом (для reconcile_counters.py --touched)
+LAST_IMPORT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".last_import.json")
 
-def import_posts_batch(conn, posts, start_idx=0):
-    """Импорт партии постов"""
-    cursor = conn.cursor()
-    
-    for idx, post in enumerate(posts):
-        try:
-            sql = f"""
-INSERT INTO posts (id, "creatorId", title, content, type, category, thumbnail, "mediaUrl", 
-                  "isLocked", "isPremium", price, currency, "likesCount", "commentsCount", 
-                  "viewsCount", "createdAt", "updatedAt") 
-VALUES ({format_sql_value(post['id'])}, {format_sql_value(post['creatorId'])}, 
-        {format_sql_value(post['title'])}, {format_sql_value(post['content'])}, 
-        {format_sql_value(post['type'])}, {format_sql_value(post['category'])}, 
-        {format_sql_value(post['thumbnail'])}, {format_sql_value(post['mediaUrl'])}, 
-        {post['isLocked']}, {post['isPremium']}, {post['price']}, 
-        {format_sql_value(post['currency'])}, {post['likesCount']}, {post['commentsCount']}, 
-        {post['viewsCount']}, {format_sql_value(post['createdAt'])}, 
-        {format_sql_value(post['updatedAt'])})
-ON CONFLICT (id) DO UPDATE SET
+# Строки с висячими внешними ключами, отброшенные до загрузки (JSON lines)
+REJECTS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".import_rejects.jsonl")
+
+# Описание сущностей: таблица, колонки, правило ON CONFLICT и значения по умолчанию
+# для необязательных полей (остальные поля обязательны в исходных данных).
+# "partition_conflict" — правило ON CONFLICT для помесячных секций
+# (scripts/partition_history.py: первичный ключ секционированной таблицы — (id, "createdAt")).
+# "references" — внешние ключи {колонка: родительская таблица}, проверяемые
+# на клиенте до загрузки (scripts/fk_filter.py).
+# Типы колонок берутся из prisma/schema.prisma; "types" — колонки живой БД,
+# которых нет в схеме
+ENTITIES = [
+    {
+        "name": "posts",
+        "columns": ["id", "creatorId", "title", "content", "type", "category", "thumbnail",
+                    "mediaUrl", "isLocked", "isPremium", "price", "currency", "likesCount",
+                    "commentsCount", "viewsCount", "createdAt", "updatedAt"],
+        "conflict": '''ON CONFLICT (id) DO UPDATE SET
     title = EXCLUDED.title,
     content = EXCLUDED.content,
     "likesCount" = EXCLUDED."likesCount",
     "commentsCount" = EXCLUDED."commentsCount",
-    "viewsCount" = EXCLUDED."viewsCount";
-"""
-            cursor.execute(sql)
-            print(f"✓ Пост {start_idx + idx + 1}: {post['title'][:50]}...")
+    "viewsCount" = EXCLUDED."viewsCount"''',
+        "defaults": {},
+        "references": {"creatorId": "users"},
+        "title": "📝 Импорт {count} постов...",
+        "error": "постом",
+    },
+    {
+        "name": "comments",
+        "columns": ["id", "postId", "userId", "content", "createdAt", "updatedAt"],
+        "conflict": "ON CONFLICT (id) DO UPDATE SET content = EXCLUDED.content",
+        "defaults": {},
+        "references": {"postId": "posts", "userId": "users"},
+        "title": "💬 Импорт {count} комментариев...",
+        "error": "комментарием",
+    },
+    {
+        "name": "likes",
+        "columns": ["id", "postId", "userId", "createdAt"],
+        "conflict": "ON CONFLICT (id) DO NOTHING",
+        "defaults": {},
+        "references": {"postId": "posts", "userId": "users"},
+        "title": "❤️ Импорт {count} лайков...",
+        "error": "лайком",
+    },
+    {
+        "name": "notifications",
+        "columns": ["id", "userId", "type", "message", "isRead", "createdAt", "relatedId"],
+        "conflict": 'ON CONFLICT (id) DO UPDATE SET "isRead" = EXCLUDED."isRead"',
+        "partition_conflict": 'ON CONFLICT (id, "createdAt") DO UPDATE SET "isRead" = EXCLUDED."isRead"',
+        "defaults": {"isRead": False, "relatedId": None},
+        "types": {"relatedId": "String"},
+        "references": {"userId": "users"},
+        "title": "📢 Импорт {count} уведомлений...",
+        "error": "уведомлением",
+    },
+    {
+        "name": "tags",
+        "columns": ["id", "name", "usageCount", "createdAt"],
+        "conflict": 'ON CONFLICT (id) DO UPDATE SET "usageCount" = EXCLUDED."usageCount"',
+        "defaults": {"usageCount": 0},
+        "types": {"usageCount": "Int", "createdAt": "DateTime"},
+        "title": "🏷️ Импорт {count} тегов...",
+        "error": "тегом",
+    },
+]
+
+# Подготовленные upsert-запросы (PREPARE один раз на соединение пула)
+UPSERTS = {
+    entity["name"]: fonana_db.upsert_statement(
+        f"upsert_{entity['name']}", entity["name"], entity["columns"], entity["conflict"]
+    )
+    for entity in ENTITIES
+}
+ENTITY_BY_NAME = {entity["name"]: entity for entity in ENTITIES}
+
+# Скомпилированные кодеки строк (scripts/row_codec.py), общие с generate_posts_sql.py
+CODECS = {
+    entity["name"]: RowCodec(entity["name"], entity["columns"], entity["defaults"], entity.get("types"))
+    for entity in ENTITIES
+}
+
+def row_values(entity, row):
+    """Типизированная запись (кортеж) в порядке колонок сущности"""
+    return CODECS[entity["name"]].decode(row)
+
+def upsert_for(entity):
+    """Подготовленный upsert сущности или её секции (entity["table"], см. partition_targets)"""
+    table = entity.get("table")
+    if table is None:
+        return UPSERTS[entity["name"]]
+    if table not in UPSERTS:
+        UPSERTS[table] = fonana_db.upsert_statement(f"upsert_{table}", table, entity["columns"], entity["conflict"])
+    return UPSERTS[table]
+
+def partition_targets(conn, entity, rows):
+    """[(сущность, строки)]: для секционированной таблицы — пачка на каждую месячную секцию
+
+    Строки пишутся прямо в секцию своего месяца (недостающие секции создаются);
+    строки за месяцы, уже выгруженные в архив, пропускаются.
+    """
+    if not entity.get("partition_conflict"):
+        return [(entity, rows)]
+    routed = partition_history.route_rows(conn, entity["name"], rows)
+    if routed is None:
+        return [(entity, rows)]
+    targets, archived = routed
+    if archived:
+        print(f"⚠️ {entity['name']}: пропущено строк за архивные месяцы: {len(archived)}")
+    return [
+        (dict(entity, table=partition, conflict=entity["partition_conflict"]), part)
+        for partition, part in targets.items()
+    ]
+
+def import_entity_rows(conn, entity, rows, start_idx=0):
+    """Импорт строк одной сущности через подготовленный upsert"""
+    cursor = conn.cursor()
+    upsert = upsert_for(entity)
+
+    for idx, row in enumerate(rows):
+        try:
+            upsert.execute(cursor, row_values(entity, row))
+            fonana_trace.count(rows=1)
+            if entity["name"] == "posts":
+                print(f"✓ Пост {start_idx + idx + 1}: {row['title'][:50]}...")
         except Exception as e:
-            print(f"✗ Ошибка с постом {post['id']}: {str(e)}")
+            print(f"✗ Ошибка с {entity['error']} {row['id']}: {str(e)}")
             conn.rollback()
             continue
-    
+
     conn.commit()
     cursor.close()
 
-def import_all_data(all_posts_data, all_comments_data, all_likes_data, all_notifications_data, all_tags_data):
-    """Основная функция импорта"""
+def import_posts_batch(conn, posts, start_idx=0):
+    """Импорт партии постов"""
+    import_entity_rows(conn, ENTITY_BY_NAME["posts"], posts, start_idx)
+
+def touched_keys(datasets):
+    """Ключи строк, чьи счётчики мог изменить импорт: {таблица: set(id)}"""
+    posts, comments, likes = datasets["posts"], datasets["comments"], datasets["likes"]
+    return {
+        "users": {row["creatorId"] for row in posts},
+        "posts": ({row["id"] for row in posts} | {row["postId"] for row in comments}
+                  | {row["postId"] for row in likes if row.get("postId")}),
+        "comments": ({row["id"] for row in comments}
+                     | {row["commentId"] for row in likes if row.get("commentId")}),
+        "tags": {row["id"] for row in datasets["tags"]},
+    }
+
+def prefilter_orphans(conn, datasets, rejects_path=None):
+    """Отбрасывает строки с висячими внешними ключами до загрузки
+
+    Ключи родительских таблиц читаются из БД один раз (множество или фильтр
+    Блума), к ним добавляются ключи родителей из этого же импорта. Отброшенные
+    строки с причиной пишутся в rejects_path; возвращает отфильтрованные данные.
+    """
+    rejects_path = rejects_path or REJECTS_FILE
+    references = {e["name"]: e["references"] for e in ENTITIES if e.get("references")}
+    fk = fk_filter.ForeignKeyFilter(conn, references)
+    parents = {parent for refs in references.values() for parent in refs.values()}
+    filtered = dict(datasets)
+    with span("fk-prefilter"), fk_filter.RejectsWriter(rejects_path) as rejects:
+        # Порядок ENTITIES: посты проверяются раньше комментариев и лайков
+        for entity in ENTITIES:
+            name = entity["name"]
+            kept, rejected = fk.split(name, datasets[name])
+            for row, reason in rejected:
+                rejects.write(name, row, reason)
+            if rejected:
+                print(f"⚠️ {name}: отклонено строк с висячими ссылками: {len(rejected)}")
+            filtered[name] = kept
+            if name in parents:
+                fk.add_keys(name, (row["id"] for row in kept))
+    if rejects.count:
+        print(f"📄 Отклонённые строки ({rejects.count}): {rejects_path}")
+    return filtered
+
+def loaded_tables(datasets):
+    """Таблицы, которые затрагивает импорт (посты — всегда)"""
+    return [e["name"] for e in ENTITIES if e["name"] == "posts" or datasets[e["name"]]]
+
+def sorted_datasets(datasets):
+    """Строки, упорядоченные по родительскому ключу (creatorId/postId) для bulk-режима"""
+    return {name: bulk_load.sort_rows(name, rows) for name, rows in datasets.items()}
+
+def finish_import(conn, datasets, bulk=None):
+    """Пересчёт счётчиков затронутых строк и итоговая статистика"""
+    # Пересчёт счётчиков только для затронутых строк
+    touched = touched_keys(datasets)
+    reconcile_counters.save_touched(LAST_IMPORT_FILE, touched)
+    with span("reconcile-counters"):
+        changed = reconcile_counters.reconcile(conn, touched)
+    print()
+    reconcile_counters.print_summary(changed)
+
+    # Поисковые векторы затронутых постов (если колонка уже построена)
+    refreshed = search_index.refresh(conn, touched["posts"])
+    if refreshed is not None:
+        print(f"🔎 Поисковый индекс: обновлено постов: {refreshed}")
+
+    # Финальная статистика (одним запросом)
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT (SELECT COUNT(*) FROM posts), (SELECT COUNT(*) FROM comments),
+               (SELECT COUNT(*) FROM likes), (SELECT COUNT(*) FROM notifications)
+    """)
+    posts_count, comments_count, likes_count, notifs_count = cursor.fetchone()
+    cursor.close()
+
+    print(f"\n✅ ИМПОРТ ЗАВЕРШЕН!")
+    print(f"📊 Итоговая статистика в локальной БД:")
+    print(f"   - Посты: {posts_count}")
+    print(f"   - Комментарии: {comments_count}")
+    print(f"   - Лайки: {likes_count}")
+    print(f"   - Уведомления: {notifs_count}")
+    if bulk is not None:
+        bulk.print_report()
+
+def import_all_data(all_posts_data, all_comments_data, all_likes_data, all_notifications_data, all_tags_data,
+                    bulk=False):
+    """Основная функция импорта
+
+    bulk=True: вторичные индексы удаляются до загрузки и пересоздаются после
+    (CREATE INDEX CONCURRENTLY), строки сортируются по родительскому ключу,
+    в конце — ANALYZE затронутых таблиц (scripts/bulk_load.py)
+    """
+    # None и пустые выгрузки равнозначны: сущность просто пропускается
+    datasets = {
+        "posts": all_posts_data or [],
+        "comments": all_comments_data or [],
+        "likes": all_likes_data or [],
+        "notifications": all_notifications_data or [],
+        "tags": all_tags_data or [],
+    }
+    bulk_mode = bulk_load.BulkLoad(loaded_tables(datasets)) if bulk else None
+    if bulk_mode:
+        datasets = sorted_datasets(datasets)
     try:
-        # Подключение к локальной БД
-        conn = psycopg2.connect(**LOCAL_DB)
-        print("✅ Подключено к локальной PostgreSQL")
-        
-        # 1. Импорт постов
-        print(f"\n📝 Импорт {len(all_posts_data)} постов...")
-        import_posts_batch(conn, all_posts_data)
-        
-        # 2. Импорт комментариев  
-        if all_comments_data:
-            print(f"\n💬 Импорт {len(all_comments_data)} комментариев...")
-            cursor = conn.cursor()
-            for comment in all_comments_data:
-                try:
-                    sql = f"""
-INSERT INTO comments (id, "postId", "userId", content, "createdAt", "updatedAt")
-VALUES ({format_sql_value(comment['id'])}, {format_sql_value(comment['postId'])}, 
-        {format_sql_value(comment['userId'])}, {format_sql_value(comment['content'])},
-        {format_sql_value(comment['createdAt'])}, {format_sql_value(comment['updatedAt'])})
-ON CONFLICT (id) DO UPDATE SET content = EXCLUDED.content;
-"""
-                    cursor.execute(sql)
-                except Exception as e:
-                    print(f"✗ Ошибка с комментарием {comment['id']}: {str(e)}")
-                    conn.rollback()
-            conn.commit()
-            cursor.close()
-        
-        # 3. Импорт лайков
-        if all_likes_data:
-            print(f"\n❤️ Импорт {len(all_likes_data)} лайков...")
-            cursor = conn.cursor()
-            for like in all_likes_data:
-                try:
-                    sql = f"""
-INSERT INTO likes (id, "postId", "userId", "createdAt")
-VALUES ({format_sql_value(like['id'])}, {format_sql_value(like['postId'])}, 
-        {format_sql_value(like['userId'])}, {format_sql_value(like['createdAt'])})
-ON CONFLICT (id) DO NOTHING;
-"""
-                    cursor.execute(sql)
-                except Exception as e:
-                    print(f"✗ Ошибка с лайком {like['id']}: {str(e)}")
-                    conn.rollback()
-            conn.commit()
-            cursor.close()
-        
-        # 4. Импорт уведомлений
-        if all_notifications_data:
-            print(f"\n📢 Импорт {len(all_notifications_data)} уведомлений...")
-            cursor = conn.cursor()
-            for notif in all_notifications_data:
-                try:
-                    sql = f"""
-INSERT INTO notifications (id, "userId", type, message, "isRead", "createdAt", "relatedId")
-VALUES ({format_sql_value(notif['id'])}, {format_sql_value(notif['userId'])}, 
-        {format_sql_value(notif['type'])}, {format_sql_value(notif['message'])},
-        {notif.get('isRead', False)}, {format_sql_value(notif['createdAt'])},
-        {format_sql_value(notif.get('relatedId'))})
-ON CONFLICT (id) DO UPDATE SET "isRead" = EXCLUDED."isRead";
-"""
-                    cursor.execute(sql)
-                except Exception as e:
-                    print(f"✗ Ошибка с уведомлением {notif['id']}: {str(e)}")
-                    conn.rollback()
-            conn.commit()
-            cursor.close()
-        
-        # 5. Импорт тегов
-        if all_tags_data:
-            print(f"\n🏷️ Импорт {len(all_tags_data)} тегов...")
-            cursor = conn.cursor()
-            for tag in all_tags_data:
-                try:
-                    sql = f"""
-INSERT INTO tags (id, name, "usageCount", "createdAt")
-VALUES ({format_sql_value(tag['id'])}, {format_sql_value(tag['name'])}, 
-        {tag.get('usageCount', 0)}, {format_sql_value(tag['createdAt'])})
-ON CONFLICT (id) DO UPDATE SET "usageCount" = EXCLUDED."usageCount";
-"""
-                    cursor.execute(sql)
-                except Exception as e:
-                    print(f"✗ Ошибка с тегом {tag['id']}: {str(e)}")
-                    conn.rollback()
-            conn.commit()
-            cursor.close()
-        
-        # Финальная статистика
-        cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM posts")
-        posts_count = cursor.fetchone()[0]
-        cursor.execute("SELECT COUNT(*) FROM comments")
-        comments_count = cursor.fetchone()[0]
-        cursor.execute("SELECT COUNT(*) FROM likes")
-        likes_count = cursor.fetchone()[0]
-        cursor.execute("SELECT COUNT(*) FROM notifications")
-        notifs_count = cursor.fetchone()[0]
-        cursor.close()
-        
-        print(f"\n✅ ИМПОРТ ЗАВЕРШЕН!")
-        print(f"📊 Итоговая статистика в локальной БД:")
-        print(f"   - Посты: {posts_count}")
-        print(f"   - Комментарии: {comments_count}")
-        print(f"   - Лайки: {likes_count}")
-        print(f"   - Уведомления: {notifs_count}")
-        
-        conn.close()
-        
+        # Подключение к локальной БД (пул из scripts/fonana_db.py)
+        with fonana_db.connection() as conn:
+            print("✅ Подключено к локальной PostgreSQL")
+            datasets = prefilter_orphans(conn, datasets)
+            if bulk_mode:
+                dropped = bulk_mode.before(conn)
+                print(f"🏗️ Bulk-режим: удалено вторичных индексов: {len(dropped)}")
+
+            try:
+                # Посты импортируются всегда, остальные сущности — если есть данные
+                for entity in ENTITIES:
+                    rows = datasets[entity["name"]]
+                    if entity["name"] != "posts" and not rows:
+                        continue
+                    print("\n" + entity["title"].format(count=len(rows)))
+                    with span(f"import-{entity['name']}"):
+                        for target, target_rows in partition_targets(conn, entity, rows):
+                            import_entity_rows(conn, target, target_rows)
+            finally:
+                # Индексы пересоздаются даже после сбоя загрузки
+                if bulk_mode:
+                    print("\n🏗️ Пересоздание индексов и ANALYZE...")
+                    bulk_mode.after(conn)
+
+            finish_import(conn, datasets, bulk_mode)
+
     except Exception as e:
         print(f"❌ Критическая ошибка: {str(e)}")
         sys.exit(1)
@@ -191,4 +293,4 @@ ON CONFLICT (id) DO UPDATE SET "usageCount" = EXCLUDED."usageCount";
 if __name__ == "__main__":
     print("🚀 Запуск полного импорта данных из Supabase...")
     print("⚠️  Этот скрипт требует предварительного получения данных через MCP Supabase")
-    print("   Используйте его вместе с основным процессом импорта") 
\ No newline at end of file
+    print("   Используйте его вместе с основным процессом импорта")
@@ -0,0 +1,43 @@
+import os
+import sys
+import uuid
+from pathlib import Path
+
+import pytest
+
+# The scripts import each other as top-level modules (python scripts/<name>.py);
+# the importers at the repository root are run the same way
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "scripts"))
+
+# Throwaway PostgreSQL for the database tests (skipped when unset), e.g.
+# FONANA_TEST_DB_DSN=postgresql://postgres@localhost/postgres python -m pytest tests
+TEST_DB_DSN = os.environ.get("FONANA_TEST_DB_DSN")
+
+
+@pytest.fixture
+def db(monkeypatch):
+    """Connection into a fresh schema; fonana_db.connection()/connect() use the same schema"""
+    if not TEST_DB_DSN:
+        pytest.skip("FONANA_TEST_DB_DSN is not set")
+    import psycopg2.extensions
+
+    import fonana_db
+
+    schema = f"fonana_test_{uuid.uuid4().hex[:12]}"
+    admin = psycopg2.connect(TEST_DB_DSN)
+    admin.autocommit = True
+    admin.cursor().execute(f"CREATE SCHEMA {schema}")
+
+    fonana_db.close_pool()
+    monkeypatch.setattr(fonana_db, "DB_DSN",
+                        psycopg2.extensions.make_dsn(TEST_DB_DSN, options=f"-csearch_path={schema}"))
+    conn = fonana_db.connect()
+    try:
+        yield conn
+    finally:
+        conn.close()
+        fonana_db.close_pool()
+        admin.cursor().execute(f"DROP SCHEMA {schema} CASCADE")
+        admin.close()
@@ -0,0 +1,64 @@
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("PIL")
+
+import avatar_generator  # noqa: E402
+from avatar_generator import assign_missing, ensure_image, file_name, generate, public_url  # noqa: E402
+
+SMALL = (48, 32)
+
+
+def test_same_id_renders_the_same_bytes(tmp_path):
+    first = ensure_image("avatar", "user-1", SMALL, tmp_path / "a")
+    again = ensure_image("avatar", "user-1", SMALL, tmp_path / "b")
+    other = ensure_image("avatar", "user-2", SMALL, tmp_path / "a")
+    with open(first, "rb") as f, open(again, "rb") as g, open(other, "rb") as h:
+        data = f.read()
+        assert data == g.read()
+        assert data != h.read()
+
+
+def test_file_name_is_the_cache_key(monkeypatch):
+    name = file_name("banner", "user-1", SMALL)
+    assert name.startswith("banner_") and name.endswith("_48x32.webp")
+    assert name == file_name("banner", "user-1", SMALL)
+    assert name != file_name("banner", "user-2", SMALL)
+    assert name != file_name("avatar", "user-1", SMALL)
+    assert name != file_name("banner", "user-1", (96, 64))
+    assert public_url("avatar", "user-1") == f"/media/avatars/{file_name('avatar', 'user-1')}"
+    monkeypatch.setattr(avatar_generator, "RENDER_VERSION", avatar_generator.RENDER_VERSION + 1)
+    assert file_name("banner", "user-1", SMALL) != name
+
+
+def test_existing_files_are_not_rendered_again(tmp_path):
+    keys = ["u1", "u2", "u3"]
+    stats = generate("banner", keys, SMALL, tmp_path, workers=2)
+    assert stats["rendered"] == 3 and stats["cached"] == 0
+
+    cached = tmp_path / file_name("banner", "u2", SMALL)
+    cached.write_bytes(b"kept")
+    stats = generate("banner", keys + ["u4"], SMALL, tmp_path, workers=1)
+    assert stats["rendered"] == 1 and stats["cached"] == 3
+    assert cached.read_bytes() == b"kept"
+    assert stats["paths"][1] == str(cached)
+
+
+def test_assign_missing_fills_only_empty_columns(db):
+    db.cursor().execute("""
+        CREATE TABLE users (id text PRIMARY KEY, avatar text, "backgroundImage" text);
+        INSERT INTO users VALUES ('u1', NULL, NULL), ('u2', '/media/avatars/own.jpg', ''),
+                                 ('u3', '/media/avatars/a.jpg', '/media/backgrounds/b.jpg');
+    """)
+    db.commit()
+    users = list(avatar_generator.user_ids_from_db())
+    assert assign_missing(users, kinds=("avatar",)) == 1
+    assert assign_missing(users) == 2
+    cursor = db.cursor()
+    cursor.execute('SELECT id, avatar, "backgroundImage" FROM users ORDER BY id')
+    assert cursor.fetchall() == [
+        ("u1", public_url("avatar", "u1"), public_url("banner", "u1")),
+        ("u2", "/media/avatars/own.jpg", public_url("banner", "u2")),
+        ("u3", "/media/avatars/a.jpg", "/media/backgrounds/b.jpg"),
+    ]
+    assert assign_missing([("u3", "/media/avatars/a.jpg", "/media/backgrounds/b.jpg")]) == 0
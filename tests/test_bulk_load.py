@@ -0,0 +1,110 @@
+import json
+
+from bulk_load import BulkLoad, concurrent_definition, load_state, rebuild_indexes, save_state, sort_rows
+
+
+def index_names(conn, table):
+    cursor = conn.cursor()
+    cursor.execute("SELECT indexname FROM pg_indexes WHERE schemaname = current_schema() "
+                   "AND tablename = %s ORDER BY 1", (table,))
+    names = [name for name, in cursor.fetchall()]
+    cursor.close()
+    return names
+
+
+def test_sort_rows_orders_by_parent_key_with_missing_keys_first():
+    rows = [
+        {"id": "c", "postId": "p2", "createdAt": "2025-01-02"},
+        {"id": "a", "postId": "p1", "createdAt": "2025-01-03"},
+        {"id": "b", "postId": None, "createdAt": "2025-01-01"},
+        {"id": "d", "postId": "p1", "createdAt": "2025-01-01"},
+    ]
+    assert [row["id"] for row in sort_rows("likes", rows)] == ["b", "d", "a", "c"]
+    # Entities without a parent key keep their order
+    assert sort_rows("tags", rows) is rows
+
+
+def test_concurrent_definition_rewrites_only_the_statement_head():
+    definition = 'CREATE INDEX "posts_title_idx" ON public.posts USING btree (title)'
+    assert concurrent_definition(definition) == (
+        'CREATE INDEX CONCURRENTLY IF NOT EXISTS "posts_title_idx" ON public.posts USING btree (title)'
+    )
+
+
+def test_state_file_round_trip(tmp_path):
+    state = tmp_path / "state.json"
+    assert load_state(str(state)) == []
+    save_state(str(state), [{"table": "posts", "name": "i", "definition": "CREATE INDEX i ON posts (a)"}])
+    assert load_state(str(state))[0]["name"] == "i"
+
+
+def test_bulk_load_drops_secondary_indexes_and_rebuilds_them(db, tmp_path):
+    state = str(tmp_path / "state.json")
+    db.cursor().execute("""
+        CREATE TABLE posts (id text PRIMARY KEY, slug text UNIQUE, "creatorId" text, title text);
+        CREATE INDEX posts_creator_idx ON posts ("creatorId");
+        CREATE INDEX posts_title_idx ON posts (title);
+    """)
+    db.commit()
+    # Left behind by an unfinished earlier run: must survive this run untouched
+    unfinished = {"table": "likes", "name": "likes_post_idx", "definition": "CREATE INDEX likes_post_idx ON likes (x)"}
+    save_state(state, [unfinished])
+
+    bulk = BulkLoad(["posts"], workers=2, state_file=state)
+    dropped = bulk.before(db)
+    assert sorted(index["name"] for index in dropped) == ["posts_creator_idx", "posts_title_idx"]
+    assert index_names(db, "posts") == ["posts_pkey", "posts_slug_key"]
+    with open(state) as f:
+        assert [index["name"] for index in json.load(f)] == [
+            "likes_post_idx", "posts_creator_idx", "posts_title_idx"]
+
+    # A second drop while the first run is still pending does not duplicate entries
+    db.cursor().execute("CREATE INDEX posts_title_idx ON posts (title)")
+    db.commit()
+    BulkLoad(["posts"], state_file=state).before(db)
+    assert len(load_state(state)) == 3
+
+    bulk.after(db)
+    assert [result["error"] for result in bulk.rebuilt] == [None, None]
+    assert index_names(db, "posts") == ["posts_creator_idx", "posts_pkey", "posts_slug_key", "posts_title_idx"]
+    assert load_state(state) == [unfinished]
+    assert set(bulk.analyzed) == {"posts"}
+
+
+def test_failed_rebuild_keeps_the_definition(db, tmp_path):
+    state = str(tmp_path / "state.json")
+    db.cursor().execute("CREATE TABLE posts (id text PRIMARY KEY)")
+    db.commit()
+    broken = {"table": "posts", "name": "posts_missing_idx",
+              "definition": "CREATE INDEX posts_missing_idx ON posts (missing)"}
+    save_state(state, [broken])
+
+    results = rebuild_indexes([broken], state_file=state)
+    assert results[0]["error"] is not None
+    assert load_state(state) == [broken]
+    assert index_names(db, "posts") == ["posts_pkey"]
+
+    db.cursor().execute("ALTER TABLE posts ADD COLUMN missing text")
+    db.commit()
+    assert rebuild_indexes([broken], state_file=state)[0]["error"] is None
+    assert load_state(state) == []
+
+
+def test_rebuild_runs_tables_in_parallel_without_deadlocking(db, tmp_path):
+    state = str(tmp_path / "state.json")
+    db.cursor().execute("""
+        CREATE TABLE posts (id text PRIMARY KEY, a text, b text, c text);
+        CREATE TABLE likes (id text PRIMARY KEY, a text, b text);
+    """)
+    db.commit()
+    indexes = [
+        {"table": table, "name": f"{table}_{column}_idx",
+         "definition": f"CREATE INDEX {table}_{column}_idx ON {table} ({column})"}
+        for table, columns in (("posts", "abc"), ("likes", "ab")) for column in columns
+    ]
+    save_state(state, indexes)
+    for _ in range(3):
+        results = rebuild_indexes(indexes, workers=4, state_file=state)
+        assert [result["error"] for result in results] == [None] * 5
+    assert index_names(db, "posts") == ["posts_a_idx", "posts_b_idx", "posts_c_idx", "posts_pkey"]
+    assert load_state(state) == []
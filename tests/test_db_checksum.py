@@ -0,0 +1,56 @@
+from db_checksum import RowsSource, diff_leaves, digest_to_int, leaf_of, pg_text, row_digest, verify_table
+
+
+def rows(count, changed=None, drop=(), add=()):
+    data = {f"id-{i}": (f"title {i}", pg_text(i % 2 == 0), None) for i in range(count)}
+    data.update(changed or {})
+    for key in drop:
+        del data[key]
+    for key in add:
+        data[key] = ("new", "true", None)
+    return lambda: list(data.items())
+
+
+def test_pg_text_matches_postgres_rendering():
+    assert pg_text(None) is None
+    assert pg_text(True) == "true"
+    assert pg_text(False) == "false"
+    assert pg_text(42) == "42"
+
+
+def test_digest_to_int_is_signed_64_bit():
+    assert digest_to_int("7fffffffffffffff" + "0" * 16) == 2 ** 63 - 1
+    assert digest_to_int("8000000000000000" + "0" * 16) == -(2 ** 63)
+
+
+def test_leaf_is_within_range_and_stable():
+    assert 0 <= leaf_of("some-key") < 4096
+    assert leaf_of("some-key") == leaf_of("some-key")
+
+
+def test_row_digest_distinguishes_null_from_text():
+    assert row_digest("k", (None,)) != row_digest("k", ("",))
+
+
+def test_identical_sides_verify_without_descending():
+    report = verify_table(RowsSource(rows(500)), RowsSource(rows(500)), "posts")
+    assert report["ok"]
+    assert report["source_rows"] == report["target_rows"] == 500
+    assert report["differing_nodes"] == [0]
+
+
+def test_mismatches_are_reported_by_key():
+    target = rows(500, changed={"id-7": ("edited", "false", None)}, drop=["id-3"], add=["id-x"])
+    report = verify_table(RowsSource(rows(500)), RowsSource(target), "posts")
+    assert not report["ok"]
+    assert report["missing"] == ["id-3"]
+    assert report["extra"] == ["id-x"]
+    assert report["changed"] == ["id-7"]
+
+
+def test_diff_descends_only_into_differing_nodes():
+    source = RowsSource(rows(2000)).leaf_digests()
+    target = RowsSource(rows(2000, changed={"id-11": ("edited", "false", None)})).leaf_digests()
+    leaves, per_level = diff_leaves(source, target)
+    assert leaves == {leaf_of("id-11")}
+    assert per_level == [1, 1, 1, 1]
@@ -0,0 +1,65 @@
+import datetime
+
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from db_snapshot import (  # noqa: E402
+    SnapshotWriter, column_spec, iter_rows, load_manifest, parse_where, read_batches, table_plan,
+)
+
+POST_COLUMNS = [("id", "text"), ("views", "integer"), ("price", "double precision"),
+                ("isLocked", "boolean"), ("status", "USER-DEFINED"),
+                ("createdAt", "timestamp without time zone"), ("meta", "jsonb")]
+TAG_COLUMNS = [("id", "text"), ("name", "text")]
+
+
+def posts(count):
+    start = datetime.datetime(2025, 1, 1)
+    return [
+        (f"p{i:03d}", i, i / 2, i % 2 == 0, "LIVE" if i % 3 else "DRAFT",
+         start + datetime.timedelta(days=i), '{"i": %d}' % i)
+        for i in range(count)
+    ]
+
+
+@pytest.fixture(params=["parquet", "ipc"])
+def snapshot(request, tmp_path):
+    writer = SnapshotWriter(tmp_path, request.param, "zstd", row_group_size=10)
+    rows = posts(50)
+    writer.write_table("posts", [column_spec(n, t) for n, t in POST_COLUMNS],
+                       (rows[i:i + 10] for i in range(0, len(rows), 10)))
+    writer.write_table("tags", [column_spec(n, t) for n, t in TAG_COLUMNS], [[("t1", "art"), ("t2", "tech")]])
+    writer.close()
+    return tmp_path
+
+
+def test_round_trip_preserves_rows_and_types(snapshot):
+    assert list(iter_rows(read_batches(snapshot, "posts"))) == posts(50)
+    manifest = load_manifest(snapshot)
+    assert manifest["tables"]["posts"]["rows"] == 50
+    assert len(manifest["tables"]["posts"]["row_groups"]) == 5
+
+
+def test_projection_and_filters(snapshot):
+    where = [parse_where("createdAt>=2025-02-10"), parse_where("views<45")]
+    rows = list(iter_rows(read_batches(snapshot, "posts", ["id"], where)))
+    assert rows == [(f"p{i:03d}",) for i in range(40, 45)]
+    rows = list(iter_rows(read_batches(snapshot, "posts", ["id", "status"], [parse_where("status=DRAFT")])))
+    assert rows == [(f"p{i:03d}", "DRAFT") for i in range(0, 50, 3)]
+
+
+def test_table_plan_scopes_filters_and_skips_tables_without_the_column(snapshot):
+    manifest = load_manifest(snapshot)
+    posts_entry, tags_entry = manifest["tables"]["posts"], manifest["tables"]["tags"]
+    unscoped = [parse_where("createdAt>=2025-02-10")]
+    assert table_plan("posts", posts_entry, where=unscoped)[1] == [("createdAt", ">=", "2025-02-10")]
+    assert table_plan("tags", tags_entry, where=unscoped) is None
+
+    scoped = [parse_where("posts.createdAt>=2025-02-10")]
+    assert table_plan("posts", posts_entry, where=scoped)[1] == [("createdAt", ">=", "2025-02-10")]
+    assert table_plan("tags", tags_entry, where=scoped) == (["id", "name"], [])
+
+    assert table_plan("tags", tags_entry, columns=["id", "views"]) is None
+    with pytest.raises(ValueError):
+        table_plan("tags", tags_entry, where=[parse_where("tags.nope=1")])
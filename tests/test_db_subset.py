@@ -0,0 +1,125 @@
+import uuid
+
+import pytest
+
+import fonana_db
+from db_subset import TABLES, collect_keys, load_subset
+
+SCHEMA = """
+    CREATE TABLE users (id text PRIMARY KEY, "isCreator" boolean DEFAULT false,
+                        "followersCount" int DEFAULT 0, "postsCount" int DEFAULT 0, "referrerId" text);
+    CREATE TABLE tags (id text PRIMARY KEY, name text);
+    CREATE TABLE posts (id text PRIMARY KEY, "creatorId" text, "createdAt" timestamp);
+    CREATE TABLE post_tags ("postId" text, "tagId" text, PRIMARY KEY ("postId", "tagId"));
+    CREATE TABLE comments (id text PRIMARY KEY, "postId" text, "userId" text);
+    CREATE TABLE likes (id text PRIMARY KEY, "postId" text, "commentId" text, "userId" text);
+    CREATE TABLE subscriptions (id text PRIMARY KEY, "userId" text, "creatorId" text);
+    CREATE TABLE follows (id text PRIMARY KEY, "followerId" text, "followingId" text);
+"""
+
+# u1 and u2 are creators; u3 was referred by u4, who was referred by u5
+GRAPH = """
+    INSERT INTO users (id, "isCreator", "followersCount", "referrerId") VALUES
+        ('u1', true, 10, NULL), ('u2', true, 5, NULL), ('u3', false, 0, 'u4'),
+        ('u4', false, 0, 'u5'), ('u5', false, 0, NULL), ('u6', false, 0, NULL),
+        ('u7', false, 0, NULL), ('u8', false, 0, NULL);
+    INSERT INTO tags VALUES ('t1', 'art'), ('t2', 'music'), ('t3', 'unused');
+    INSERT INTO posts VALUES ('p1', 'u1', '2025-08-01'), ('p2', 'u1', '2025-01-01'),
+                             ('p3', 'u2', '2025-07-01');
+    INSERT INTO post_tags VALUES ('p1', 't1'), ('p3', 't2');
+    INSERT INTO comments VALUES ('c1', 'p1', 'u3'), ('c2', 'p3', 'u7');
+    INSERT INTO likes VALUES ('l1', 'p1', NULL, 'u3'), ('l2', NULL, 'c1', 'u5'),
+                             ('l3', 'p3', NULL, 'u6'), ('l4', 'p1', 'c2', 'u8');
+    INSERT INTO subscriptions VALUES ('s1', 'u3', 'u1'), ('s2', 'u6', 'u2');
+    INSERT INTO follows VALUES ('f1', 'u6', 'u1'), ('f2', 'u1', 'u2');
+"""
+
+
+def keys(conn, table):
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT id FROM subset_{table} ORDER BY id")
+    ids = [row[0] for row in cursor.fetchall()]
+    cursor.close()
+    return ids
+
+
+@pytest.fixture
+def source(db):
+    db.cursor().execute(SCHEMA + GRAPH)
+    db.commit()
+    return db
+
+
+@pytest.fixture
+def target(db):
+    """Empty copy of the schema in a second throwaway schema"""
+    import psycopg2.extensions
+
+    schema = f"fonana_target_{uuid.uuid4().hex[:12]}"
+    conn = fonana_db.connect(dsn=psycopg2.extensions.make_dsn(db.dsn, options=f"-csearch_path={schema}"))
+    conn.cursor().execute(f"CREATE SCHEMA {schema}; SET search_path = {schema};" + SCHEMA)
+    conn.commit()
+    try:
+        yield conn
+    finally:
+        conn.rollback()
+        conn.cursor().execute(f"DROP SCHEMA {schema} CASCADE")
+        conn.commit()
+        conn.close()
+
+
+def test_top_creator_closes_over_foreign_keys(source):
+    counts = collect_keys(source, creators=1)
+    assert keys(source, "creators") == ["u1"]
+    assert keys(source, "posts") == ["p1", "p2"]
+    assert keys(source, "comments") == ["c1"]
+    # l4 points at a comment outside the subset and would dangle
+    assert keys(source, "likes") == ["l1", "l2"]
+    assert keys(source, "tags") == ["t1"]
+    assert keys(source, "subscriptions") == ["s1"]
+    # f2 follows a creator outside the subset
+    assert keys(source, "follows") == ["f1"]
+    # referenced users plus the whole referrer chain u3 -> u4 -> u5
+    assert keys(source, "users") == ["u1", "u3", "u4", "u5", "u6"]
+    assert counts == {"users": 5, "tags": 1, "posts": 2, "post_tags": 1, "comments": 1,
+                      "likes": 2, "subscriptions": 1, "follows": 1}
+
+
+def test_since_limits_posts_of_the_seed_creators(source):
+    collect_keys(source, creator_ids=["u1"], since="2025-06-01")
+    assert keys(source, "posts") == ["p1"]
+
+
+def test_date_only_seed_derives_creators_from_posts(source):
+    collect_keys(source, since="2025-06-01")
+    assert keys(source, "creators") == ["u1", "u2"]
+    assert keys(source, "posts") == ["p1", "p3"]
+    assert keys(source, "likes") == ["l1", "l2", "l3", "l4"]
+    assert keys(source, "follows") == ["f1", "f2"]
+
+
+def test_load_subset_copies_only_closed_rows_and_is_repeatable(source, target, capsys):
+    collect_keys(source, creators=1)
+    loaded, bulk = load_subset(source, target)
+    assert loaded == {"users": 5, "tags": 1, "posts": 2, "post_tags": 1, "comments": 1,
+                      "likes": 2, "subscriptions": 1, "follows": 1}
+    assert set(bulk.analyzed) == set(TABLES)
+
+    cursor = target.cursor()
+    cursor.execute('SELECT id, "referrerId" FROM users ORDER BY id')
+    assert cursor.fetchall() == [("u1", None), ("u3", "u4"), ("u4", "u5"), ("u5", None), ("u6", None)]
+    # Every foreign key of the loaded rows resolves inside the subset
+    cursor.execute("""
+        SELECT count(*) FROM likes l
+        WHERE l."userId" NOT IN (SELECT id FROM users)
+           OR (l."postId" IS NOT NULL AND l."postId" NOT IN (SELECT id FROM posts))
+           OR (l."commentId" IS NOT NULL AND l."commentId" NOT IN (SELECT id FROM comments))
+    """)
+    assert cursor.fetchone() == (0,)
+    target.commit()
+
+    # Loading the same subset again keeps existing rows (ON CONFLICT DO NOTHING)
+    load_subset(source, target)
+    cursor.execute("SELECT count(*) FROM users")
+    assert cursor.fetchone() == (5,)
+    assert "✅ users: 5 rows loaded" in capsys.readouterr().out
@@ -0,0 +1,76 @@
+import json
+
+from fk_filter import BloomFilter, ForeignKeyFilter, RejectsWriter
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(10000, 0.01)
+    keys = [f"user-{i}" for i in range(10000)]
+    for key in keys:
+        bloom.add(key)
+    assert all(key in bloom for key in keys)
+    assert len(bloom) == 10000
+
+
+def test_bloom_filter_false_positive_rate_is_near_target():
+    bloom = BloomFilter(10000, 0.01)
+    for i in range(10000):
+        bloom.add(f"user-{i}")
+    false_positives = sum(f"other-{i}" in bloom for i in range(20000))
+    assert false_positives / 20000 < 0.02
+
+
+def test_bloom_filter_is_sized_for_capacity():
+    small, large = BloomFilter(1000, 0.01), BloomFilter(100000, 0.01)
+    assert large.nbytes > 50 * small.nbytes
+    assert small.hashes == 7  # -log2(0.01) rounded
+
+
+def filter_with(keys, references):
+    # Parent keys preloaded: no database round trip
+    fk = ForeignKeyFilter(None, references)
+    fk.keys.update(keys)
+    return fk
+
+
+def test_split_keeps_rows_with_existing_or_incoming_parents():
+    fk = filter_with({"posts": {"p1"}, "users": {"u1"}},
+                     {"comments": {"postId": "posts", "userId": "users"}})
+    fk.add_keys("posts", ["p2"])
+    rows = [
+        {"id": "c1", "postId": "p1", "userId": "u1"},
+        {"id": "c2", "postId": "p2", "userId": "u1"},
+        {"id": "c3", "postId": "gone", "userId": "u1"},
+        {"id": "c4", "postId": "p1", "userId": None},
+    ]
+    kept, rejected = fk.split("comments", rows)
+    assert [row["id"] for row in kept] == ["c1", "c2", "c4"]
+    assert [(row["id"], reason) for row, reason in rejected] == [("c3", "postId 'gone' not in posts")]
+
+
+def test_split_passes_tables_without_references_through():
+    fk = filter_with({}, {})
+    rows = [{"id": "t1"}]
+    assert fk.split("tags", rows) == (rows, [])
+
+
+def test_split_works_against_a_bloom_filter():
+    bloom = BloomFilter(100)
+    bloom.add("p1")
+    fk = filter_with({"posts": bloom}, {"likes": {"postId": "posts"}})
+    kept, rejected = fk.split("likes", [{"id": "l1", "postId": "p1"}, {"id": "l2", "postId": "nope"}])
+    assert [row["id"] for row in kept] == ["l1"]
+    assert fk.summary()["posts"] == (1, "bloom", bloom.nbytes)
+
+
+def test_rejects_writer_writes_json_lines_and_drops_stale_files(tmp_path):
+    path = tmp_path / "rejects.jsonl"
+    with RejectsWriter(path) as rejects:
+        rejects.write("comments", {"id": "c3", "postId": "gone"}, "postId 'gone' not in posts")
+    records = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    assert records == [{"table": "comments", "id": "c3", "reason": "postId 'gone' not in posts",
+                        "row": {"id": "c3", "postId": "gone"}}]
+
+    with RejectsWriter(path) as rejects:
+        pass
+    assert rejects.count == 0 and not path.exists()
@@ -0,0 +1,109 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from http_cache import CacheMiss, HttpCache, freshness
+
+BODIES = {
+    "/etag": (b"etag body", {"ETag": '"v1"', "Cache-Control": "no-cache"}),
+    "/dated": (b"dated body", {"Last-Modified": "Wed, 01 Jan 2025 00:00:00 GMT"}),
+    "/fresh": (b"fresh body", {"ETag": '"f"', "Cache-Control": "max-age=3600"}),
+    "/private": (b"secret", {"Cache-Control": "no-store"}),
+    "/big1": (b"x" * 600, {"ETag": '"b1"'}),
+    "/big2": (b"y" * 600, {"ETag": '"b2"'}),
+}
+
+
+class Origin(BaseHTTPRequestHandler):
+    requests = []
+
+    def do_GET(self):
+        body, headers = BODIES[self.path]
+        conditional = (
+            self.headers.get("If-None-Match") == headers.get("ETag", object())
+            or self.headers.get("If-Modified-Since") == headers.get("Last-Modified", object())
+        )
+        Origin.requests.append((self.path, 304 if conditional else 200))
+        self.send_response(304 if conditional else 200)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        if not conditional:
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if not conditional:
+            self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def origin():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Origin)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+@pytest.fixture
+def cache(tmp_path):
+    Origin.requests.clear()
+    return HttpCache(tmp_path / "cache", max_bytes=1 << 20)
+
+
+def test_freshness_headers():
+    assert freshness({"Cache-Control": "public, max-age=60"}, 1000) == (1060, True)
+    assert freshness({"Cache-Control": "no-store"}, 1000) == (0, False)
+    assert freshness({"Cache-Control": "no-cache, max-age=60"}, 1000) == (0, True)
+    assert freshness({"Expires": "Thu, 01 Jan 1970 00:01:40 GMT"}, 0) == (100, True)
+    assert freshness({"Expires": "garbage"}, 0) == (0, True)
+
+
+def test_stale_entry_is_revalidated_with_etag(origin, cache, tmp_path):
+    assert cache.fetch(f"{origin}/etag", tmp_path / "a") == "network"
+    assert cache.fetch(f"{origin}/etag", tmp_path / "b") == "revalidated"
+    assert (tmp_path / "b").read_bytes() == b"etag body"
+    assert Origin.requests == [("/etag", 200), ("/etag", 304)]
+
+
+def test_stale_entry_is_revalidated_with_last_modified(origin, cache, tmp_path):
+    cache.fetch(f"{origin}/dated", tmp_path / "a")
+    assert cache.fetch(f"{origin}/dated", tmp_path / "b") == "revalidated"
+    assert (tmp_path / "b").read_bytes() == b"dated body"
+
+
+def test_fresh_entry_skips_the_network(origin, cache, tmp_path):
+    cache.fetch(f"{origin}/fresh", tmp_path / "a")
+    assert cache.fetch(f"{origin}/fresh", tmp_path / "b") == "cache"
+    assert (tmp_path / "b").read_bytes() == b"fresh body"
+    assert Origin.requests == [("/fresh", 200)]
+
+
+def test_no_store_is_never_cached(origin, cache, tmp_path):
+    assert cache.fetch(f"{origin}/private", tmp_path / "a") == "network"
+    assert cache.fetch(f"{origin}/private", tmp_path / "b") == "network"
+    assert (tmp_path / "b").read_bytes() == b"secret"
+    assert cache.usage() == (0, 0)
+
+
+def test_offline_serves_cached_entries_and_misses_the_rest(origin, cache, tmp_path):
+    cache.fetch(f"{origin}/etag", tmp_path / "a")
+    offline = HttpCache(cache.root, offline=True)
+    assert offline.fetch(f"{origin}/etag", tmp_path / "b") == "cache"
+    with pytest.raises(CacheMiss):
+        offline.fetch(f"{origin}/dated", tmp_path / "c")
+    assert Origin.requests == [("/etag", 200)]
+
+
+def test_least_recently_used_entry_is_evicted(origin, tmp_path):
+    cache = HttpCache(tmp_path / "cache", max_bytes=1000)
+    cache.fetch(f"{origin}/big1", tmp_path / "a")
+    cache.fetch(f"{origin}/big2", tmp_path / "b")
+    assert cache.stats["evicted"] == 1
+    assert cache.usage() == (1, 600)
+    offline = HttpCache(cache.root, offline=True)
+    assert offline.fetch(f"{origin}/big2", tmp_path / "c") == "cache"
+    with pytest.raises(CacheMiss):
+        offline.fetch(f"{origin}/big1", tmp_path / "d")
@@ -0,0 +1,93 @@
+import random
+
+import pytest
+
+from log_analyzer import LogAnalyzer, QuantileSketch, error_signature, normalize_route
+
+
+def lognormal(count, seed):
+    rng = random.Random(seed)
+    return [rng.lognormvariate(3, 1.2) for _ in range(count)]
+
+
+@pytest.mark.parametrize("q", [0.0, 0.5, 0.9, 0.95, 0.99, 1.0])
+def test_sketch_quantiles_are_within_relative_accuracy(q):
+    values = lognormal(20000, 1)
+    sketch = QuantileSketch(0.01)
+    for value in values:
+        sketch.add(value)
+    exact = sorted(values)[int(q * (len(values) - 1))]
+    assert sketch.quantile(q) == pytest.approx(exact, rel=0.01)
+
+
+def test_sketch_memory_is_bounded_by_range_not_count():
+    sketch = QuantileSketch(0.01)
+    for value in lognormal(50000, 2):
+        sketch.add(value)
+    assert len(sketch.buckets) < 1000
+
+
+def test_sketch_merge_equals_one_sketch_over_both_inputs():
+    a, b, both = QuantileSketch(), QuantileSketch(), QuantileSketch()
+    for value in lognormal(3000, 3):
+        a.add(value)
+        both.add(value)
+    for value in lognormal(3000, 4) + [0, 0]:
+        b.add(value)
+        both.add(value)
+    a.merge(b)
+    assert a.count == both.count and a.zeros == both.zeros == 2
+    for q in (0.0, 0.5, 0.99):
+        assert a.quantile(q) == both.quantile(q)
+
+
+def test_empty_sketch_has_no_quantiles():
+    assert QuantileSketch().quantile(0.5) is None
+
+
+def test_routes_collapse_ids_and_file_names():
+    assert normalize_route("/api/posts/cmbvpqx1y0001abcdefghijkl?x=1") == "/api/posts/:id"
+    assert normalize_route("/api/users/42/followers") == "/api/users/:id/followers"
+    assert normalize_route("/media/avatars/Avatar_7.JPG") == "/media/avatars/*.jpg"
+    assert normalize_route("/") == "/"
+
+
+def test_error_signatures_mask_variable_parts():
+    a = error_signature("Error: listen EADDRINUSE: address already in use :::3000")
+    b = error_signature("Error: listen EADDRINUSE: address already in use :::3001")
+    assert a == b
+    assert error_signature("User 'alice' not found") == error_signature("User 'bob' not found")
+
+
+def test_analyzer_parses_pm2_next_and_nginx_lines():
+    analyzer = LogAnalyzer(window_seconds=60)
+    for line in [
+        "0|fonana   | GET /api/posts 200 in 45ms",
+        "0|fonana   | GET /api/posts 200 in 55ms",
+        "0|fonana   | [API/posts] loaded 20 posts",
+        "0|fonana   | Error: connect ECONNREFUSED 127.0.0.1:5432",
+        "0|fonana   |     at TCPConnectWrap.afterConnect (node:net:1555:16)",
+        '1.2.3.4 - - [10/Oct/2025:13:55:36 +0000] "GET /api/users/42 HTTP/1.1" 502 0 "-" "curl" 0.120',
+        "2025/10/10 13:55:40 [error] 1234#0: *5 connect() failed (111: Connection refused), client: 1.2.3.4",
+        "0|fonana   | react-error-debug enabled",
+    ]:
+        analyzer.feed(line)
+
+    posts = analyzer.routes["GET /api/posts"]
+    assert posts.count == 2 and posts.statuses["2xx"] == 2
+    assert posts.latency.quantile(0.5) == pytest.approx(45, rel=0.01)
+    users = analyzer.routes["GET /api/users/:id"]
+    assert users.statuses["5xx"] == 1
+    assert users.latency.quantile(0.5) == pytest.approx(120, rel=0.01)
+    assert analyzer.tags["API/posts"] == 1
+    assert analyzer.processes["fonana"] == 6
+    assert sum(analyzer.signatures.values()) == 3
+    assert "HTTP 5xx GET /api/users/:id" in analyzer.signatures
+    assert sum(sum(bucket.values()) for bucket in analyzer.timeline.values()) == 2
+
+
+def test_timeline_keeps_only_the_last_windows():
+    analyzer = LogAnalyzer(window_seconds=60, windows=3)
+    for minute in range(10):
+        analyzer.feed(f"2025/10/10 13:{minute:02d}:00 [error] 1#0: upstream timed out")
+    assert len(analyzer.timeline) == 3
@@ -0,0 +1,132 @@
+import json
+import os
+import shutil
+import subprocess
+import time
+from collections import Counter
+
+import pytest
+
+import media_gc
+from media_gc import find_orphans, live_references, purge, quarantine, restore, stem_key
+
+OLD = time.time() - 3 * 86400
+
+
+def touch(path, mtime=OLD, data=b"x"):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+@pytest.fixture
+def tree(tmp_path, monkeypatch):
+    """public/media and backup-images-before-webp under a temporary BASE_DIR"""
+    media = tmp_path / "public" / "media"
+    backup = tmp_path / "backup-images-before-webp"
+    monkeypatch.setattr(media_gc, "BASE_DIR", tmp_path)
+    monkeypatch.setattr(media_gc, "GC_ROOTS", {media: "/media", backup: ""})
+    monkeypatch.setattr(media_gc, "tracked_files", lambda base: set())
+    return tmp_path
+
+
+def orphan_paths(tree, orphans):
+    return sorted(os.path.relpath(full, tree) for full, _ in orphans)
+
+
+def test_stem_key_ignores_extension_and_case():
+    assert stem_key("/media/posts/A.JPG") == stem_key("/media/posts/a.webp") == "/media/posts/a"
+
+
+def test_references_protect_every_file_with_the_same_stem(tree):
+    touch(tree / "public/media/posts/a.jpg")
+    touch(tree / "public/media/posts/a.webp")
+    touch(tree / "backup-images-before-webp/media/posts/a.jpg")
+    touch(tree / "public/media/posts/b.jpg")
+    orphans, stats = find_orphans(Counter({"/media/posts/a": 1}))
+    assert orphan_paths(tree, orphans) == ["public/media/posts/b.jpg"]
+    assert stats["public/media"]["files"] == 3 and stats["public/media"]["orphans"] == 1
+    assert stats["backup-images-before-webp"]["orphans"] == 0
+
+
+def test_recent_files_are_never_collected(tree):
+    touch(tree / "public/media/posts/old.jpg")
+    touch(tree / "public/media/posts/new.jpg", mtime=time.time())
+    orphans, stats = find_orphans(Counter(), min_age_hours=24)
+    assert orphan_paths(tree, orphans) == ["public/media/posts/old.jpg"]
+    assert stats["public/media"]["recent"] == 1
+
+
+def test_playwright_fixtures_are_ignored(tree):
+    touch(tree / "public/media/tests/avatars/playwright-admin-avatar.jpg")
+    touch(tree / "public/media/tests/posts/neon-dreams-full.jpg")
+    orphans, stats = find_orphans(Counter())
+    assert orphans == []
+    assert stats["public/media"]["kept"] == 2
+
+
+@pytest.mark.skipif(shutil.which("git") is None, reason="git is not installed")
+def test_git_tracked_files_are_never_collected(tree, monkeypatch):
+    monkeypatch.undo()
+    monkeypatch.setattr(media_gc, "BASE_DIR", tree)
+    monkeypatch.setattr(media_gc, "GC_ROOTS", {tree / "public" / "media": "/media"})
+    touch(tree / "public/media/posts/tracked.jpg")
+    touch(tree / "public/media/posts/untracked.jpg")
+    subprocess.run(["git", "init", "-q", str(tree)], check=True)
+    subprocess.run(["git", "-C", str(tree), "add", "public/media/posts/tracked.jpg"], check=True)
+    orphans, _ = find_orphans(Counter())
+    assert orphan_paths(tree, orphans) == ["public/media/posts/untracked.jpg"]
+
+
+def test_purge_waits_for_the_grace_period(tree):
+    quarantine_dir = tree / "quarantine"
+    touch(tree / "public/media/posts/b.jpg", data=b"12345")
+    orphans, _ = find_orphans(Counter())
+    batch, moved = quarantine(orphans, quarantine_dir)
+    assert moved == 5 and not (tree / "public/media/posts/b.jpg").exists()
+
+    assert purge(grace_days=7, quarantine_dir=quarantine_dir) == (0, 0, 0)
+    manifest_path = quarantine_dir / batch / "manifest.json"
+    manifest = json.loads(manifest_path.read_text())
+    manifest["created"] -= 8 * 86400
+    manifest_path.write_text(json.dumps(manifest))
+    assert purge(grace_days=7, quarantine_dir=quarantine_dir) == (1, 1, 5)
+    assert not (quarantine_dir / batch).exists()
+
+
+def test_restore_keeps_files_whose_path_is_taken_again(tree):
+    quarantine_dir = tree / "quarantine"
+    touch(tree / "public/media/posts/b.jpg", data=b"quarantined")
+    touch(tree / "public/media/posts/c.jpg")
+    batch, _ = quarantine(find_orphans(Counter())[0], quarantine_dir)
+    touch(tree / "public/media/posts/b.jpg", data=b"new upload")
+
+    restored, kept = restore(batch, quarantine_dir)
+    assert restored == 1 and [item["path"] for item in kept] == ["public/media/posts/b.jpg"]
+    assert (tree / "public/media/posts/c.jpg").exists()
+    assert (tree / "public/media/posts/b.jpg").read_bytes() == b"new upload"
+    # The quarantined copy and its manifest entry survive
+    assert (quarantine_dir / batch / "public/media/posts/b.jpg").read_bytes() == b"quarantined"
+    manifest = json.loads((quarantine_dir / batch / "manifest.json").read_text())
+    assert [item["path"] for item in manifest["files"]] == ["public/media/posts/b.jpg"]
+
+    (tree / "public/media/posts/b.jpg").unlink()
+    assert restore(batch, quarantine_dir) == (1, [])
+    assert (tree / "public/media/posts/b.jpg").read_bytes() == b"quarantined"
+    assert not (quarantine_dir / batch).exists()
+
+
+def test_live_references_cover_media_and_backup_columns(db):
+    db.cursor().execute("""
+        CREATE TABLE posts (id text PRIMARY KEY, "mediaUrl" text, thumbnail text, "mediaUrl_backup" text);
+        CREATE TABLE users (id text PRIMARY KEY, avatar text);
+        INSERT INTO posts VALUES
+            ('p1', '/media/posts/A.webp', 'https://fonana.me/media/thumbposts/a.jpg', '/media/posts/a.jpg'),
+            ('p2', 'https://cdn.example.com/x.jpg', '', NULL);
+        INSERT INTO users VALUES ('u1', '/media/avatars/u1.png');
+    """)
+    db.commit()
+    refs, columns = live_references(db)
+    assert refs == Counter({"/media/posts/a": 2, "/media/thumbposts/a": 1, "/media/avatars/u1": 1})
+    assert ("posts", "mediaUrl_backup") in columns and ("users", "backgroundImage") not in columns
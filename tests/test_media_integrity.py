@@ -0,0 +1,42 @@
+import pytest
+
+from media_integrity import FileIndex, normalize_ref, reference_sql, webp_twin
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("/media/avatars/a.jpg", "/media/avatars/a.jpg"),
+    ("media/avatars/a.jpg?v=2", "/media/avatars/a.jpg"),
+    ("//media//posts/b.png", "/media/posts/b.png"),
+    ("https://fonana.me/media/posts/c%20d.jpg", "/media/posts/c d.jpg"),
+    ("https://xyz.supabase.co/storage/v1/object/public/posts/images/e.webp", "/posts/images/e.webp"),
+    ("https://fonana.b-cdn.net/posts/f.jpg", None),
+    ("data:image/png;base64,AAAA", None),
+    ("", None),
+    (None, None),
+])
+def test_normalize_ref(value, expected):
+    assert normalize_ref(value) == expected
+
+
+def test_webp_twin():
+    assert webp_twin("/media/a.JPG") == "/media/a.webp"
+    assert webp_twin("/media/a.webp") is None
+
+
+def test_resolve_statuses(tmp_path):
+    (tmp_path / "media" / "posts").mkdir(parents=True)
+    for name in ("a.jpg", "b.webp", "Case.jpg", "Twin.webp"):
+        (tmp_path / "media" / "posts" / name).touch()
+    index = FileIndex(tmp_path)
+    assert len(index) == 4
+    assert index.resolve("/media/posts/a.jpg") == ("ok", "/media/posts/a.jpg")
+    assert index.resolve("/media/posts/b.jpg") == ("twin", "/media/posts/b.webp")
+    assert index.resolve("/media/posts/case.jpg") == ("case", "/media/posts/Case.jpg")
+    assert index.resolve("/media/posts/twin.png") == ("twin", "/media/posts/Twin.webp")
+    assert index.resolve("/media/posts/nope.jpg") == ("missing", None)
+
+
+def test_reference_sql_unions_every_column():
+    sql = reference_sql([("posts", "mediaUrl"), ("users", "avatar")])
+    assert sql.count("UNION ALL") == 1
+    assert '"mediaUrl" IS NOT NULL' in sql and 'FROM "users"' in sql
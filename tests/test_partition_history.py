@@ -0,0 +1,107 @@
+import datetime
+import threading
+import time
+
+import fonana_db
+from partition_history import TABLES, _rewrite_index, add_months, backfill, create_twin, month_start, partition_name
+
+NOTIFICATIONS = """
+    CREATE TABLE notifications (id text PRIMARY KEY, "userId" text NOT NULL, message text,
+                                "isRead" boolean NOT NULL DEFAULT false, "createdAt" timestamp NOT NULL);
+    INSERT INTO notifications (id, "userId", message, "createdAt")
+    SELECT 'n' || i, 'u1', 'hello ' || i, now() - i * interval '20 days' FROM generate_series(1, 10) i;
+"""
+
+
+def twin_rows(conn):
+    cursor = conn.cursor()
+    cursor.execute('SELECT id, message, "isRead" FROM notifications_partitioned ORDER BY id')
+    rows = cursor.fetchall()
+    conn.rollback()
+    return rows
+
+
+def test_month_start_accepts_dates_datetimes_and_strings():
+    assert month_start(datetime.date(2025, 3, 31)) == datetime.date(2025, 3, 1)
+    assert month_start(datetime.datetime(2025, 3, 31, 23, 59)) == datetime.date(2025, 3, 1)
+    assert month_start("2025-03-31T23:59:59.000Z") == datetime.date(2025, 3, 1)
+
+
+def test_add_months_crosses_year_boundaries():
+    assert add_months(datetime.date(2025, 11, 1), 3) == datetime.date(2026, 2, 1)
+    assert add_months(datetime.date(2025, 1, 1), -1) == datetime.date(2024, 12, 1)
+    assert add_months(datetime.date(2025, 1, 1), -13) == datetime.date(2023, 12, 1)
+
+
+def test_partition_name():
+    assert partition_name("notifications", datetime.date(2025, 7, 1)) == "notifications_p2025_07"
+
+
+def test_rewrite_index_retargets_without_changing_columns():
+    definition = 'CREATE UNIQUE INDEX "notifications_key" ON public.notifications USING btree ("userId", type)'
+    rewritten = _rewrite_index(definition, "notifications_key", "notifications_key_part",
+                               "notifications", "notifications_partitioned")
+    assert rewritten == ('CREATE UNIQUE INDEX "notifications_key_part" ON "notifications_partitioned" '
+                         'USING btree ("userId", type)')
+
+
+def test_transactions_are_not_partitioned():
+    # txSignature / postPurchaseId must stay globally unique
+    assert "transactions" not in TABLES
+
+
+def test_backfill_and_mirror_trigger_copy_every_row(db):
+    db.cursor().execute(NOTIFICATIONS)
+    db.commit()
+    twin = create_twin(db, "notifications")
+    db.cursor().execute("UPDATE notifications SET \"isRead\" = true WHERE id = 'n1'")
+    db.commit()
+    assert backfill(db, "notifications", twin, chunk_size=3) == 9
+    db.cursor().execute("DELETE FROM notifications WHERE id = 'n2'")
+    db.commit()
+    cursor = db.cursor()
+    cursor.execute('SELECT id, message, "isRead" FROM notifications ORDER BY id')
+    assert twin_rows(db) == cursor.fetchall()
+
+
+def test_mirror_waits_for_an_uncommitted_backfill_chunk(db):
+    db.cursor().execute(NOTIFICATIONS)
+    db.commit()
+    create_twin(db, "notifications")
+
+    # A backfill chunk has copied n1 but not committed yet
+    chunk = fonana_db.connect()
+    chunk.cursor().execute("INSERT INTO notifications_partitioned SELECT * FROM notifications "
+                           "WHERE id = 'n1' ON CONFLICT DO NOTHING")
+    errors = []
+
+    def app_update():
+        app = fonana_db.connect()
+        try:
+            app.cursor().execute("UPDATE notifications SET \"isRead\" = true, message = 'edited' WHERE id = 'n1'")
+            app.commit()
+        except Exception as e:
+            errors.append(e)
+        finally:
+            app.close()
+
+    writer = threading.Thread(target=app_update)
+    writer.start()
+    # The trigger's insert blocks on the chunk's uncommitted row
+    deadline = time.time() + 10
+    cursor = db.cursor()
+    while time.time() < deadline:
+        cursor.execute("SELECT count(*) FROM pg_stat_activity WHERE wait_event_type = 'Lock' "
+                       "AND query LIKE 'UPDATE notifications%%'")
+        waiting = cursor.fetchone()[0]
+        db.rollback()
+        if waiting:
+            break
+        time.sleep(0.02)
+    assert waiting
+    chunk.commit()
+    chunk.close()
+    writer.join(10)
+
+    assert errors == []
+    assert twin_rows(db) == [("n1", "edited", True)]
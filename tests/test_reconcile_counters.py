@@ -0,0 +1,105 @@
+from reconcile_counters import COUNTERS, load_touched, reconcile, reconcile_sql, save_touched
+from supabase_full_import import touched_keys
+
+SCHEMA = """
+    CREATE TABLE users (id text PRIMARY KEY, "followersCount" int DEFAULT 0,
+                        "followingCount" int DEFAULT 0, "postsCount" int DEFAULT 0);
+    CREATE TABLE follows ("followerId" text, "followingId" text);
+    CREATE TABLE posts (id text PRIMARY KEY, "creatorId" text, "likesCount" int DEFAULT 0,
+                        "commentsCount" int DEFAULT 0);
+    CREATE TABLE comments (id text PRIMARY KEY, "postId" text, "likesCount" int DEFAULT 0);
+    CREATE TABLE likes (id text PRIMARY KEY, "postId" text, "commentId" text);
+    CREATE TABLE tags (id text PRIMARY KEY, "usageCount" int DEFAULT 0);
+    CREATE TABLE post_tags ("postId" text, "tagId" text);
+
+    INSERT INTO users (id) VALUES ('u1'), ('u2');
+    INSERT INTO follows VALUES ('u1', 'u2');
+    INSERT INTO posts (id, "creatorId", "likesCount") VALUES ('p1', 'u1', 99), ('p2', 'u1', 99);
+    INSERT INTO comments (id, "postId") VALUES ('c1', 'p1');
+    INSERT INTO likes VALUES ('l1', 'p1', NULL), ('l2', NULL, 'c1');
+    INSERT INTO tags (id) VALUES ('t1');
+    INSERT INTO post_tags VALUES ('p1', 't1'), ('p2', 't1');
+"""
+
+
+def counters(conn, table, column):
+    cursor = conn.cursor()
+    cursor.execute(f'SELECT id, "{column}" FROM {table} ORDER BY id')
+    rows = dict(cursor.fetchall())
+    cursor.close()
+    return rows
+
+
+def load(db):
+    db.cursor().execute(SCHEMA)
+    db.commit()
+
+
+def test_touched_keys_collect_parents_of_imported_rows():
+    datasets = {
+        "posts": [{"id": "p1", "creatorId": "u1"}],
+        "comments": [{"id": "c1", "postId": "p2"}],
+        "likes": [{"id": "l1", "postId": "p3"}, {"id": "l2", "postId": None, "commentId": "c2"}],
+        "notifications": [],
+        "tags": [{"id": "t1"}],
+    }
+    assert touched_keys(datasets) == {
+        "users": {"u1"},
+        "posts": {"p1", "p2", "p3"},
+        "comments": {"c1", "c2"},
+        "tags": {"t1"},
+    }
+
+
+def test_touched_round_trips_through_json(tmp_path):
+    path = tmp_path / "last_import.json"
+    save_touched(path, {"posts": {"p2", "p1"}, "users": set()})
+    assert path.read_text() == '{"posts": ["p1", "p2"], "users": []}'
+    assert load_touched(path) == {"posts": {"p1", "p2"}, "users": set()}
+
+
+def test_incremental_sql_limits_aggregates_and_targets_to_keys():
+    full = reconcile_sql("posts", COUNTERS["posts"], incremental=False, dry_run=False)
+    incremental = reconcile_sql("posts", COUNTERS["posts"], incremental=True, dry_run=False)
+    assert "%(keys)s" not in full
+    assert incremental.count("= ANY(%(keys)s)") == 3  # both aggregates and the target rows
+    assert full.startswith("WITH c0 AS") and "UPDATE \"posts\" target" in full
+    dry = reconcile_sql("posts", COUNTERS["posts"], incremental=False, dry_run=True)
+    assert "UPDATE" not in dry and "SELECT count(*)" in dry
+
+
+def test_full_reconcile_fixes_every_counter(db):
+    load(db)
+    changed = reconcile(db)
+    assert changed == {"users": 2, "posts": 2, "comments": 1, "tags": 1}
+    assert counters(db, "users", "followersCount") == {"u1": 0, "u2": 1}
+    assert counters(db, "users", "postsCount") == {"u1": 2, "u2": 0}
+    assert counters(db, "posts", "likesCount") == {"p1": 1, "p2": 0}
+    assert counters(db, "posts", "commentsCount") == {"p1": 1, "p2": 0}
+    assert counters(db, "comments", "likesCount") == {"c1": 1}
+    assert counters(db, "tags", "usageCount") == {"t1": 2}
+    assert reconcile(db) == {"users": 0, "posts": 0, "comments": 0, "tags": 0}
+
+
+def test_incremental_reconcile_touches_only_given_keys(db):
+    load(db)
+    changed = reconcile(db, {"posts": {"p2"}, "users": set()})
+    # Tables without touched keys are skipped entirely
+    assert changed == {"posts": 1}
+    assert counters(db, "posts", "likesCount") == {"p1": 99, "p2": 0}
+    assert counters(db, "users", "postsCount") == {"u1": 0, "u2": 0}
+
+
+def test_dry_run_reports_drift_without_writing(db):
+    load(db)
+    assert reconcile(db, dry_run=True) == {"users": 2, "posts": 2, "comments": 1, "tags": 1}
+    assert counters(db, "posts", "likesCount") == {"p1": 99, "p2": 99}
+
+
+def test_missing_counter_columns_are_ignored(db):
+    load(db)
+    db.cursor().execute('ALTER TABLE tags DROP COLUMN "usageCount"; DROP TABLE follows')
+    db.commit()
+    changed = reconcile(db)
+    assert "tags" not in changed
+    assert counters(db, "users", "postsCount") == {"u1": 2, "u2": 0}
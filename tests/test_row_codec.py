@@ -0,0 +1,144 @@
+import datetime
+import decimal
+import io
+
+import pytest
+
+from row_codec import MissingFieldError, RowCodec, load_schema, quote_literal
+from sql_dump_reader import DumpReader
+
+SCHEMA = """
+enum Status {
+  DRAFT
+  LIVE
+}
+
+model Post {
+  id        String   @id
+  title     String
+  body      String?  // free text
+  price     Float?
+  amount    Decimal?
+  views     Int      @default(0)
+  isLocked  Boolean  @map("is_locked")
+  meta      Json?
+  status    Status
+  createdAt DateTime
+  creator   User     @relation(fields: [id], references: [id])
+  tags      Tag[]
+
+  @@map("posts")
+}
+"""
+
+TRICKY = ["plain", "it's", "back\\slash", "both \\' mixed", "''", "\\\\", "line\nbreak", "tab\tand 'q'", "émoji 🎉", ""]
+
+
+@pytest.fixture
+def schema(tmp_path):
+    path = tmp_path / "schema.prisma"
+    path.write_text(SCHEMA, encoding="utf-8")
+    return str(path)
+
+
+def test_schema_columns_follow_the_model(schema):
+    fields = load_schema(schema)["posts"]
+    assert [f.column for f in fields] == [
+        "id", "title", "body", "price", "amount", "views", "is_locked", "meta", "status", "createdAt",
+    ]
+    by_column = {f.column: f for f in fields}
+    assert by_column["status"].type == "Enum"
+    assert by_column["body"].optional and not by_column["title"].optional
+
+
+def test_decode_converts_loose_values(schema):
+    codec = RowCodec("posts", schema_path=schema, defaults={"views": 0})
+    record = codec.decode({
+        "id": "p1", "title": "t", "price": "1.5", "amount": 2.10, "is_locked": "t",
+        "meta": {"a": [1, "é"]}, "status": "LIVE", "createdAt": "2025-01-01 00:00:00",
+    })
+    assert record.id == "p1" and record.body is None and record.views == 0
+    assert record.price == 1.5
+    assert record.amount == decimal.Decimal("2.1")
+    assert record.is_locked is True
+    assert record.meta == '{"a": [1, "é"]}'
+    assert tuple(record)[0] == "p1"
+
+
+def test_decode_requires_non_nullable_columns(schema):
+    codec = RowCodec("posts", ["id", "title"], schema_path=schema)
+    with pytest.raises(KeyError):
+        codec.decode({"id": "p1"})
+    with pytest.raises(MissingFieldError, match="posts row 'p1': missing non-nullable field 'title'"):
+        codec.decode({"id": "p1"})
+
+
+def test_defaults_keep_missing_non_nullable_columns_null(schema):
+    codec = RowCodec("posts", ["id", "title"], defaults={"title": None}, schema_path=schema)
+    assert codec.literal(codec.decode({"id": "p1"})) == "('p1', null)"
+
+
+@pytest.mark.parametrize("value, literal", [
+    (float("nan"), "'NaN'::float8"),
+    (float("inf"), "'Infinity'::float8"),
+    (float("-inf"), "'-Infinity'::float8"),
+    (0.1, "0.1"),
+])
+def test_special_floats_are_valid_sql(schema, value, literal):
+    codec = RowCodec("posts", ["id", "price"], schema_path=schema)
+    assert codec.literal(codec.decode({"id": "p1", "price": value})) == f"('p1', {literal})"
+    assert codec.literal(codec.decode({"id": "p1", "price": str(value)})) == f"('p1', {literal})"
+
+
+def test_special_decimals_are_valid_sql(schema):
+    codec = RowCodec("posts", ["amount"], schema_path=schema)
+    assert codec.literal(codec.decode({"amount": "NaN"})) == "('NaN'::numeric)"
+    assert codec.literal(codec.decode({"amount": "-Infinity"})) == "('-Infinity'::numeric)"
+    assert codec.literal(codec.decode({"amount": "2.50"})) == "(2.50)"
+
+
+def test_special_values_load_into_postgres(db, schema):
+    codec = RowCodec("posts", ["id", "price", "amount"], schema_path=schema)
+    records = codec.decode_all([{"id": f"p{i}", "price": value, "amount": value}
+                                for i, value in enumerate(["NaN", "Infinity", "-Infinity", "1.5"])])
+    cursor = db.cursor()
+    cursor.execute("CREATE TABLE posts (id text, price float8, amount numeric)")
+    cursor.execute(codec.insert_sql(records))
+    cursor.execute("SELECT price::text, amount::text FROM posts ORDER BY id")
+    assert cursor.fetchall() == [("NaN", "NaN"), ("Infinity", "Infinity"), ("-Infinity", "-Infinity"),
+                                 ("1.5", "1.5")]
+
+
+def test_unknown_columns_are_rejected(schema):
+    with pytest.raises(KeyError):
+        RowCodec("posts", ["id", "nope"], schema_path=schema)
+
+
+@pytest.mark.parametrize("value", TRICKY)
+def test_quote_literal_round_trips_through_the_dump_reader(value):
+    rows = list(DumpReader(io.StringIO(f"INSERT INTO t VALUES ({quote_literal(value)});"), chunk_size=3))
+    assert rows == [("t", None, (value,))]
+
+
+def test_insert_sql_round_trips_typed_records(schema):
+    codec = RowCodec("posts", schema_path=schema)
+    created = datetime.datetime(2025, 1, 2, 3, 4, 5)
+    records = [
+        codec.decode({"id": f"p{i}", "title": text, "body": None if i % 2 else text, "price": i / 4,
+                      "views": i, "is_locked": i % 2 == 0, "meta": {"text": text}, "status": "DRAFT",
+                      "createdAt": created})
+        for i, text in enumerate(TRICKY)
+    ]
+    sql = codec.insert_sql(records, "ON CONFLICT (id) DO NOTHING")
+    parsed = list(DumpReader(io.StringIO(sql), chunk_size=7))
+    assert [columns for _, columns, _ in parsed] == [tuple(codec.columns)] * len(records)
+    for record, (_, _, row) in zip(records, parsed):
+        expected = list(record)
+        expected[codec.columns.index("createdAt")] = "2025-01-02 03:04:05"
+        assert list(row) == expected
+
+
+def test_real_schema_has_the_imported_tables():
+    tables = load_schema()
+    for table in ("users", "posts", "comments", "likes", "notifications"):
+        assert "id" in [f.column for f in tables[table]]
@@ -0,0 +1,78 @@
+import search_index
+from search_index import INDEX, build, column_exists, iter_id_chunks, refresh, search
+
+SCHEMA = """
+    CREATE TABLE posts (id text PRIMARY KEY, title text, content text,
+                        "createdAt" timestamp DEFAULT now());
+    CREATE TABLE tags (id text PRIMARY KEY, name text);
+    CREATE TABLE post_tags ("postId" text, "tagId" text);
+
+    INSERT INTO posts (id, title, content) VALUES
+        ('p1', 'Solana art drop', 'new collection'),
+        ('p2', 'Weekly update', 'solana validators and art'),
+        ('p3', 'Cooking', NULL),
+        ('p4', NULL, 'nothing here');
+    INSERT INTO tags VALUES ('t1', 'recipes');
+    INSERT INTO post_tags VALUES ('p3', 't1');
+"""
+
+
+def load(db):
+    db.cursor().execute(SCHEMA)
+    db.commit()
+
+
+def vector(db, post_id):
+    cursor = db.cursor()
+    cursor.execute(f'SELECT "{search_index.COLUMN}"::text FROM posts WHERE id = %s', (post_id,))
+    value = cursor.fetchone()[0]
+    db.rollback()
+    return value
+
+
+def test_iter_id_chunks_pages_by_key(db):
+    load(db)
+    assert list(iter_id_chunks(db, 3)) == [["p1", "p2", "p3"], ["p4"]]
+
+
+def test_refresh_before_build_reports_missing_column(db):
+    load(db)
+    assert not column_exists(db)
+    assert refresh(db, {"p1"}) is None
+
+
+def test_build_fills_weighted_vectors_and_creates_the_index(db):
+    load(db)
+    stats = build(db, chunk_size=3)
+    assert stats["posts"] == 4 and stats["updated"] == 4 and stats["chunks"] == 2
+    assert "'solana':1A" in vector(db, "p1") and "'collection':5B" in vector(db, "p1")
+    # Tag names carry weight C, NULL title/content contribute nothing
+    assert "'recipes':2C" in vector(db, "p3")
+    assert vector(db, "p4") == "'here':2B 'nothing':1B"
+
+    cursor = db.cursor()
+    cursor.execute("SELECT indisvalid FROM pg_index WHERE indexrelid = %s::regclass", (f'"{INDEX}"',))
+    assert cursor.fetchone() == (True,)
+    db.rollback()
+
+    # Title matches (A) rank above content matches (B)
+    assert [row[0] for row in search(db, "solana art")] == ["p1", "p2"]
+    # Rebuilding unchanged posts writes nothing
+    assert build(db, chunk_size=3)["updated"] == 0
+
+
+def test_refresh_updates_only_changed_touched_posts(db):
+    load(db)
+    build(db)
+    db.cursor().execute("""
+        UPDATE posts SET title = 'Baking' WHERE id IN ('p3', 'p4');
+        INSERT INTO tags VALUES ('t2', 'solana');
+        INSERT INTO post_tags VALUES ('p2', 't2');
+    """)
+    db.commit()
+
+    assert refresh(db, {"p1", "p2", "p3"}, chunk_size=2) == 2
+    assert "'baking':1A" in vector(db, "p3")
+    assert "'solana':3B,7C" in vector(db, "p2")
+    # p4 was not touched by the import, so its vector is stale until the next refresh
+    assert "baking" not in vector(db, "p4")
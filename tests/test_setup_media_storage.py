@@ -0,0 +1,18 @@
+import pytest
+
+import setup_media_storage
+
+
+@pytest.mark.parametrize("sources, sleeps", [
+    (("cache", "network"), True),
+    (("network", "cache"), True),
+    (("cache", "revalidated"), True),
+    ((False, "network"), True),
+    (("cache", "cache"), False),
+    ((False, False), False),
+])
+def test_rate_limit_pauses_when_either_download_hit_the_host(monkeypatch, sources, sleeps):
+    delays = []
+    monkeypatch.setattr(setup_media_storage.time, "sleep", delays.append)
+    setup_media_storage.rate_limit(sources, 0.3)
+    assert delays == ([0.3] if sleeps else [])
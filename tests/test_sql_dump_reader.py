@@ -0,0 +1,126 @@
+import io
+
+import pytest
+
+from sql_dump_reader import (
+    DumpParseError, DumpReader, Lexer, RawSql, decode_copy_field, decode_estring, has_raw_sql, values_sql,
+)
+
+DUMP = """-- Fonana export
+SET client_encoding = 'UTF8';
+CREATE FUNCTION touch() RETURNS trigger AS $body$ BEGIN RETURN NEW; END $body$ LANGUAGE plpgsql;
+INSERT INTO public.posts (id, title, price, rating, "isLocked", body, "createdAt") VALUES
+  ('p1', 'It''s here', 10, -1.5e3, true, 'C:\\\\temp', '2025-01-02 03:04:05'::timestamp),
+  ('p2', 'multi
+line', -7, .25, false, NULL, now()),
+  ('p3', E'tab\\there \\x41\\'', 2E+7, 3.0, FALSE, '', now())
+ON CONFLICT (id) DO NOTHING;
+/* block comment with 'quotes' */
+COPY public.tags (id, name) FROM stdin;
+t1\tart
+t2\t\\N
+t3\tline\\nbreak
+\\.
+INSERT INTO "likes" VALUES ('l1', 'p1');
+"""
+
+EXPECTED = [
+    ("posts", ("id", "title", "price", "rating", "isLocked", "body", "createdAt"),
+     ("p1", "It's here", 10, -1500.0, True, "C:\\temp", "2025-01-02 03:04:05")),
+    ("posts", ("id", "title", "price", "rating", "isLocked", "body", "createdAt"),
+     ("p2", "multi\nline", -7, 0.25, False, None, RawSql("now ( )"))),
+    ("posts", ("id", "title", "price", "rating", "isLocked", "body", "createdAt"),
+     ("p3", "tab\there A'", 20000000.0, 3.0, False, "", RawSql("now ( )"))),
+    ("tags", ("id", "name"), ("t1", "art")),
+    ("tags", ("id", "name"), ("t2", None)),
+    ("tags", ("id", "name"), ("t3", "line\nbreak")),
+    ("likes", None, ("l1", "p1")),
+]
+
+
+def read(text, chunk_size):
+    return list(DumpReader(io.StringIO(text), chunk_size=chunk_size))
+
+
+def tokens(text, chunk_size):
+    lexer = Lexer(io.StringIO(text), chunk_size)
+    found = []
+    while (token := lexer.next()) is not None:
+        found.append(token)
+    return found
+
+
+def test_dump_rows_are_typed():
+    assert read(DUMP, 1 << 16) == EXPECTED
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 5, 7, 13, 64])
+def test_chunk_boundaries_do_not_change_the_result(chunk_size):
+    assert read(DUMP, chunk_size) == EXPECTED
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 4])
+def test_numbers_split_before_the_exponent(chunk_size):
+    assert tokens("-1.5e3, 2E+7, 4e-2, 6", chunk_size) == [
+        ("punct", "-"), ("number", "1.5e3"), ("punct", ","), ("number", "2E+7"),
+        ("punct", ","), ("number", "4e-2"), ("punct", ","), ("number", "6"),
+    ]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3])
+def test_doubled_quotes_split_across_chunks(chunk_size):
+    assert tokens("'a''b' \"x\"\"y\" E'z'", chunk_size) == [
+        ("string", "'a''b'"), ("qident", '"x""y"'), ("estring", "E'z'"),
+    ]
+
+
+def test_line_numbers_follow_multiline_values():
+    lexer = Lexer(io.StringIO("'a\nb'\n\nword"), 2)
+    lexer.next()
+    lexer.next()
+    assert lexer.line == 4
+
+
+def test_unterminated_string_raises():
+    with pytest.raises(DumpParseError):
+        read("INSERT INTO posts VALUES ('oops);\n", 4)
+
+
+def test_escape_decoders():
+    assert decode_estring(r"a\nb\t\101\u00e9''") == "a\nb\tAé'"
+    assert decode_copy_field("\\N") is None
+    assert decode_copy_field(r"a\tb\\c") == "a\tb\\c"
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3])
+def test_block_comment_split_across_chunks(chunk_size):
+    assert tokens("a /* b; */ c", chunk_size) == [("word", "a"), ("word", "c")]
+
+
+def test_rows_with_expressions_are_split_from_copyable_rows():
+    rows = [row for _, _, row in read(DUMP, 1 << 16)]
+    assert [has_raw_sql(row) for row in rows] == [False, True, True, False, False, False, False]
+    literal = lambda value: "NULL" if value is None else repr(value)  # noqa: E731
+    assert values_sql(("p2", None, RawSql("now ( )")), literal) == "('p2', NULL, now ( ))"
+
+
+def test_load_dump_evaluates_expressions(db, tmp_path):
+    from sql_dump_reader import load_dump
+
+    cursor = db.cursor()
+    cursor.execute('CREATE TABLE events (id text PRIMARY KEY, n int, "createdAt" timestamp, token uuid)')
+    db.commit()
+    dump = tmp_path / "events.sql"
+    dump.write_text(
+        "INSERT INTO events (id, n, \"createdAt\", token) VALUES\n"
+        "  ('a', 1, '2025-01-01 00:00:00', NULL),\n"
+        "  ('b''s', 2, now(), gen_random_uuid()),\n"
+        "  ('c', 3, now(), gen_random_uuid()),\n"
+        "  ('d', 4, '2025-01-02 00:00:00', NULL);\n",
+        encoding="utf-8",
+    )
+    assert load_dump(db, dump) == {"events": 4}
+    assert load_dump(db, dump) == {"events": 4}  # replays skip existing rows
+    cursor.execute('SELECT id, n, "createdAt" IS NOT NULL, token IS NOT NULL FROM events ORDER BY id')
+    assert cursor.fetchall() == [("a", 1, True, False), ("b's", 2, True, True), ("c", 3, True, True),
+                                 ("d", 4, True, False)]
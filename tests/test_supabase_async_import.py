@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("psycopg")
+
+import supabase_async_import  # noqa: E402
+from supabase_async_import import (  # noqa: E402
+    UPSERT_SQL, import_entity, open_connections, render_batches, render_rows, upsert_sql_for,
+)
+from supabase_full_import import ENTITY_BY_NAME  # noqa: E402
+
+TAGS = ENTITY_BY_NAME["tags"]
+
+
+def tag(i, **fields):
+    return dict({"id": f"t{i}", "name": f"tag {i}", "usageCount": i,
+                 "createdAt": "2025-01-01T00:00:00.000Z"}, **fields)
+
+
+def test_render_rows_reports_and_skips_undecodable_rows(capsys):
+    batch = render_rows(TAGS, [tag(1), tag(2, usageCount="many"), tag(3)])
+    assert [values[0] for values in batch] == ["t1", "t3"]
+    assert "✗ Ошибка с тегом t2:" in capsys.readouterr().out
+
+
+def test_upsert_sql_for_partitions_is_built_once():
+    partition = dict(ENTITY_BY_NAME["notifications"], table="notifications_p2025_07",
+                     conflict=ENTITY_BY_NAME["notifications"]["partition_conflict"])
+    try:
+        sql = upsert_sql_for(partition)
+        assert 'INSERT INTO "notifications_p2025_07"' in sql
+        assert 'ON CONFLICT (id, "createdAt")' in sql
+        assert upsert_sql_for(partition) is sql
+        assert upsert_sql_for(TAGS) is UPSERT_SQL["tags"]
+    finally:
+        UPSERT_SQL.pop("notifications_p2025_07", None)
+
+
+def test_render_batches_fill_the_queue_then_stop_every_worker():
+    async def drain():
+        queue = asyncio.Queue(maxsize=2)
+        received = []
+
+        async def consume():
+            while (batch := await queue.get()) is not None:
+                received.append(len(batch))
+
+        await asyncio.gather(render_batches(TAGS, [tag(i) for i in range(7)], queue, 3, 2),
+                             consume(), consume())
+        return received
+
+    assert sorted(asyncio.run(drain())) == [1, 3, 3]
+
+
+def test_pipeline_replays_failed_window_row_by_row(db, capsys):
+    db.cursor().execute("""
+        CREATE TABLE tags (id text PRIMARY KEY, name text NOT NULL,
+                           "usageCount" int NOT NULL DEFAULT 0, "createdAt" timestamp)
+    """)
+    db.commit()
+    rows = [tag(i) for i in range(10)]
+    rows[4]["name"] = None  # violates NOT NULL only on the server
+
+    async def run():
+        connections = await open_connections(2)
+        try:
+            return await import_entity(connections, TAGS, rows, batch_size=3, window=2)
+        finally:
+            await asyncio.gather(*(conn.close() for conn in connections))
+
+    assert asyncio.run(run()) == 9
+    assert "✗ Ошибка с тегом t4:" in capsys.readouterr().out
+    cursor = db.cursor()
+    cursor.execute('SELECT id, "usageCount" FROM tags ORDER BY id')
+    assert cursor.fetchall() == [(f"t{i}", i) for i in range(10) if i != 4]
+
+
+def test_conninfo_prefers_the_dsn(monkeypatch):
+    monkeypatch.setattr(supabase_async_import.fonana_db, "DB_DSN", "postgresql://example/fonana")
+    assert supabase_async_import.conninfo() == "postgresql://example/fonana"
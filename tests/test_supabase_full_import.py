@@ -0,0 +1,45 @@
+import json
+
+import supabase_full_import
+from supabase_full_import import import_all_data
+
+SCHEMA = """
+    CREATE TABLE users (id text PRIMARY KEY, "postsCount" int DEFAULT 0);
+    CREATE TABLE posts (id text PRIMARY KEY, "creatorId" text NOT NULL, title text, content text,
+                        type text, category text, thumbnail text, "mediaUrl" text,
+                        "isLocked" boolean, "isPremium" boolean, price float8, currency text,
+                        "likesCount" int, "commentsCount" int, "viewsCount" int,
+                        "createdAt" timestamp, "updatedAt" timestamp);
+    CREATE TABLE comments (id text PRIMARY KEY, "postId" text, "userId" text, content text,
+                           "createdAt" timestamp, "updatedAt" timestamp);
+    CREATE TABLE likes (id text PRIMARY KEY, "postId" text, "userId" text, "createdAt" timestamp);
+    CREATE TABLE notifications (id text PRIMARY KEY, "userId" text, type text, message text,
+                                "isRead" boolean, "createdAt" timestamp, "relatedId" text);
+    CREATE TABLE tags (id text PRIMARY KEY, name text, "usageCount" int, "createdAt" timestamp);
+    INSERT INTO users (id) VALUES ('u1');
+"""
+
+POST = {
+    "id": "p1", "creatorId": "u1", "title": "Hello", "content": "first", "type": "text",
+    "category": "art", "thumbnail": None, "mediaUrl": None, "isLocked": False, "isPremium": False,
+    "price": None, "currency": "SOL", "likesCount": 5, "commentsCount": 0, "viewsCount": 3,
+    "createdAt": "2025-06-13 18:37:23.033", "updatedAt": "2025-06-13 18:37:23.033",
+}
+
+
+def test_missing_datasets_are_treated_as_empty(db, tmp_path, monkeypatch, capsys):
+    db.cursor().execute(SCHEMA)
+    db.commit()
+    monkeypatch.setattr(supabase_full_import, "LAST_IMPORT_FILE", str(tmp_path / "last_import.json"))
+    monkeypatch.setattr(supabase_full_import, "REJECTS_FILE", str(tmp_path / "rejects.jsonl"))
+
+    import_all_data([POST], None, None, None, None)
+
+    out = capsys.readouterr().out
+    assert "✅ ИМПОРТ ЗАВЕРШЕН!" in out and "- Посты: 1" in out
+    with open(tmp_path / "last_import.json") as f:
+        assert json.load(f) == {"users": ["u1"], "posts": ["p1"], "comments": [], "tags": []}
+    cursor = db.cursor()
+    cursor.execute('SELECT "postsCount" FROM users')
+    # Counters are reconciled for the touched rows
+    assert cursor.fetchone() == (1,)
@@ -0,0 +1,41 @@
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("PIL")
+
+import avatar_generator  # noqa: E402
+from update_database_media_paths import expected_user_rows, update_user_avatars, user_media_paths  # noqa: E402
+
+
+@pytest.fixture
+def media(tmp_path, monkeypatch):
+    """Render small images into a temporary media directory"""
+    for kind, prefix in (("avatar", "/media/avatars"), ("banner", "/media/backgrounds")):
+        monkeypatch.setitem(avatar_generator.KINDS, kind, ((24, 16), tmp_path / kind, prefix))
+    return tmp_path
+
+
+def test_user_media_paths_depend_only_on_the_id(media):
+    assert user_media_paths("u1") == user_media_paths("u1")
+    avatar, background = user_media_paths("u1")
+    assert avatar == avatar_generator.public_url("avatar", "u1")
+    assert background == avatar_generator.public_url("banner", "u1")
+    assert user_media_paths("u2") != (avatar, background)
+
+
+def test_update_user_avatars_renders_and_assigns_each_user(db, media):
+    db.cursor().execute("""
+        CREATE TABLE users (id text PRIMARY KEY, avatar text, "backgroundImage" text);
+        INSERT INTO users (id) SELECT 'u' || i FROM generate_series(1, 5) i;
+    """)
+    db.commit()
+    assert update_user_avatars(db, itersize=2, workers=1)
+
+    cursor = db.cursor()
+    cursor.execute('SELECT id, avatar, "backgroundImage" FROM users ORDER BY id')
+    rows = cursor.fetchall()
+    assert rows == [(user_id, *user_media_paths(user_id)) for user_id, _, _ in rows]
+    for user_id, avatar, background in rows:
+        assert (media / "avatar" / avatar.rsplit("/", 1)[1]).exists()
+        assert (media / "banner" / background.rsplit("/", 1)[1]).exists()
+    assert sorted(expected_user_rows(db)) == [(user_id, (avatar, background)) for user_id, avatar, background in rows]